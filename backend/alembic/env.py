@@ -2,6 +2,7 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 
@@ -28,6 +29,30 @@ import app.models  # noqa: F401
 
 target_metadata = Base.metadata
 
+
+def _is_events_partition(name):
+    return bool(name) and (name == "events_default" or name.startswith("events_p"))
+
+
+def include_name(name, type_, parent_names):
+    # Las particiones de events las gestiona app.db.partitions, no el modelo
+    return not (type_ == "table" and _is_events_partition(name))
+
+
+# Extensiones instaladas en la BD comparada (None en modo offline: se incluye todo)
+installed_extensions: set[str] | None = None
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Postgres replica la FK alerts -> events en cada partición
+    if type_ == "foreign_key_constraint" and reflected:
+        return not _is_events_partition(object.referred_table.name)
+    # Como en las migraciones: los índices trigram solo existen si hay pg_trgm
+    if type_ == "index" and not reflected and installed_extensions is not None:
+        required = object.info.get("requires_extension")
+        return required is None or required in installed_extensions
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +77,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -71,9 +98,15 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
 
+    global installed_extensions
+
     with connectable.connect() as connection:
+        installed_extensions = set(connection.scalars(text("SELECT extname FROM pg_extension")))
+        # Cierra la transacción de la consulta: la de las migraciones la abre alembic
+        connection.commit()
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name, include_object=include_object,
         )
 
         with context.begin_transaction():
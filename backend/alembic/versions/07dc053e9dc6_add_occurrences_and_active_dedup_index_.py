@@ -0,0 +1,58 @@
+"""add occurrences and active dedup index to alerts
+
+Revision ID: 07dc053e9dc6
+Revises: d7f85cce3934
+Create Date: 2026-10-18 06:31:00.741309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '07dc053e9dc6'
+down_revision: Union[str, Sequence[str], None] = 'd7f85cce3934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('alerts', sa.Column('occurrences', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('alerts', sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.execute("UPDATE alerts SET last_seen_at = created_at")
+
+    # El índice único no admite duplicados previos: se cierran las activas
+    # repetidas y se conserva la más reciente de cada (rule_id, group_key).
+    op.execute(
+        """
+        UPDATE alerts a
+        SET status = 'closed'
+        FROM (
+            SELECT id,
+                   row_number() OVER (
+                       PARTITION BY rule_id, group_key ORDER BY created_at DESC, id DESC
+                   ) AS rn
+            FROM alerts
+            WHERE status IN ('open', 'ack') AND group_key IS NOT NULL
+        ) d
+        WHERE a.id = d.id AND d.rn > 1
+        """
+    )
+
+    op.create_index(
+        'uq_alerts_active_rule_group',
+        'alerts',
+        ['rule_id', 'group_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('open', 'ack')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_alerts_active_rule_group', table_name='alerts')
+    op.drop_column('alerts', 'last_seen_at')
+    op.drop_column('alerts', 'occurrences')
@@ -0,0 +1,29 @@
+"""add alerts created_at id index
+
+Revision ID: 09e77da9b8ed
+Revises: b590652a7b37
+Create Date: 2026-10-18 06:56:53.897351
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '09e77da9b8ed'
+down_revision: Union[str, Sequence[str], None] = 'b590652a7b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Paginación por cursor (created_at, id) en /alerts y /alerts/ui
+    op.create_index('ix_alerts_created_at_id', 'alerts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_alerts_created_at_id', table_name='alerts')
@@ -0,0 +1,63 @@
+"""add trigram and jsonb gin indexes
+
+Revision ID: a07b58ed8b05
+Revises: b64e8101403d
+Create Date: 2026-10-18 06:52:38.520157
+
+"""
+from typing import Sequence, Union
+
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a07b58ed8b05'
+down_revision: Union[str, Sequence[str], None] = 'b64e8101403d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+TRGM_INDEXES = (
+    ('ix_events_message_trgm', 'events', 'message'),
+    ('ix_alerts_title_trgm', 'alerts', 'title'),
+)
+
+
+def _has_trgm() -> bool:
+    bind = op.get_bind()
+    return bool(
+        bind.scalar(sa.text("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')"))
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # En events (particionada) el índice se crea en cada partición, presente y futura
+    op.create_index(
+        'ix_events_meta_path', 'events', ['meta'], unique=False,
+        postgresql_using='gin', postgresql_ops={'meta': 'jsonb_path_ops'},
+    )
+
+    # pg_trgm es contrib: si el servidor no lo trae, la búsqueda sigue funcionando sin índice
+    if not _has_trgm():
+        logger.warning("pg_trgm not available on this server; skipping trigram indexes")
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name, table, [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # La extensión se deja: puede haber otros objetos que la usen
+    for name, table, _ in reversed(TRGM_INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS "{name}"')
+    op.drop_index('ix_events_meta_path', table_name='events')
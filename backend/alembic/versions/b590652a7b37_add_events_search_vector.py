@@ -0,0 +1,47 @@
+"""add events search_vector
+
+Revision ID: b590652a7b37
+Revises: a07b58ed8b05
+Create Date: 2026-10-18 06:54:11.833130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b590652a7b37'
+down_revision: Union[str, Sequence[str], None] = 'a07b58ed8b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', message), 'A') || setweight(to_tsvector('english', "
+    "coalesce(meta ->> 'host', '') || ' ' || coalesce(meta ->> 'app', '') || ' ' || "
+    "coalesce(meta ->> 'user', '') || ' ' || coalesce(meta ->> 'src_ip', '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # STORED: reescribe cada partición una vez (en tablas grandes, ventana de mantenimiento)
+    op.add_column(
+        'events',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index('ix_events_search_vector', 'events', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_events_search_vector', table_name='events')
+    op.drop_column('events', 'search_vector')
@@ -0,0 +1,129 @@
+"""partition events by ts range
+
+Revision ID: b64e8101403d
+Revises: ca3691516805
+Create Date: 2026-10-18 06:45:53.131521
+
+"""
+from typing import Sequence, Union
+
+from datetime import datetime, time, timedelta, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b64e8101403d'
+down_revision: Union[str, Sequence[str], None] = 'ca3691516805'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DATA_COLUMNS = "id, ts, source, severity, message, created_at, meta"
+PROMOTED = (
+    ('meta_host', 'host'),
+    ('meta_src_ip', 'src_ip'),
+    ('meta_user', 'user'),
+)
+
+
+def _events_columns() -> list[sa.Column]:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('events_id_seq')"), nullable=False),
+        sa.Column('ts', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('source', sa.String(length=64), nullable=False),
+        sa.Column('severity', sa.Integer(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('meta', sa.dialects.postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        *(
+            sa.Column(column, sa.Text(), sa.Computed(f"meta ->> '{key}'", persisted=True), nullable=True)
+            for column, key in PROMOTED
+        ),
+    ]
+
+
+def _create_events_indexes() -> None:
+    op.create_index('ix_events_ts', 'events', ['ts'], unique=False)
+    op.create_index('ix_events_meta_host_ts', 'events', ['meta_host', 'ts'], unique=False)
+    op.create_index('ix_events_meta_src_ip', 'events', ['meta_src_ip'], unique=False)
+    op.create_index('ix_events_meta_user', 'events', ['meta_user'], unique=False)
+
+
+def _swap_out_events() -> None:
+    # La tabla actual pasa a events_old; la secuencia sobrevive a su DROP
+    op.drop_constraint('alerts_event_id_fkey', 'alerts', type_='foreignkey')
+    for index in ('ix_events_meta_user', 'ix_events_meta_src_ip', 'ix_events_meta_host_ts', 'ix_events_ts'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute("ALTER TABLE events RENAME TO events_old")
+    op.execute("ALTER TABLE events_old RENAME CONSTRAINT events_pkey TO events_old_pkey")
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY NONE")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _swap_out_events()
+
+    op.create_table(
+        'events',
+        *_events_columns(),
+        sa.PrimaryKeyConstraint('id', 'ts', name='events_pkey'),
+        postgresql_partition_by='RANGE (ts)',
+    )
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+
+    # Histórico existente en una sola partición (se va entera con la retención),
+    # hoy en la suya; las siguientes las crea app.db.partitions al arrancar.
+    today = datetime.combine(datetime.now(timezone.utc).date(), time.min, timezone.utc)
+    oldest = op.get_bind().scalar(sa.text("SELECT min(ts) FROM events_old"))
+    if oldest is not None and oldest < today:
+        start = datetime.combine(oldest.astimezone(timezone.utc).date(), time.min, timezone.utc)
+        op.execute(
+            f"CREATE TABLE events_p{start:%Y%m%d} PARTITION OF events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{today.isoformat()}')"
+        )
+    op.execute(
+        f"CREATE TABLE events_p{today:%Y%m%d} PARTITION OF events "
+        f"FOR VALUES FROM ('{today.isoformat()}') TO ('{(today + timedelta(days=1)).isoformat()}')"
+    )
+    op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+
+    # Copia antes de crear índices (más rápido en tablas grandes)
+    op.execute(f"INSERT INTO events ({DATA_COLUMNS}) SELECT {DATA_COLUMNS} FROM events_old")
+    _create_events_indexes()
+
+    # La FK a una tabla particionada tiene que incluir la clave de partición
+    op.add_column('alerts', sa.Column('event_ts', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE alerts a SET event_ts = e.ts FROM events_old e WHERE e.id = a.event_id")
+    op.alter_column('alerts', 'event_ts', nullable=False)
+    op.create_index('ix_alerts_event_ts', 'alerts', ['event_ts'], unique=False)
+    op.create_foreign_key(
+        'alerts_event_fkey', 'alerts', 'events', ['event_id', 'event_ts'], ['id', 'ts'], ondelete='CASCADE'
+    )
+
+    op.drop_table('events_old')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('alerts_event_fkey', 'alerts', type_='foreignkey')
+    op.drop_index('ix_alerts_event_ts', table_name='alerts')
+    op.drop_column('alerts', 'event_ts')
+
+    for index in ('ix_events_meta_user', 'ix_events_meta_src_ip', 'ix_events_meta_host_ts', 'ix_events_ts'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute("ALTER TABLE events RENAME TO events_old")
+    op.execute("ALTER TABLE events_old RENAME CONSTRAINT events_pkey TO events_old_pkey")
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY NONE")
+
+    op.create_table('events', *_events_columns(), sa.PrimaryKeyConstraint('id', name='events_pkey'))
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    op.execute(f"INSERT INTO events ({DATA_COLUMNS}) SELECT {DATA_COLUMNS} FROM events_old")
+    op.create_index('ix_events_meta_host_ts', 'events', ['meta_host', 'ts'], unique=False)
+    op.create_index('ix_events_meta_src_ip', 'events', ['meta_src_ip'], unique=False)
+    op.create_index('ix_events_meta_user', 'events', ['meta_user'], unique=False)
+    op.create_foreign_key('alerts_event_id_fkey', 'alerts', 'events', ['event_id'], ['id'], ondelete='CASCADE')
+
+    # Borra también todas las particiones
+    op.drop_table('events_old')
@@ -0,0 +1,47 @@
+"""promote meta host src_ip user to generated columns
+
+Revision ID: ca3691516805
+Revises: 07dc053e9dc6
+Create Date: 2026-10-18 06:43:17.340450
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ca3691516805'
+down_revision: Union[str, Sequence[str], None] = '07dc053e9dc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PROMOTED = (
+    ('meta_host', 'host'),
+    ('meta_src_ip', 'src_ip'),
+    ('meta_user', 'user'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Columnas STORED: reescribe la tabla una vez; después Postgres las mantiene solo
+    for column, key in PROMOTED:
+        op.add_column(
+            'events',
+            sa.Column(column, sa.Text(), sa.Computed(f"meta ->> '{key}'", persisted=True), nullable=True),
+        )
+    op.create_index('ix_events_meta_host_ts', 'events', ['meta_host', 'ts'], unique=False)
+    op.create_index('ix_events_meta_src_ip', 'events', ['meta_src_ip'], unique=False)
+    op.create_index('ix_events_meta_user', 'events', ['meta_user'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_events_meta_user', table_name='events')
+    op.drop_index('ix_events_meta_src_ip', table_name='events')
+    op.drop_index('ix_events_meta_host_ts', table_name='events')
+    for column, _ in reversed(PROMOTED):
+        op.drop_column('events', column)
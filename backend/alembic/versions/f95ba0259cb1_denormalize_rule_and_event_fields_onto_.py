@@ -0,0 +1,79 @@
+"""denormalize rule and event fields onto alerts
+
+Revision ID: f95ba0259cb1
+Revises: 428bb1601124
+Create Date: 2026-10-18 07:00:16.364730
+
+"""
+from typing import Sequence, Union
+
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f95ba0259cb1'
+down_revision: Union[str, Sequence[str], None] = '428bb1601124'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+COLUMNS = (
+    ('rule_name', sa.String(length=120)),
+    ('event_source', sa.String(length=64)),
+    ('event_severity', sa.Integer()),
+    ('event_message', sa.Text()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, type_ in COLUMNS:
+        op.add_column('alerts', sa.Column(name, type_, nullable=True))
+
+    # Backfill desde rules/events; la FK garantiza que ambos existen
+    op.execute(
+        """
+        UPDATE alerts a
+        SET rule_name = r.name,
+            event_source = e.source,
+            event_severity = e.severity,
+            event_message = e.message
+        FROM rules r, events e
+        WHERE r.id = a.rule_id
+          AND e.id = a.event_id
+          AND e.ts = a.event_ts
+        """
+    )
+    for name, _ in COLUMNS:
+        op.alter_column('alerts', name, nullable=False)
+
+    op.create_index('ix_alerts_event_severity_created_at', 'alerts', ['event_severity', 'created_at'], unique=False)
+    op.create_index(
+        'ix_alerts_event_source_lower', 'alerts', [sa.text('lower(event_source)'), 'created_at'], unique=False
+    )
+
+    # Igual que ix_alerts_title_trgm: solo si el servidor trae pg_trgm
+    has_trgm = op.get_bind().scalar(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+    )
+    if has_trgm:
+        op.create_index(
+            'ix_alerts_event_message_trgm', 'alerts', ['event_message'], unique=False,
+            postgresql_using='gin', postgresql_ops={'event_message': 'gin_trgm_ops'},
+        )
+    else:
+        logger.warning("pg_trgm not installed; skipping ix_alerts_event_message_trgm")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP INDEX IF EXISTS "ix_alerts_event_message_trgm"')
+    op.drop_index('ix_alerts_event_source_lower', table_name='alerts')
+    op.drop_index('ix_alerts_event_severity_created_at', table_name='alerts')
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('alerts', name)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import base64
+import json
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+CURSOR_HEADERS = [NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER]
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Posición en el orden (created_at desc, id desc) y hacia dónde se pide la página.
+
+    El token es opaco para el cliente (base64 de un JSON corto): solo se
+    devuelve tal cual en la siguiente petición.
+    """
+
+    created_at: datetime
+    id: int
+    direction: Literal["next", "prev"] = "next"
+
+    def encode(self) -> str:
+        raw = json.dumps({"c": self.created_at.isoformat(), "i": self.id, "d": self.direction}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> Cursor:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            direction = raw["d"]
+            if direction not in ("next", "prev"):
+                raise ValueError(direction)
+            return cls(datetime.fromisoformat(raw["c"]), int(raw["i"]), direction)
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=422, detail="invalid cursor") from None
+
+
+def parse_cursor(token: str | None, offset: int) -> Cursor | None:
+    if token is None:
+        return None
+    if offset:
+        raise HTTPException(status_code=422, detail="use either cursor or offset, not both")
+    return Cursor.decode(token)
+
+
+def keyset_page(stmt, created_at, id_, cursor: Cursor | None, limit: int):
+    # limit + 1: la fila extra dice si hay otra página en ese sentido.
+    # La comparación de filas (created_at, id) < (...) va por el índice compuesto.
+    key = tuple_(created_at, id_)
+    if cursor is None:
+        return stmt.order_by(created_at.desc(), id_.desc()).limit(limit + 1)
+    bound = tuple_(cursor.created_at, cursor.id)
+    if cursor.direction == "next":
+        return stmt.where(key < bound).order_by(created_at.desc(), id_.desc()).limit(limit + 1)
+    # Hacia atrás se recorre en ascendente y luego se da la vuelta
+    return stmt.where(key > bound).order_by(created_at.asc(), id_.asc()).limit(limit + 1)
+
+
+def finish_page(
+    rows: Sequence[Any],
+    cursor: Cursor | None,
+    limit: int,
+    response: Response,
+    key: Callable[[Any], tuple[datetime, int]],
+) -> list[Any]:
+    """Quita la fila extra, deja la página en orden desc y pone X-Next-Cursor / X-Prev-Cursor."""
+    more = len(rows) > limit
+    page = list(rows[:limit])
+    backward = cursor is not None and cursor.direction == "prev"
+    if backward:
+        page.reverse()
+    if not page:
+        return page
+
+    has_next = True if backward else more
+    has_prev = more if backward else cursor is not None
+    if has_next:
+        response.headers[NEXT_CURSOR_HEADER] = Cursor(*key(page[-1]), "next").encode()
+    if has_prev:
+        response.headers[PREV_CURSOR_HEADER] = Cursor(*key(page[0]), "prev").encode()
+    return page
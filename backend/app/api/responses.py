@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from collections.abc import Collection, Iterable, Mapping
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import inspect, null
+
+# OPT_UTC_Z: datetimes UTC con "Z", igual que los serializa Pydantic
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=JSON_OPTIONS)
+
+
+def columns_for(schema: type[BaseModel], entity, exclude: Collection[str] = (), **extra) -> list:
+    """Columnas de `entity` con los nombres y el orden de los campos de `schema`.
+
+    Camino rápido de los listados: la fila Core ya tiene la forma del schema
+    y se serializa tal cual, sin construir un modelo Pydantic por fila. Los
+    campos que no son columna tienen que venir en `extra` (None => NULL) o en
+    `exclude`: un campo nuevo sin columna falla aquí y no sale null sin avisar.
+    """
+    columns = inspect(entity).columns
+    cols = []
+    for name in schema.model_fields:
+        if name in exclude:
+            continue
+        if name in extra:
+            col = extra[name] if extra[name] is not None else null()
+        elif name in columns:
+            col = getattr(entity, name)
+        else:
+            raise ValueError(f"{schema.__name__}.{name} is not a column of {entity.__name__}; pass it in extra or exclude")
+        cols.append(col.label(name))
+    return cols
+
+
+def rows_json(rows: Iterable[Any], schema: type[BaseModel] | None = None) -> list[dict[str, Any]]:
+    # Con schema, solo sus campos (la fila puede traer columnas auxiliares)
+    if schema is None:
+        return [dict(row._mapping) for row in rows]
+    names = list(schema.model_fields)
+    return [{name: row._mapping[name] for name in names} for row in rows]
+
+
+def json_response(content: Any, headers: Mapping[str, str] | None = None) -> ORJSONResponse:
+    # Respuesta ya serializable: FastAPI no la vuelve a validar contra response_model
+    return ORJSONResponse(content, headers=dict(headers) if headers else None)
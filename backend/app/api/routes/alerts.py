@@ -1,58 +1,92 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, or_
-from sqlalchemy.orm import Session
+import os
+from dataclasses import dataclass
 
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import case, false, func, or_, select, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import finish_page, keyset_page, parse_cursor
+from app.api.responses import columns_for, json_response, rows_json
+from app.db.metric_counters import counter_upsert, status_changed
+from app.db.search import SEARCH_RANK_WINDOW, fulltext_match, fulltext_rank, ilike_contains
+from app.db.session import get_async_db
 from app.models.alert import Alert
 from app.models.event import Event
-from app.models.rule import Rule
-from app.schemas.alert import AlertOut, AlertUIOut, AlertUpdate, AlertStatus
+from app.schemas.alert import AlertOut, AlertStatus, AlertUIOut, AlertUIPage, AlertUpdate, CountMode
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
+# count=capped en /alerts/ui/page: a partir de aquí el total se muestra como "N+"
+ALERTS_UI_COUNT_CAP = int(os.getenv("ALERTS_UI_COUNT_CAP", "10000"))
 
-def _apply_ui_filters(
-    stmt,
-    *,
-    status: AlertStatus | None,
-    group_key: str | None,
-    rule_id: int | None,
-    severity_min: int | None,
-    severity_max: int | None,
-    source: str | None,
-    q: str | None,
-):
-    if status:
-        stmt = stmt.where(Alert.status == status)
-    if group_key:
-        stmt = stmt.where(Alert.group_key == group_key)
-    if rule_id is not None:
-        stmt = stmt.where(Alert.rule_id == rule_id)
-    if severity_min is not None:
-        stmt = stmt.where(Event.severity >= severity_min)
-    if severity_max is not None:
-        stmt = stmt.where(Event.severity <= severity_max)
-    if source:
-        # exact match pero case-insensitive
-        stmt = stmt.where(func.lower(Event.source) == source.lower())
-    if q:
-        like = f"%{q}%"
-        stmt = stmt.where(or_(Alert.title.ilike(like), Event.message.ilike(like)))
+
+@dataclass
+class AlertUIFilters:
+    """Filtros de /alerts/ui, /alerts/ui/page, /alerts/ui/count y /alerts/export.
+
+    Se usa como `Depends()`: cada campo es un query param.
+    """
+
+    status: AlertStatus | None = Query(None, description="Filter by status (open/ack/closed)")
+    group_key: str | None = Query(None, description="Filter by group_key (e.g. host)")
+    rule_id: int | None = Query(None, description="Filter by rule_id")
+    severity_min: int | None = Query(None, ge=0, le=10, description="Filter by event severity >= severity_min")
+    severity_max: int | None = Query(None, ge=0, le=10, description="Filter by event severity <= severity_max")
+    source: str | None = Query(None, description="Filter by event source (case-insensitive exact match)")
+    q: str | None = Query(None, min_length=1, max_length=200, description="Search in title/event_message (case-insensitive)")
+    search: str | None = Query(None, min_length=1, max_length=200, description="Full-text search on the event (websearch syntax)")
+
+    def __post_init__(self) -> None:
+        if self.severity_min is not None and self.severity_max is not None and self.severity_min > self.severity_max:
+            raise HTTPException(status_code=422, detail="severity_min cannot be greater than severity_max")
+
+
+def _apply_ui_filters(stmt, filters: AlertUIFilters):
+    if filters.status:
+        stmt = stmt.where(Alert.status == filters.status)
+    if filters.group_key:
+        stmt = stmt.where(Alert.group_key == filters.group_key)
+    if filters.rule_id is not None:
+        stmt = stmt.where(Alert.rule_id == filters.rule_id)
+    # Campos del evento copiados en alerts: los filtros no necesitan el join
+    if filters.severity_min is not None:
+        stmt = stmt.where(Alert.event_severity >= filters.severity_min)
+    if filters.severity_max is not None:
+        stmt = stmt.where(Alert.event_severity <= filters.severity_max)
+    if filters.source:
+        # exact match pero case-insensitive (índice sobre lower(event_source))
+        stmt = stmt.where(func.lower(Alert.event_source) == filters.source.lower())
+    if filters.q:
+        # Misma tabla: el OR se resuelve con BitmapOr de los dos índices trigram
+        stmt = stmt.where(or_(ilike_contains(Alert.title, filters.q), ilike_contains(Alert.event_message, filters.q)))
+    if filters.search:
+        # Full-text sobre el evento (mensaje + host/app/user/src_ip): semijoin
+        # con events, que solo se toca cuando se usa search
+        matching = select(Event.id, Event.ts).where(fulltext_match(Event.search_vector, filters.search))
+        stmt = stmt.where(tuple_(Alert.event_id, Alert.event_ts).in_(matching))
     return stmt
 
 
 @router.get("", response_model=list[AlertOut])
-def list_alerts(
+async def list_alerts(
+    response: Response,
     limit: int = Query(50, ge=1, le=500),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
+    offset: int = Query(0, ge=0, description="Pagination offset (prefer cursor)"),
+    cursor: str | None = Query(None, description="Opaque token from X-Next-Cursor / X-Prev-Cursor"),
     status: AlertStatus | None = Query(None, description="Filter by status (open/ack/closed)"),
     group_key: str | None = Query(None, description="Filter by group_key (e.g. host)"),
     rule_id: int | None = Query(None, description="Filter by rule_id"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    stmt = select(Alert).order_by(Alert.created_at.desc()).limit(limit).offset(offset)
+    page_cursor = parse_cursor(cursor, offset)
+    stmt = keyset_page(select(*columns_for(AlertOut, Alert)), Alert.created_at, Alert.id, page_cursor, limit)
+    if offset:
+        stmt = stmt.offset(offset)
 
     if status:
         stmt = stmt.where(Alert.status == status)
@@ -61,161 +95,206 @@ def list_alerts(
     if rule_id is not None:
         stmt = stmt.where(Alert.rule_id == rule_id)
 
-    return db.execute(stmt).scalars().all()
+    rows = (await db.execute(stmt)).all()
+    rows = finish_page(rows, page_cursor, limit, response, lambda row: (row.created_at, row.id))
+    return json_response(rows_json(rows), response.headers)
 
 
-@router.get("/ui", response_model=list[AlertUIOut])
-def list_alerts_ui(
-    limit: int = Query(50, ge=1, le=500),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
-    status: AlertStatus | None = Query(None, description="Filter by status (open/ack/closed)"),
-    group_key: str | None = Query(None, description="Filter by group_key (e.g. host)"),
-    rule_id: int | None = Query(None, description="Filter by rule_id"),
-    severity_min: int | None = Query(None, ge=0, le=10, description="Filter by event severity >= severity_min"),
-    severity_max: int | None = Query(None, ge=0, le=10, description="Filter by event severity <= severity_max"),
-    source: str | None = Query(None, description="Filter by event source (case-insensitive exact match)"),
-    q: str | None = Query(None, min_length=1, max_length=200, description="Search in title/event_message (case-insensitive)"),
-    db: Session = Depends(get_db),
+def _ui_page(
+    *,
+    limit: int,
+    offset: int,
+    cursor: str | None,
+    rank: bool,
+    filters: AlertUIFilters,
 ):
-    if severity_min is not None and severity_max is not None and severity_min > severity_max:
-        raise HTTPException(status_code=422, detail="severity_min cannot be greater than severity_max")
+    """Sentencia de una página de /alerts/ui (cursor u offset) y el cursor recibido.
 
+    rank=true ordena por relevancia y solo admite offset.
+    """
+    page_cursor = parse_cursor(cursor, offset)
+    ranked = bool(filters.search and rank)
+    if ranked and page_cursor is not None:
+        raise HTTPException(status_code=422, detail="cursor pagination is not available with rank=true")
+
+    if ranked:
+        return _ranked_page(limit, offset, filters), page_cursor, ranked
+
+    stmt = keyset_page(select(*columns_for(AlertUIOut, Alert)), Alert.created_at, Alert.id, page_cursor, limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    return _apply_ui_filters(stmt, filters), page_cursor, ranked
+
+
+def _ranked_page(limit: int, offset: int, filters: AlertUIFilters):
+    # Como /events: relevancia entre las SEARCH_RANK_WINDOW alertas más recientes
+    # que casan. El vector está en events: una búsqueda por PK por alerta de la
+    # ventana, no por cada coincidencia. Sin clave estable para cursor: solo offset.
+    window = (
+        _apply_ui_filters(select(Alert.id, Alert.event_id, Alert.event_ts, Alert.created_at), filters)
+        .order_by(Alert.created_at.desc(), Alert.id.desc())
+        .limit(SEARCH_RANK_WINDOW)
+        .subquery()
+    )
+    score = (
+        select(fulltext_rank(Event.search_vector, filters.search))
+        .where(Event.id == window.c.event_id, Event.ts == window.c.event_ts)
+        .scalar_subquery()
+    )
     stmt = (
-        select(
-            Alert,
-            Rule.name.label("rule_name"),
-            Event.ts.label("event_ts"),
-            Event.source.label("event_source"),
-            Event.severity.label("event_severity"),
-            Event.message.label("event_message"),
-        )
-        .join(Rule, Rule.id == Alert.rule_id)
-        .join(Event, Event.id == Alert.event_id)
-        .order_by(Alert.created_at.desc())
+        select(*columns_for(AlertUIOut, Alert))
+        .join(window, Alert.id == window.c.id)
+        .order_by(score.desc(), window.c.created_at.desc(), window.c.id.desc())
         .limit(limit)
-        .offset(offset)
     )
+    return stmt.offset(offset) if offset else stmt
 
-    stmt = _apply_ui_filters(
-        stmt,
-        status=status,
-        group_key=group_key,
-        rule_id=rule_id,
-        severity_min=severity_min,
-        severity_max=severity_max,
-        source=source,
-        q=q,
-    )
 
-    rows = db.execute(stmt).all()
+def _ui_items(rows, page_cursor, ranked: bool, limit: int, response: Response) -> list[dict]:
+    if not ranked:
+        rows = finish_page(rows, page_cursor, limit, response, lambda row: (row.created_at, row.id))
+    return rows_json(rows, AlertUIOut)
 
-    out: list[AlertUIOut] = []
-    for alert, rule_name, event_ts, event_source, event_severity, event_message in rows:
-        out.append(
-            AlertUIOut(
-                **AlertOut.model_validate(alert).model_dump(),
-                rule_name=rule_name,
-                event_ts=event_ts,
-                event_source=event_source,
-                event_severity=event_severity,
-                event_message=event_message,
-            )
-        )
-    return out
+
+@router.get("/ui", response_model=list[AlertUIOut])
+async def list_alerts_ui(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0, description="Pagination offset (prefer cursor)"),
+    cursor: str | None = Query(None, description="Opaque token from X-Next-Cursor / X-Prev-Cursor"),
+    filters: AlertUIFilters = Depends(),
+    rank: bool = Query(False, description="Order search results by relevance"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt, page_cursor, ranked = _ui_page(limit=limit, offset=offset, cursor=cursor, rank=rank, filters=filters)
+    rows = (await db.execute(stmt)).all()
+    items = _ui_items(rows, page_cursor, ranked, limit, response)
+    return json_response(items, response.headers)
+
+
+@router.get("/ui/page", response_model=AlertUIPage)
+async def page_alerts_ui(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0, description="Pagination offset (prefer cursor)"),
+    cursor: str | None = Query(None, description="Opaque token from X-Next-Cursor / X-Prev-Cursor"),
+    filters: AlertUIFilters = Depends(),
+    rank: bool = Query(False, description="Order search results by relevance"),
+    count: CountMode = Query("capped", description="Total: exact, capped at ALERTS_UI_COUNT_CAP, or planner estimate"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Página de /alerts/ui más el total de los filtros, en una sola consulta."""
+    stmt, page_cursor, ranked = _ui_page(limit=limit, offset=offset, cursor=cursor, rank=rank, filters=filters)
+
+    # El total va como subconsulta escalar (InitPlan: se calcula una vez, no por fila).
+    # Sin cursor ni límite: cuenta todo lo que casa con los filtros.
+    matching = _apply_ui_filters(select(Alert.id), filters)
+    total, estimated = _total_columns(matching, count)
+
+    rows = (await db.execute(stmt.add_columns(total, estimated))).all()
+    if rows:
+        n, is_estimate = rows[0].total, rows[0].estimated
+    elif offset or page_cursor is not None:
+        # Página vacía más allá del final: el total hay que pedirlo aparte
+        n, is_estimate = (await db.execute(select(total, estimated))).one()
+    else:
+        n, is_estimate = 0, False
+
+    if is_estimate:
+        mode = "estimate"
+    elif count == "exact":
+        mode = "exact"
+    else:
+        mode = "capped" if n > ALERTS_UI_COUNT_CAP else "exact"
+        n = min(n, ALERTS_UI_COUNT_CAP)
+    items = _ui_items(rows, page_cursor, ranked, limit, response)
+    return json_response({"items": items, "total": n, "total_mode": mode}, response.headers)
+
+
+def _total_columns(matching, count: CountMode):
+    """(total, estimated) como columnas escalares para añadir a la consulta de la página.
+
+    estimate: si el planner calcula más de ALERTS_UI_COUNT_CAP filas se devuelve
+    su estimación; por debajo, el conteo con tope (barato y exacto). Postgres
+    solo ejecuta la rama del CASE que se usa.
+    """
+    if count == "exact":
+        return select(func.count()).select_from(matching.subquery()).scalar_subquery().label("total"), false().label("estimated")
+
+    # Deja de contar en cap + 1: basta para saber si hay "más de cap"
+    capped = select(func.count()).select_from(matching.limit(ALERTS_UI_COUNT_CAP + 1).subquery()).scalar_subquery()
+    if count == "capped":
+        return capped.label("total"), false().label("estimated")
+
+    # count_estimate hace EXPLAIN del SQL: va con los valores incrustados porque EXPLAIN no admite parámetros
+    sql = str(matching.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    estimate = select(func.count_estimate(sql)).scalar_subquery()
+    large = estimate > ALERTS_UI_COUNT_CAP
+    return case((large, estimate), else_=capped).label("total"), large.label("estimated")
 
 
 @router.get("/ui/count", response_model=int)
-def count_alerts_ui(
-    status: AlertStatus | None = Query(None),
-    group_key: str | None = Query(None),
-    rule_id: int | None = Query(None),
-    severity_min: int | None = Query(None, ge=0, le=10),
-    severity_max: int | None = Query(None, ge=0, le=10),
-    source: str | None = Query(None),
-    q: str | None = Query(None, min_length=1, max_length=200),
-    db: Session = Depends(get_db),
+async def count_alerts_ui(
+    filters: AlertUIFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    if severity_min is not None and severity_max is not None and severity_min > severity_max:
-        raise HTTPException(status_code=422, detail="severity_min cannot be greater than severity_max")
+    stmt = _apply_ui_filters(select(func.count()).select_from(Alert), filters)
 
-    stmt = (
-        select(func.count())
-        .select_from(Alert)
-        .join(Rule, Rule.id == Alert.rule_id)
-        .join(Event, Event.id == Alert.event_id)
-    )
+    return int((await db.execute(stmt)).scalar_one())
 
-    stmt = _apply_ui_filters(
-        stmt,
-        status=status,
-        group_key=group_key,
-        rule_id=rule_id,
-        severity_min=severity_min,
-        severity_max=severity_max,
-        source=source,
-        q=q,
-    )
 
-    return int(db.execute(stmt).scalar_one())
+@router.get("/export")
+async def export_alerts(
+    request: Request,
+    format: ExportFormat = Query("ndjson", description="ndjson or csv"),
+    filters: AlertUIFilters = Depends(),
+):
+    """Todas las alertas que casan con los filtros de /alerts/ui, en streaming (created_at desc)."""
+    stmt = _apply_ui_filters(select(*columns_for(AlertUIOut, Alert)), filters)
+    return export_response(request, stmt.order_by(Alert.created_at.desc(), Alert.id.desc()), format, "alerts")
 
 
 @router.get("/{alert_id}", response_model=AlertOut)
-def get_alert(alert_id: int, db: Session = Depends(get_db)):
-    alert = db.get(Alert, alert_id)
+async def get_alert(alert_id: int, db: AsyncSession = Depends(get_async_db)):
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     return alert
 
 
 @router.get("/{alert_id}/ui", response_model=AlertUIOut)
-def get_alert_ui(alert_id: int, db: Session = Depends(get_db)):
-    stmt = (
-        select(
-            Alert,
-            Rule.name.label("rule_name"),
-            Event.ts.label("event_ts"),
-            Event.source.label("event_source"),
-            Event.severity.label("event_severity"),
-            Event.message.label("event_message"),
-        )
-        .join(Rule, Rule.id == Alert.rule_id)
-        .join(Event, Event.id == Alert.event_id)
-        .where(Alert.id == alert_id)
-        .limit(1)
-    )
-
-    row = db.execute(stmt).first()
-    if not row:
+async def get_alert_ui(alert_id: int, db: AsyncSession = Depends(get_async_db)):
+    # rule_name y los campos del evento ya están en la fila de la alerta
+    alert = await db.get(Alert, alert_id)
+    if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
-
-    alert, rule_name, event_ts, event_source, event_severity, event_message = row
-
-    return AlertUIOut(
-        **AlertOut.model_validate(alert).model_dump(),
-        rule_name=rule_name,
-        event_ts=event_ts,
-        event_source=event_source,
-        event_severity=event_severity,
-        event_message=event_message,
-    )
+    return alert
 
 
 @router.patch("/{alert_id}", response_model=AlertOut)
-def update_alert(alert_id: int, payload: AlertUpdate, db: Session = Depends(get_db)):
+async def update_alert(alert_id: int, payload: AlertUpdate, db: AsyncSession = Depends(get_async_db)):
     try:
-        alert = db.get(Alert, alert_id)
+        # FOR UPDATE: dos PATCH a la vez no cuentan dos veces el mismo cambio de estado
+        alert = await db.get(Alert, alert_id, with_for_update=True, populate_existing=True)
         if not alert:
             raise HTTPException(status_code=404, detail="Alert not found")
 
+        counted = counter_upsert(status_changed(alert.status, payload.status))
+        if counted is not None:
+            await db.execute(counted)
         alert.status = payload.status
         db.add(alert)
-        db.commit()
-        db.refresh(alert)
+        await db.commit()
+        await db.refresh(alert)
         return alert
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
+    except IntegrityError as e:
+        # uq_alerts_active_rule_group: ya hay otra open/ack para esa regla y grupo
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Another active alert exists for this rule and group_key") from e
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Update alert failed") from e
@@ -1,58 +1,182 @@
+from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
-from app.models.event import Event
+from app.api.export import ExportFormat, export_response
+from app.api.responses import columns_for, json_response, rows_json
+from app.archive.store import archive
+from app.db.metric_counters import counter_upsert, events_added
+from app.db.search import SEARCH_RANK_WINDOW, fulltext_match, fulltext_rank, ilike_contains
+from app.db.session import get_async_db
+from app.models.event import Event, meta_text_equals
 from app.schemas.event import EventCreate, EventOut
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 
+def _apply_event_filters(
+    stmt,
+    *,
+    before_id: int | None,
+    ts_from: datetime | None,
+    ts_to: datetime | None,
+    source: str | None,
+    severity_min: int | None,
+    severity_max: int | None,
+    q: str | None,
+    meta_key: str | None,
+    meta_value: str | None,
+    search: str | None,
+):
+    if before_id is not None:
+        stmt = stmt.where(Event.id < before_id)
+    if ts_from is not None:
+        stmt = stmt.where(Event.ts >= ts_from)
+    if ts_to is not None:
+        stmt = stmt.where(Event.ts < ts_to)
+    if source:
+        stmt = stmt.where(Event.source == source)
+    if severity_min is not None:
+        stmt = stmt.where(Event.severity >= severity_min)
+    if severity_max is not None:
+        stmt = stmt.where(Event.severity <= severity_max)
+    if q:
+        stmt = stmt.where(ilike_contains(Event.message, q))
+    if meta_key and meta_value:
+        # Claves promovidas por su columna; el resto, por el índice GIN de meta
+        stmt = stmt.where(meta_text_equals(meta_key, meta_value))
+    elif meta_key:
+        stmt = stmt.where(Event.meta.has_key(meta_key))  # noqa: W601
+    if search:
+        stmt = stmt.where(fulltext_match(Event.search_vector, search))
+    return stmt
+
+
 @router.post("", response_model=EventOut)
-def create_event(payload: EventCreate, db: Session = Depends(get_db)):
+async def create_event(payload: EventCreate, db: AsyncSession = Depends(get_async_db)):
     ev = Event(source=payload.source, severity=payload.severity, message=payload.message)
     db.add(ev)
-    db.commit()
-    db.refresh(ev)
+    await db.execute(counter_upsert(events_added(1)))
+    await db.commit()
+    await db.refresh(ev)
     return ev
 
 
 @router.get("", response_model=list[EventOut])
-def list_events(
+async def list_events(
     limit: int = Query(50, ge=1, le=500),
     before_id: Optional[int] = Query(None, ge=1),
+    ts_from: Optional[datetime] = Query(None, description="ts >= ts_from"),
+    ts_to: Optional[datetime] = Query(None, description="ts < ts_to"),
     source: Optional[str] = None,
     severity_min: Optional[int] = Query(None, ge=0, le=10),
     severity_max: Optional[int] = Query(None, ge=0, le=10),
     q: Optional[str] = None,
     meta_key: Optional[str] = None,
     meta_value: Optional[str] = None,
-    db: Session = Depends(get_db),
+    search: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search (websearch syntax)"),
+    rank: bool = Query(False, description="Order search results by relevance"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    stmt = select(Event)
+    stmt = _apply_event_filters(
+        select(*columns_for(EventOut, Event, rank=None)),
+        before_id=before_id,
+        ts_from=ts_from,
+        ts_to=ts_to,
+        source=source,
+        severity_min=severity_min,
+        severity_max=severity_max,
+        q=q,
+        meta_key=meta_key,
+        meta_value=meta_value,
+        search=search,
+    )
+    if search and rank:
+        return await _ranked(db, stmt, search, limit)
 
-    if before_id is not None:
-        stmt = stmt.where(Event.id < before_id)
+    stmt = stmt.order_by(Event.id.desc()).limit(limit)
+    rows = (await db.execute(stmt)).all()
+    # El archivo frío no tiene índice full-text: search solo mira Postgres
+    if archive is None or search:
+        return json_response(rows_json(rows))
 
-    if source:
-        stmt = stmt.where(Event.source == source)
+    # Archivo frío: solo lo que pueda entrar en esta página (ids por encima del
+    # último de BD si la página ya está llena). Sin segmentos candidatos no se lee nada.
+    floor = rows[-1].id if len(rows) == limit else 0
+    cold = await run_in_threadpool(
+        archive.query,
+        limit,
+        before_id=before_id,
+        ts_from=ts_from,
+        ts_to=ts_to,
+        source=source,
+        severity_min=severity_min,
+        severity_max=severity_max,
+        q=q,
+        meta_key=meta_key,
+        meta_value=meta_value,
+        above_id=floor,
+    )
+    if not cold:
+        return json_response(rows_json(rows))
+    merged = [EventOut.model_validate(r._mapping) for r in rows] + [EventOut.model_validate(ev) for ev in cold]
+    merged.sort(key=lambda ev: ev.id, reverse=True)
+    return merged[:limit]
 
-    if severity_min is not None:
-        stmt = stmt.where(Event.severity >= severity_min)
 
-    if severity_max is not None:
-        stmt = stmt.where(Event.severity <= severity_max)
+@router.get("/export")
+async def export_events(
+    request: Request,
+    format: ExportFormat = Query("ndjson", description="ndjson or csv"),
+    before_id: Optional[int] = Query(None, ge=1),
+    ts_from: Optional[datetime] = Query(None, description="ts >= ts_from"),
+    ts_to: Optional[datetime] = Query(None, description="ts < ts_to"),
+    source: Optional[str] = None,
+    severity_min: Optional[int] = Query(None, ge=0, le=10),
+    severity_max: Optional[int] = Query(None, ge=0, le=10),
+    q: Optional[str] = None,
+    meta_key: Optional[str] = None,
+    meta_value: Optional[str] = None,
+    search: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search (websearch syntax)"),
+):
+    """Todos los eventos que casan con los filtros de GET /events, en streaming (id desc).
 
-    if q:
-        stmt = stmt.where(Event.message.ilike(f"%{q}%"))
+    Solo Postgres: los eventos del archivo frío ya están en NDJSON en ARCHIVE_DIR.
+    """
+    stmt = _apply_event_filters(
+        select(*columns_for(EventOut, Event, exclude={"rank"})),
+        before_id=before_id,
+        ts_from=ts_from,
+        ts_to=ts_to,
+        source=source,
+        severity_min=severity_min,
+        severity_max=severity_max,
+        q=q,
+        meta_key=meta_key,
+        meta_value=meta_value,
+        search=search,
+    )
+    return export_response(request, stmt.order_by(Event.id.desc()), format, "events")
 
-    if meta_key and meta_value:
-        stmt = stmt.where(Event.meta[meta_key].astext == meta_value)
-    elif meta_key:
-        stmt = stmt.where(Event.meta.has_key(meta_key))  # noqa: W601
 
-    stmt = stmt.order_by(Event.id.desc()).limit(limit)
-    return db.execute(stmt).scalars().all()
+async def _ranked(db: AsyncSession, stmt, search: str, limit: int):
+    # Relevancia entre las SEARCH_RANK_WINDOW coincidencias más recientes;
+    # ts_rank se calcula solo sobre esa ventana
+    window = (
+        stmt.with_only_columns(Event.id, Event.ts, Event.search_vector)
+        .order_by(Event.id.desc())
+        .limit(SEARCH_RANK_WINDOW)
+        .subquery()
+    )
+    score = fulltext_rank(window.c.search_vector, search)
+    ranked = (
+        select(*columns_for(EventOut, Event, rank=score))
+        .join(window, and_(Event.id == window.c.id, Event.ts == window.c.ts))
+        .order_by(score.desc(), Event.id.desc())
+        .limit(limit)
+    )
+    return json_response(rows_json(await db.execute(ranked)))
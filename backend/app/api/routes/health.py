@@ -2,14 +2,14 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 
 @router.get("")
-def health(db: Session = Depends(get_db)):
-    db.execute(text("SELECT 1"))
+async def health(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(text("SELECT 1"))
     return {"status": "ok", "db": "ok"}
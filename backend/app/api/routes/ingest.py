@@ -1,152 +1,179 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone, timedelta
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
-
-from app.db.session import get_db
-from app.models.alert import Alert
-from app.models.event import Event
-from app.models.rule import Rule
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from typing import Annotated
+
+from fastapi import APIRouter, Body, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+from app.db.database import SessionLocal
+from app.engine.evaluator import IngestResult, ingest_events
+from app.engine.sharding import shard_router
+from app.engine.write_behind import QueueFull, ingest_queue
 from app.schemas.event import EventOut
-from app.schemas.ingest import IngestPayload
+from app.schemas.ingest import (
+    IngestAlertOut,
+    IngestBatchOut,
+    IngestPayload,
+    NdjsonIngestOut,
+    NdjsonLineError,
+)
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
+MAX_BATCH_EVENTS = 50_000
 
-def _compute_group_key(ev: Event) -> str | None:
-    if not ev.meta:
-        return None
-    return ev.meta.get("host")
+# NDJSON: commit cada N líneas válidas; líneas más largas se rechazan sin bufferizar
+NDJSON_CHUNK_EVENTS = 1000
+NDJSON_MAX_LINE_BYTES = 1024 * 1024
+NDJSON_MAX_ERRORS = 100
 
 
-@router.post("", response_model=EventOut)
-def ingest(payload: IngestPayload, db: Session = Depends(get_db)):
-    now = datetime.now(timezone.utc)
+def _deferred() -> bool:
+    return shard_router.running or ingest_queue.running
 
+
+def _enqueue(payloads: list[IngestPayload]) -> JSONResponse:
+    # Modo write-behind o sharded: se acepta y se guarda después en micro-lotes
+    target = shard_router if shard_router.running else ingest_queue
     try:
-        # 1) Guardar evento
-        ev = Event(
-            ts=now,
-            source=payload.source,
-            severity=payload.severity,
-            message=payload.message,
-            meta=payload.meta,
-        )
-        db.add(ev)
-        db.flush()  # ev.id disponible
-
-        group_key = _compute_group_key(ev)
-
-        # 2) Evaluar reglas habilitadas
-        rules = db.execute(
-            select(Rule).where(Rule.enabled.is_(True)).order_by(Rule.id.asc())
-        ).scalars().all()
-
-        for rule in rules:
-            # 2.1 Source
-            if rule.source and ev.source != rule.source:
-                continue
-
-            # 2.2 Severity
-            if rule.severity_min is not None and ev.severity < rule.severity_min:
-                continue
-
-            # 2.3 Contains
-            if rule.contains and rule.contains.lower() not in (ev.message or "").lower():
-                continue
-
-            # 2.4 Meta match exacto
-            if rule.meta_match:
-                if not ev.meta:
-                    continue
-                if any(ev.meta.get(k) != v for k, v in rule.meta_match.items()):
-                    continue
-
-            # 3) Throttle (ignorando closed)
-            # Decisión: si group_key es None, NO aplicamos throttle (no hay agrupación fiable)
-            if (
-                group_key is not None
-                and rule.throttle_seconds is not None
-                and rule.throttle_seconds > 0
-            ):
-                last_alert_ts = (
-                    db.execute(
-                        select(Alert.created_at)
-                        .where(
-                            Alert.rule_id == rule.id,
-                            Alert.group_key == group_key,
-                            Alert.status.in_(("open", "ack")),
-                        )
-                        .order_by(Alert.created_at.desc())
-                        .limit(1)
-                    )
-                    .scalar_one_or_none()
-                )
-                if last_alert_ts:
-                    delta = (now - last_alert_ts).total_seconds()
-                    if delta < rule.throttle_seconds:
-                        continue
-
-            # 3.5) Anti-duplicado (si hay open/ack, no crear otra)
-            # Decisión: si group_key es None, NO aplicamos anti-duplicado (no hay agrupación fiable)
-            if group_key is not None:
-                existing_active_alert_id = (
-                    db.execute(
-                        select(Alert.id)
-                        .where(
-                            Alert.rule_id == rule.id,
-                            Alert.group_key == group_key,
-                            Alert.status.in_(("open", "ack")),
-                        )
-                        .order_by(Alert.created_at.desc())
-                        .limit(1)
-                    )
-                    .scalar_one_or_none()
-                )
-                if existing_active_alert_id is not None:
-                    continue
-
-            # 4) Threshold
-            if rule.threshold_count is not None and rule.threshold_seconds is not None:
-                if group_key is None:
-                    continue
-
-                window_start = now - timedelta(seconds=rule.threshold_seconds)
-                stmt = select(func.count(Event.id)).where(Event.ts >= window_start)
-
-                if rule.source:
-                    stmt = stmt.where(Event.source == rule.source)
-
-                if rule.severity_min is not None:
-                    stmt = stmt.where(Event.severity >= rule.severity_min)
-
-                if rule.contains:
-                    stmt = stmt.where(Event.message.ilike(f"%{rule.contains}%"))
-
-                if rule.meta_match:
-                    stmt = stmt.where(Event.meta.contains(rule.meta_match))
-
-                stmt = stmt.where(Event.meta.contains({"host": group_key}))
-
-                matched_count = db.execute(stmt).scalar_one()
-                if matched_count < rule.threshold_count:
-                    continue
-
-            # 5) Crear alerta
-            alert = Alert(
-                rule_id=rule.id,
-                event_id=ev.id,
-                title=f"Rule matched: {rule.name}",
-                group_key=group_key,
-            )
-            db.add(alert)
+        target.put_many(payloads)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Ingest queue full", headers={"Retry-After": "1"})
+    return JSONResponse(status_code=202, content={"status": "queued", "queued": len(payloads)})
 
+
+def _ingest_sync(payloads: list[IngestPayload]) -> IngestResult:
+    # El motor es síncrono (cachés y contadores en proceso): sesión sync entera
+    # en el threadpool, sin pasar por la sesión async de la petición
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        result = ingest_events(db, payloads, datetime.now(timezone.utc))
         db.commit()
-        return ev
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
+
+@router.post("", response_model=EventOut)
+async def ingest(payload: IngestPayload):
+    if _deferred():
+        return _enqueue([payload])
+
+    try:
+        result = await run_in_threadpool(_ingest_sync, [payload])
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail="Ingest failed") from e
+    return result.events[0]
+
+
+@router.post("/batch", response_model=IngestBatchOut)
+async def ingest_batch(
+    payloads: Annotated[list[IngestPayload], Body(min_length=1, max_length=MAX_BATCH_EVENTS)],
+):
+    if _deferred():
+        return _enqueue(payloads)
+
+    try:
+        result = await run_in_threadpool(_ingest_sync, payloads)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Batch ingest failed") from e
+
+    return IngestBatchOut(
+        event_ids=[ev.id for ev in result.events],
+        alerts=[
+            IngestAlertOut(
+                id=a.id,
+                rule_id=a.rule_id,
+                event_id=a.event_id,
+                group_key=a.group_key,
+            )
+            for a in result.alerts
+        ],
+    )
+
+
+async def _iter_lines(stream: AsyncIterator[bytes], max_line: int) -> AsyncIterator[tuple[int, bytes | None]]:
+    # (número de línea, contenido) sin acumular el cuerpo; None => línea demasiado larga
+    buf = bytearray()
+    line_no = 0
+    oversized = False
+
+    async for data in stream:
+        buf += data
+        start = 0
+        while (nl := buf.find(b"\n", start)) >= 0:
+            line_no += 1
+            too_long = oversized or nl - start > max_line
+            yield line_no, None if too_long else bytes(buf[start:nl])
+            oversized = False
+            start = nl + 1
+        del buf[:start]
+
+        if len(buf) > max_line:
+            oversized = True
+            buf.clear()
+
+    if buf or oversized:
+        line_no += 1
+        yield line_no, None if oversized or len(buf) > max_line else bytes(buf)
+
+
+@router.post("/ndjson", response_model=NdjsonIngestOut)
+async def ingest_ndjson(request: Request):
+    out = NdjsonIngestOut(accepted=0, rejected=0, errors=[])
+    chunk: list[IngestPayload] = []
+
+    def reject(line_no: int, error: str) -> None:
+        out.rejected += 1
+        if len(out.errors) < NDJSON_MAX_ERRORS:
+            out.errors.append(NdjsonLineError(line=line_no, error=error))
+        else:
+            out.errors_truncated = True
+
+    async def flush(last_line: int) -> None:
+        try:
+            if shard_router.running:
+                # Como /ingest: el estado de threshold de cada group_key vive en su shard
+                shard_router.put_many(chunk)
+            else:
+                await run_in_threadpool(_ingest_sync, chunk)
+        except QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail={"error": "Ingest queue full", "accepted": out.accepted, "line": last_line},
+                headers={"Retry-After": "1"},
+            ) from None
+        except Exception as e:
+            # Lo ya confirmado se queda; el cliente puede reanudar tras `accepted`
+            raise HTTPException(
+                status_code=500,
+                detail={"error": "Ingest failed", "accepted": out.accepted, "line": last_line},
+            ) from e
+        out.accepted += len(chunk)
+        chunk.clear()
+
+    line_no = 0
+    async for line_no, line in _iter_lines(request.stream(), NDJSON_MAX_LINE_BYTES):
+        if line is None:
+            reject(line_no, "line too long")
+            continue
+        if not line.strip():
+            continue
+        try:
+            chunk.append(IngestPayload.model_validate_json(line))
+        except ValidationError as e:
+            reject(line_no, e.errors(include_url=False, include_input=False)[0]["msg"])
+            continue
+        if len(chunk) >= NDJSON_CHUNK_EVENTS:
+            await flush(line_no)
+
+    if chunk:
+        await flush(line_no)
+    return out
@@ -2,49 +2,53 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy import func, select
-from sqlalchemy.orm import Session
-
-from app.db.session import get_db
-from app.models.alert import Alert
-from app.models.event import Event
-from app.models.rule import Rule
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.metric_counters import (
+    ALERTS_BY_STATUS,
+    ALERTS_TOTAL,
+    EVENTS_TOTAL,
+    RULES_ENABLED,
+    RULES_TOTAL,
+    top_groups_query,
+)
+from app.db.session import get_async_db
+from app.engine.sharding import shard_router
+from app.engine.write_behind import ingest_queue
+from app.syslog.server import syslog_server
+from app.models.metric_counter import MetricCounter
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 
 @router.get("")
-def get_metrics(
+async def get_metrics(
     top_groups: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    events_total = db.execute(select(func.count()).select_from(Event)).scalar_one()
-    rules_total = db.execute(select(func.count()).select_from(Rule)).scalar_one()
-    rules_enabled = db.execute(
-        select(func.count()).select_from(Rule).where(Rule.enabled.is_(True))
-    ).scalar_one()
-    alerts_total = db.execute(select(func.count()).select_from(Alert)).scalar_one()
-
-    rows_status = db.execute(
-        select(Alert.status, func.count())
-        .group_by(Alert.status)
-        .order_by(func.count().desc())
-    ).all()
-    alerts_by_status = {status: count for status, count in rows_status}
-
-    rows_group = db.execute(
-        select(Alert.group_key, func.count())
-        .where(Alert.group_key.is_not(None))
-        .group_by(Alert.group_key)
-        .order_by(func.count().desc())
-        .limit(top_groups)
-    ).all()
-    alerts_by_group_key = {group_key: count for group_key, count in rows_group}
+    # Contadores mantenidos por ingest, alertas y reglas (app.db.metric_counters):
+    # unas pocas filas por contador en vez de recorrer events y alerts
+    value = func.sum(MetricCounter.value)
+    rows = (await db.execute(
+        select(MetricCounter.name, MetricCounter.key, value)
+        .where(MetricCounter.name.in_((EVENTS_TOTAL, RULES_TOTAL, RULES_ENABLED, ALERTS_TOTAL, ALERTS_BY_STATUS)))
+        .group_by(MetricCounter.name, MetricCounter.key)
+        .order_by(value.desc())
+    )).all()
+    totals = {name: int(n) for name, key, n in rows if name != ALERTS_BY_STATUS}
+    alerts_by_status = {key: int(n) for name, key, n in rows if name == ALERTS_BY_STATUS and n > 0}
+
+    rows_group = (await db.execute(top_groups_query(top_groups))).all()
+    alerts_by_group_key = {group_key: int(n) for group_key, n in rows_group}
 
     return {
-        "events_total": events_total,
-        "rules_total": rules_total,
-        "rules_enabled": rules_enabled,
-        "alerts_total": alerts_total,
+        "events_total": totals.get(EVENTS_TOTAL, 0),
+        "rules_total": totals.get(RULES_TOTAL, 0),
+        "rules_enabled": totals.get(RULES_ENABLED, 0),
+        "alerts_total": totals.get(ALERTS_TOTAL, 0),
         "alerts_by_status": alerts_by_status,
         "alerts_by_group_key_top": alerts_by_group_key,
+        "ingest_queue": ingest_queue.stats(),
+        "ingest_shards": shard_router.stats(),
+        "syslog": {**syslog_server.stats.as_dict(), "queue": syslog_server.queue.stats()},
     }
@@ -7,7 +7,10 @@ from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.api.responses import columns_for, json_response, rows_json
+from app.db.metric_counters import bump, rule_added
 from app.db.session import get_db
+from app.engine import rules_cache
 from app.models.rule import Rule
 from app.schemas.rule import RuleCreate, RuleOut
 
@@ -30,11 +33,16 @@ def create_rule(payload: RuleCreate, db: Session = Depends(get_db)):
 
     db.add(rule)
     try:
+        bump(db, rule_added(payload.enabled))
+        rules_cache.notify_rules_changed(db)
         db.commit()
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=409, detail="Rule name already exists")
 
+    # Este worker no espera al NOTIFY
+    rules_cache.invalidate()
+
     db.refresh(rule)
     return rule
 
@@ -44,5 +52,5 @@ def list_rules(
     limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
 ):
-    stmt = select(Rule).order_by(Rule.id.desc()).limit(limit)
-    return db.execute(stmt).scalars().all()
+    stmt = select(*columns_for(RuleOut, Rule)).order_by(Rule.id.desc()).limit(limit)
+    return json_response(rows_json(db.execute(stmt)))
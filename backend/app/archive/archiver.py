@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, exists, func, select, text
+from sqlalchemy.engine import Engine
+
+from app.archive.store import ARCHIVE_BLOCK_EVENTS, Archive, SegmentWriter, get_codec, iso_ts, segment_path
+from app.db.metric_counters import bump, events_added
+from app.models.alert import Alert
+from app.models.event import Event
+
+logger = logging.getLogger(__name__)
+
+# Ventana caliente: lo anterior a N días sale de Postgres al archivo
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "14"))
+
+_FETCH_ROWS = 10_000
+_DELETE_CHUNK = 10_000
+_ADVISORY_LOCK = 0x5E1E0017
+
+
+@dataclass
+class ArchiveRun:
+    segments: list[str] = field(default_factory=list)
+    archived: int = 0
+
+
+def _day(ts: datetime) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    return datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+
+
+def _event_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "ts": iso_ts(row.ts),
+        "source": row.source,
+        "severity": row.severity,
+        "message": row.message,
+        "meta": row.meta,
+        "created_at": iso_ts(row.created_at),
+    }
+
+
+def archive_events(
+    engine: Engine,
+    archive: Archive,
+    cutoff: datetime,
+    codec: str,
+    block_events: int = ARCHIVE_BLOCK_EVENTS,
+) -> ArchiveRun:
+    """Mueve a segmentos (uno por día y source) los eventos con ts < cutoff.
+
+    Los eventos a los que apunta alguna alerta se quedan en Postgres (la FK
+    y la vista de alertas los necesitan). Orden por segmento: fichero
+    escrito y fsync -> entrada en el manifest -> DELETE en BD. Si algo falla
+    a medias, como mucho un evento está a la vez en BD y en archivo, nunca
+    en ninguno; repetir la pasada reescribe el mismo segmento.
+    """
+    ext = get_codec(codec).ext
+    referenced = exists().where(and_(Alert.event_id == Event.id, Alert.event_ts == Event.ts))
+    day = func.date_trunc("day", func.timezone("UTC", Event.ts))
+    stmt = (
+        select(Event.id, Event.ts, Event.source, Event.severity, Event.message, Event.meta, Event.created_at)
+        .where(Event.ts < cutoff, ~referenced)
+        .order_by(day, Event.source, Event.id)
+    )
+
+    run = ArchiveRun()
+    with engine.connect() as lock_conn:
+        # Un solo archivador a la vez; el lock de sesión dura toda la pasada
+        if not lock_conn.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK}):
+            logger.info("archiver already running elsewhere")
+            return run
+        try:
+            with engine.connect() as read_conn:
+                result = read_conn.execution_options(yield_per=_FETCH_ROWS).execute(stmt)
+                current: tuple[datetime, str] | None = None
+                writer: SegmentWriter | None = None
+                ids: list[int] = []
+                try:
+                    for row in result:
+                        key = (_day(row.ts), row.source)
+                        if key != current:
+                            if writer is not None:
+                                _commit_segment(engine, archive, writer, current, ids, run)
+                            current = key
+                            ids = []
+                            rel = segment_path(key[0], key[1], row.id, ext)
+                            writer = SegmentWriter(archive.root, rel, codec, block_events)
+                        writer.write(_event_dict(row))
+                        ids.append(row.id)
+                    if writer is not None:
+                        _commit_segment(engine, archive, writer, current, ids, run)
+                        writer = None
+                except BaseException:
+                    if writer is not None:
+                        writer.abort()
+                    raise
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK})
+    return run
+
+
+def _commit_segment(
+    engine: Engine,
+    archive: Archive,
+    writer: SegmentWriter,
+    key: tuple[datetime, str],
+    ids: list[int],
+    run: ArchiveRun,
+) -> None:
+    day, source = key
+    segment = writer.close(f"{day:%Y-%m-%d}", source)
+    archive.add(segment)
+
+    # Acotado al día: el DELETE solo toca la partición de ese día
+    with engine.begin() as conn:
+        deleted = 0
+        for i in range(0, len(ids), _DELETE_CHUNK):
+            deleted += conn.execute(
+                delete(Event).where(
+                    Event.ts >= day,
+                    Event.ts < day + timedelta(days=1),
+                    Event.id.in_(ids[i : i + _DELETE_CHUNK]),
+                )
+            ).rowcount
+        bump(conn, events_added(-deleted))
+    run.segments.append(segment.path)
+    run.archived += segment.count
+    logger.info("archived %d events into %s", segment.count, segment.path)
+
+
+def prune_archive(archive: Archive, now: datetime, keep_days: int) -> list[str]:
+    # Retención del archivo: segmentos de días anteriores a now - keep_days
+    return archive.remove_before(f"{now - timedelta(days=keep_days):%Y-%m-%d}")
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import threading
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+# Vacío => archivo frío desactivado
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+# "gzip" (stdlib) o "zstd" (requiere el paquete zstandard)
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "gzip")
+# Eventos por bloque comprimido: granularidad del índice disperso
+ARCHIVE_BLOCK_EVENTS = int(os.getenv("ARCHIVE_BLOCK_EVENTS", "1000"))
+
+MANIFEST = "manifest.json"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class _Gzip:
+    ext = ".ndjson.gz"
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class _Zstd:
+    ext = ".ndjson.zst"
+
+    def __init__(self) -> None:
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("ARCHIVE_CODEC=zstd requires the 'zstandard' package") from None
+        self._c = zstandard.ZstdCompressor(level=6)
+        self._d = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._d.decompress(data)
+
+
+def get_codec(name: str):
+    if name == "gzip":
+        return _Gzip()
+    if name == "zstd":
+        return _Zstd()
+    raise ValueError(f"unknown archive codec: {name}")
+
+
+@dataclass(frozen=True)
+class Block:
+    # Entrada del índice disperso: un bloque comprimido independiente del segmento
+    offset: int
+    length: int
+    count: int
+    first_id: int
+    last_id: int
+    min_ts: str
+    max_ts: str
+
+
+@dataclass(frozen=True)
+class Segment:
+    path: str
+    codec: str
+    day: str
+    source: str
+    count: int
+    min_id: int
+    max_id: int
+    min_ts: str
+    max_ts: str
+    blocks: tuple[Block, ...]
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> Segment:
+        return cls(**{**d, "blocks": tuple(Block(**b) for b in d["blocks"])})
+
+
+def segment_path(day: datetime, source: str, first_id: int, ext: str) -> str:
+    # Un segmento por día y source; first_id lo hace único si un día se archiva en varias pasadas
+    return f"{day:%Y/%m/%d}/{_UNSAFE.sub('_', source)}-{first_id}{ext}"
+
+
+class SegmentWriter:
+    """Escribe un segmento NDJSON como bloques comprimidos concatenados.
+
+    Cada bloque es un miembro gzip (o frame zstd) completo, así que se puede
+    leer suelto a partir de su offset; el fichero entero sigue siendo un
+    .gz/.zst válido para zcat/zstdcat.
+    """
+
+    def __init__(self, root: Path, rel_path: str, codec_name: str, block_events: int = ARCHIVE_BLOCK_EVENTS):
+        self.root = root
+        self.rel_path = rel_path
+        self.codec_name = codec_name
+        self._codec = get_codec(codec_name)
+        self._block_events = block_events
+        self._final = root / rel_path
+        self._final.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self._final.with_name(self._final.name + ".tmp")
+        self._fh = open(self._tmp, "wb")
+        self._lines: list[bytes] = []
+        self._ids: list[int] = []
+        self._ts: list[str] = []
+        self._blocks: list[Block] = []
+
+    def write(self, event: dict[str, Any]) -> None:
+        self._lines.append(json.dumps(event, separators=(",", ":"), default=str).encode())
+        self._ids.append(event["id"])
+        self._ts.append(event["ts"])
+        if len(self._lines) >= self._block_events:
+            self._flush_block()
+
+    def _flush_block(self) -> None:
+        if not self._lines:
+            return
+        data = self._codec.compress(b"\n".join(self._lines) + b"\n")
+        offset = self._fh.tell()
+        self._fh.write(data)
+        self._blocks.append(
+            Block(
+                offset=offset,
+                length=len(data),
+                count=len(self._lines),
+                first_id=self._ids[0],
+                last_id=self._ids[-1],
+                min_ts=min(self._ts),
+                max_ts=max(self._ts),
+            )
+        )
+        self._lines, self._ids, self._ts = [], [], []
+
+    def close(self, day: str, source: str) -> Segment:
+        self._flush_block()
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        os.replace(self._tmp, self._final)
+        blocks = tuple(self._blocks)
+        return Segment(
+            path=self.rel_path,
+            codec=self.codec_name,
+            day=day,
+            source=source,
+            count=sum(b.count for b in blocks),
+            min_id=min(b.first_id for b in blocks),
+            max_id=max(b.last_id for b in blocks),
+            min_ts=min(b.min_ts for b in blocks),
+            max_ts=max(b.max_ts for b in blocks),
+            blocks=blocks,
+        )
+
+    def abort(self) -> None:
+        self._fh.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class Archive:
+    """Directorio de segmentos + manifest.json (índice de segmentos y sus bloques)."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._cache: tuple[float, dict[str, Segment]] | None = None
+
+    def segments(self) -> dict[str, Segment]:
+        path = self.root / MANIFEST
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        cached = self._cache
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as fh:
+            segs = {d["path"]: Segment.from_dict(d) for d in json.load(fh)}
+        self._cache = (mtime, segs)
+        return segs
+
+    def _write_manifest(self, segs: dict[str, Segment]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / (MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump([asdict(s) for s in sorted(segs.values(), key=lambda s: s.path)], fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.root / MANIFEST)
+        self._cache = None
+
+    def add(self, segment: Segment) -> None:
+        # Por ruta: volver a archivar el mismo (día, source, first_id) lo sustituye
+        with self._lock:
+            segs = dict(self.segments())
+            segs[segment.path] = segment
+            self._write_manifest(segs)
+
+    def remove_before(self, day: str) -> list[str]:
+        with self._lock:
+            segs = dict(self.segments())
+            gone = [p for p, s in segs.items() if s.day < day]
+            for p in gone:
+                del segs[p]
+            self._write_manifest(segs)
+        for p in gone:
+            (self.root / p).unlink(missing_ok=True)
+        return gone
+
+    def read_blocks(self, segment: Segment, blocks: list[Block]) -> Iterator[dict[str, Any]]:
+        # Solo se descomprimen los bloques pedidos
+        codec = get_codec(segment.codec)
+        with open(self.root / segment.path, "rb") as fh:
+            for b in blocks:
+                fh.seek(b.offset)
+                for line in codec.decompress(fh.read(b.length)).splitlines():
+                    yield json.loads(line)
+
+    def query(
+        self,
+        limit: int,
+        before_id: int | None = None,
+        ts_from: datetime | None = None,
+        ts_to: datetime | None = None,
+        source: str | None = None,
+        severity_min: int | None = None,
+        severity_max: int | None = None,
+        q: str | None = None,
+        meta_key: str | None = None,
+        meta_value: str | None = None,
+        above_id: int = 0,
+    ) -> list[dict[str, Any]]:
+        """Mismos filtros que GET /events, orden id desc, solo ids en (above_id, before_id)."""
+        lo = iso_ts(ts_from) if ts_from else None
+        hi = iso_ts(ts_to) if ts_to else None
+        q_lower = q.lower() if q else None
+
+        def block_ok(min_id: int, max_id: int, min_ts: str, max_ts: str) -> bool:
+            if before_id is not None and min_id >= before_id:
+                return False
+            if max_id <= above_id:
+                return False
+            # ts en ISO UTC: se comparan como texto
+            if lo is not None and max_ts < lo:
+                return False
+            if hi is not None and min_ts >= hi:
+                return False
+            return True
+
+        def event_ok(ev: dict[str, Any]) -> bool:
+            if before_id is not None and ev["id"] >= before_id:
+                return False
+            if ev["id"] <= above_id:
+                return False
+            if lo is not None and ev["ts"] < lo:
+                return False
+            if hi is not None and ev["ts"] >= hi:
+                return False
+            if severity_min is not None and ev["severity"] < severity_min:
+                return False
+            if severity_max is not None and ev["severity"] > severity_max:
+                return False
+            if q_lower is not None and q_lower not in ev["message"].lower():
+                return False
+            if meta_key:
+                meta = ev.get("meta") or {}
+                if meta_key not in meta:
+                    return False
+                if meta_value and _as_text(meta[meta_key]) != meta_value:
+                    return False
+            return True
+
+        candidates = sorted(
+            (
+                s
+                for s in self.segments().values()
+                if (not source or s.source == source) and block_ok(s.min_id, s.max_id, s.min_ts, s.max_ts)
+            ),
+            key=lambda s: s.max_id,
+            reverse=True,
+        )
+
+        out: list[dict[str, Any]] = []
+        for seg in candidates:
+            # Ningún segmento restante puede mejorar la página ya completa
+            if len(out) >= limit and seg.max_id < out[-1]["id"]:
+                break
+            blocks = [b for b in seg.blocks if block_ok(b.first_id, b.last_id, b.min_ts, b.max_ts)]
+            out.extend(ev for ev in self.read_blocks(seg, blocks) if event_ok(ev))
+            out.sort(key=lambda ev: ev["id"], reverse=True)
+            del out[limit:]
+        return out
+
+def iso_ts(ts: datetime) -> str:
+    # Formato fijo en UTC: así los ts del archivo se comparan como texto
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _as_text(value: Any) -> str:
+    # Igual que meta ->> key en Postgres
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(", ", ": "))
+
+
+archive = Archive(ARCHIVE_DIR) if ARCHIVE_DIR else None
@@ -0,0 +1,44 @@
+# Archivo frío de eventos: python -m app.cli.archive
+#
+# Pensado para cron (diario): mueve a segmentos comprimidos lo que sale de la ventana caliente.
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from app.archive.archiver import ARCHIVE_AFTER_DAYS, archive_events, prune_archive
+from app.archive.store import ARCHIVE_BLOCK_EVENTS, ARCHIVE_CODEC, ARCHIVE_DIR, Archive
+from app.db.database import engine
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.archive",
+        description="Move events older than the hot window into compressed NDJSON segments.",
+    )
+    ap.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory (default: ARCHIVE_DIR)")
+    ap.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    ap.add_argument("--codec", choices=("gzip", "zstd"), default=ARCHIVE_CODEC)
+    ap.add_argument("--block-events", type=int, default=ARCHIVE_BLOCK_EVENTS, help="events per compressed block")
+    ap.add_argument("--prune-days", type=int, default=0, help="delete segments older than N days (0 = keep)")
+    args = ap.parse_args(argv)
+
+    if not args.dir:
+        print("set ARCHIVE_DIR or --dir", file=sys.stderr)
+        return 2
+
+    now = datetime.now(timezone.utc)
+    store = Archive(args.dir)
+    run = archive_events(engine, store, now - timedelta(days=args.older_than_days), args.codec, args.block_events)
+    print(f"archived {run.archived} events into {len(run.segments)} segments")
+
+    if args.prune_days > 0:
+        for path in prune_archive(store, now, args.prune_days):
+            print(f"pruned {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+# Carga masiva de eventos históricos con COPY binario: python -m app.cli.backfill
+#
+# No evalúa reglas: las alertas de lo cargado se sacan después con un replay.
+# Crea antes de cargarlas las particiones de events que falten para los ts del fichero.
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import contextlib
+import csv
+import json
+import sys
+import time
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from typing import IO, Any
+
+import psycopg
+from sqlalchemy.engine import make_url
+
+from app.db.database import DATABASE_URL, engine
+from app.db.metric_counters import EVENTS_TOTAL
+from app.db.partitions import ensure_range, list_partitions, period_end, period_start, run_step
+from app.schemas.ingest import has_nul
+
+COPY_SQL = "COPY events (ts, source, severity, message, meta) FROM STDIN (FORMAT BINARY)"
+COPY_TYPES = ["timestamptz", "varchar", "int4", "text", "jsonb"]
+# events_total de /metrics, en la transacción de cada COPY (ver app.db.metric_counters)
+COUNTER_SQL = (
+    "INSERT INTO metric_counters (name, key, slot, value) VALUES (%s, '', 0, %s) "
+    "ON CONFLICT (name, key, slot) DO UPDATE SET value = metric_counters.value + EXCLUDED.value"
+)
+
+# Índices secundarios (los que no respaldan una constraint): se pueden tirar y recrear
+_SECONDARY_INDEXES_SQL = """
+SELECT i.relname, pg_get_indexdef(i.oid)
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+WHERE x.indrelid = 'events'::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+ORDER BY i.relname
+"""
+
+Row = tuple[datetime, str, int, str, Any]
+
+
+class RowError(ValueError):
+    pass
+
+
+def _parse_ts(value: Any, default: datetime) -> datetime:
+    if value is None or value == "":
+        return default
+    # bool es int en Python: true no es un epoch
+    if isinstance(value, bool):
+        raise RowError(f"invalid ts: {value!r}")
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RowError(f"invalid ts: {value!r}") from None
+    # Sin zona => UTC, igual que el resto del SIEM
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _parse_severity(value: Any) -> int:
+    # 7, 7.0 o "7" (CSV); no 3.7 (como IngestPayload) ni true, que en un fichero es un error
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            raise RowError("severity must be an integer") from None
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RowError("severity must be an integer")
+    if not 0 <= value <= 10:
+        raise RowError("severity must be between 0 and 10")
+    return value
+
+
+def to_row(rec: dict[str, Any], default_ts: datetime) -> Row:
+    # Mismas reglas que IngestPayload, sin construir el modelo
+    source = rec.get("source")
+    if not isinstance(source, str) or not 1 <= len(source) <= 64:
+        raise RowError("source must be a 1..64 char string")
+    severity = _parse_severity(rec.get("severity"))
+    message = rec.get("message")
+    if not isinstance(message, str) or not message:
+        raise RowError("message must be a non-empty string")
+    meta = rec.get("meta")
+    if meta is not None and not isinstance(meta, dict):
+        raise RowError("meta must be an object")
+    # Un NUL abortaría el COPY del bloque entero
+    if has_nul(source) or has_nul(message) or has_nul(meta):
+        raise RowError("fields must not contain NUL characters")
+    return _parse_ts(rec.get("ts"), default_ts), source, severity, message, meta
+
+
+def iter_ndjson(fh: IO[str]) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    for line_no, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"invalid json: {e}"
+            continue
+        yield line_no, rec if isinstance(rec, dict) else "line is not a JSON object"
+
+
+def iter_csv(fh: IO[str]) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    # Cabecera obligatoria: ts,source,severity,message,meta (meta como JSON, ts opcional)
+    reader = csv.DictReader(fh)
+    for rec in reader:
+        meta = rec.get("meta")
+        if meta:
+            try:
+                rec["meta"] = json.loads(meta)
+            except ValueError as e:
+                yield reader.line_num, f"invalid meta json: {e}"
+                continue
+        else:
+            rec["meta"] = None
+        yield reader.line_num, rec
+
+
+def _detect_format(path: str, fmt: str) -> str:
+    if fmt != "auto":
+        return fmt
+    return "csv" if path.endswith((".csv", ".csv.gz")) else "ndjson"
+
+
+def _open(path: str) -> contextlib.AbstractContextManager[IO[str]]:
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin)
+    if path.endswith(".gz"):
+        import gzip
+
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+class PartitionCover:
+    """Rangos de ts con partición propia. Lo que no cae en ellos iría a la DEFAULT:
+    sin poda y fuera de la retención por particiones."""
+
+    def __init__(self):
+        self.created: list[str] = []
+        self._starts: list[datetime] = []
+        self._ends: list[datetime] = []
+        # Periodos que no se pueden crear (la DEFAULT ya tiene filas ahí)
+        self._skipped: set[datetime] = set()
+        self._refresh()
+
+    def covers(self, ts: datetime) -> bool:
+        i = bisect.bisect_right(self._starts, ts) - 1
+        return (i >= 0 and ts < self._ends[i]) or period_start(ts) in self._skipped
+
+    def add(self, ts: datetime) -> None:
+        start = period_start(ts)
+        with engine.connect() as conn:
+            self.created += run_step(conn, ensure_range, start, period_end(start))
+        self._refresh()
+        if not self.covers(ts):
+            self._skipped.add(start)
+
+    def _refresh(self) -> None:
+        with engine.begin() as conn:
+            parts, _ = list_partitions(conn)
+        self._starts = [p.start for p in parts]
+        self._ends = [p.end for p in parts]
+
+
+class Progress:
+    def __init__(self, every: float, out: IO[str] = sys.stderr):
+        self.every = every
+        self.out = out
+        self.started = time.monotonic()
+        self._last = self.started
+        self.loaded = 0
+        self.rejected = 0
+
+    def tick(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last < self.every:
+            return
+        self._last = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"loaded={self.loaded} rejected={self.rejected} "
+            f"elapsed={elapsed:.1f}s rate={self.loaded / elapsed:,.0f} rows/s",
+            file=self.out,
+            flush=True,
+        )
+
+
+def _conninfo(url: str) -> str:
+    # postgresql+psycopg://... -> postgresql://... (libpq)
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def drop_secondary_indexes(conn: psycopg.Connection) -> list[tuple[str, str]]:
+    # events está particionada: pg_get_indexdef da "ON ONLY", que recrearía el
+    # índice solo en el padre (inválido) y sin los de cada partición. Sin ONLY,
+    # el CREATE INDEX se propaga a todas las particiones (también las nuevas).
+    indexes = [(name, ddl.replace(" ON ONLY ", " ON ", 1)) for name, ddl in conn.execute(_SECONDARY_INDEXES_SQL)]
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+    conn.commit()
+    return indexes
+
+
+def create_indexes(conn: psycopg.Connection, indexes: list[tuple[str, str]], out: IO[str]) -> None:
+    for name, ddl in indexes:
+        started = time.monotonic()
+        conn.execute(ddl)
+        conn.commit()
+        print(f"rebuilt {name} in {time.monotonic() - started:.1f}s", file=out, flush=True)
+
+
+def load(
+    conn: psycopg.Connection,
+    records: Iterator[tuple[int, dict[str, Any] | str]],
+    progress: Progress,
+    commit_rows: int,
+    max_errors: int,
+    label: str,
+    partitions: PartitionCover | None = None,
+) -> None:
+    # Un COPY por bloque de commit_rows: si falla a mitad, lo ya confirmado se queda.
+    # Una fila de un periodo sin partición corta el bloque: se crea la partición
+    # (fuera de la transacción del COPY) y el siguiente bloque empieza por ella.
+    default_ts = datetime.now(timezone.utc)
+    pending: Row | None = None
+    exhausted = False
+    while not exhausted:
+        exhausted = True
+        in_block = 0
+        with conn.cursor() as cur, cur.copy(COPY_SQL) as copy:
+            copy.set_types(COPY_TYPES)
+            if pending is not None:
+                copy.write_row(pending)
+                in_block += 1
+                pending = None
+            for line_no, rec in records:
+                try:
+                    if isinstance(rec, str):
+                        raise RowError(rec)
+                    row = to_row(rec, default_ts)
+                except RowError as e:
+                    progress.rejected += 1
+                    if progress.rejected <= max_errors:
+                        print(f"{label}:{line_no}: {e}", file=progress.out)
+                    continue
+                if partitions is not None and not partitions.covers(row[0]):
+                    pending = row
+                    exhausted = False
+                    break
+                copy.write_row(row)
+                in_block += 1
+                if in_block >= commit_rows:
+                    exhausted = False
+                    break
+        if in_block:
+            conn.execute(COUNTER_SQL, (EVENTS_TOTAL, in_block))
+        conn.commit()
+        progress.loaded += in_block
+        progress.tick()
+        if pending is not None:
+            partitions.add(pending[0])
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.backfill",
+        description="Bulk-load historical events with binary COPY (no rule evaluation).",
+    )
+    ap.add_argument("files", nargs="+", help="NDJSON/CSV files ('-' = stdin, .gz allowed)")
+    ap.add_argument("--format", choices=("auto", "ndjson", "csv"), default="auto")
+    ap.add_argument("--commit-rows", type=int, default=1_000_000, help="rows per COPY/transaction")
+    ap.add_argument("--rebuild-indexes", action="store_true", help="drop secondary indexes during the load")
+    ap.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    ap.add_argument("--max-errors", type=int, default=100, help="rejected rows printed (all are counted)")
+    args = ap.parse_args(argv)
+
+    progress = Progress(args.progress_every)
+    partitions = PartitionCover()
+    with psycopg.connect(_conninfo(DATABASE_URL)) as conn:
+        conn.execute("SET synchronous_commit = off")
+        indexes = drop_secondary_indexes(conn) if args.rebuild_indexes else []
+        try:
+            for path in args.files:
+                fmt = _detect_format(path, args.format)
+                with _open(path) as fh:
+                    records = iter_csv(fh) if fmt == "csv" else iter_ndjson(fh)
+                    load(conn, records, progress, args.commit_rows, args.max_errors, path, partitions)
+        finally:
+            # También si la carga falla: la tabla no se queda sin índices
+            conn.rollback()
+            create_indexes(conn, indexes, progress.out)
+
+        conn.execute("ANALYZE events")
+        conn.commit()
+
+    for name in partitions.created:
+        print(f"created partition {name}", file=progress.out)
+
+    progress.tick(force=True)
+    return 0 if progress.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# Micro-benchmark de serialización de /alerts/ui: python -m app.cli.bench_json
+#
+# Mide solo la parte Python (filas ya leídas de BD -> bytes JSON), no el SQL.
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app.api.responses import ORJSONResponse, columns_for, rows_json
+from app.db.database import SessionLocal
+from app.models.alert import Alert
+from app.schemas.alert import AlertOut, AlertUIOut
+
+
+def _ui_extra(alert: Alert) -> dict:
+    return {name: getattr(alert, name) for name in AlertUIOut.model_fields.keys() - AlertOut.model_fields.keys()}
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.bench_json",
+        description="Compare the model-validated and Core-row JSON paths for an /alerts/ui page.",
+    )
+    ap.add_argument("--rows", type=int, default=500, help="rows per page (default 500, the API maximum)")
+    ap.add_argument("--repeat", type=int, default=200, help="pages serialized per path")
+    args = ap.parse_args(argv)
+
+    with SessionLocal() as db:
+        stmt = select(Alert).order_by(Alert.created_at.desc(), Alert.id.desc()).limit(args.rows)
+        entities = db.execute(stmt).scalars().all()
+        core_stmt = select(*columns_for(AlertUIOut, Alert)).order_by(Alert.created_at.desc(), Alert.id.desc())
+        rows = db.execute(core_stmt.limit(args.rows)).all()
+    if not rows:
+        print("no alerts to serialize", file=sys.stderr)
+        return 1
+
+    page_adapter = TypeAdapter(list[AlertUIOut])
+
+    def before() -> bytes:
+        # Camino anterior: AlertOut -> dict -> AlertUIOut por fila, response_model
+        # valida la lista otra vez y json estándar
+        items = [AlertUIOut.model_validate(AlertOut.model_validate(a).model_dump() | _ui_extra(a)) for a in entities]
+        validated = page_adapter.validate_python(items, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def model_once() -> bytes:
+        # Un modelo por fila, serializado por pydantic-core
+        return page_adapter.dump_json(page_adapter.validate_python(entities, from_attributes=True))
+
+    def core_rows() -> bytes:
+        # Camino rápido: fila Core con la forma del schema -> orjson
+        return ORJSONResponse(rows_json(rows)).body
+
+    # Mismo JSON por los tres caminos
+    assert json.loads(before()) == json.loads(model_once()) == json.loads(core_rows())
+
+    print(f"{len(rows)} rows x {args.repeat} pages")
+    baseline = None
+    for name, fn in (("before", before), ("model_once", model_once), ("core_rows", core_rows)):
+        seconds = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat
+        baseline = baseline or seconds
+        print(f"  {name:<11} {seconds * 1000:8.2f} ms/page  x{baseline / seconds:5.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
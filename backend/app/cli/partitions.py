@@ -0,0 +1,54 @@
+# Mantenimiento de particiones de events: python -m app.cli.partitions
+#
+# Lo mismo que hace la API cada EVENTS_PARTITION_CHECK_SECONDS, para cron o a mano.
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from app.db.database import engine
+from app.db.partitions import (
+    EVENTS_PARTITION_INTERVAL,
+    EVENTS_PARTITIONS_AHEAD,
+    EVENTS_RETENTION_MODE,
+    list_partitions,
+    run_maintenance,
+)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.partitions",
+        description="Create upcoming events partitions and apply partition-drop retention.",
+    )
+    ap.add_argument("--interval", choices=("day", "week"), default=EVENTS_PARTITION_INTERVAL)
+    ap.add_argument("--ahead", type=int, default=EVENTS_PARTITIONS_AHEAD, help="periods to create in advance")
+    ap.add_argument("--retention-days", type=int, default=0, help="remove partitions older than N days (0 = keep)")
+    ap.add_argument("--mode", choices=("drop", "detach"), default=EVENTS_RETENTION_MODE)
+    ap.add_argument("--list", action="store_true", help="only list partitions")
+    args = ap.parse_args(argv)
+
+    if not args.list:
+        now = datetime.now(timezone.utc)
+        done = run_maintenance(engine, now, args.interval, args.ahead, args.retention_days, args.mode)
+        if done is None:
+            print("maintenance already running in another process", file=sys.stderr)
+            return 1
+        for name in done["created"]:
+            print(f"created {name}")
+        for name in done["removed"]:
+            print(f"{'dropped' if args.mode == 'drop' else 'detached'} {name}")
+
+    with engine.begin() as conn:
+        parts, has_default = list_partitions(conn)
+        for p in parts:
+            print(f"{p.name}  {p.start.isoformat()} .. {p.end.isoformat()}")
+        if has_default:
+            print("events_default  DEFAULT")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# Backtesting de reglas sobre eventos guardados: python -m app.cli.replay
+#
+# No escribe alertas; imprime cuántas habría generado cada regla.
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from app.db.database import SessionLocal, engine
+from app.engine.replay import REPLAY_SAMPLES, load_rules, replay
+
+
+def _parse_dt(value: str) -> datetime:
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.replay",
+        description="Replay stored events through the rule engine without writing alerts.",
+    )
+    ap.add_argument("--rule", type=int, action="append", dest="rule_ids",
+                    help="rule id to test (repeatable; disabled rules allowed). Default: all enabled rules")
+    ap.add_argument("--days", type=float, default=30, help="look-back window when --since is not given")
+    ap.add_argument("--since", type=_parse_dt, help="ISO start (inclusive)")
+    ap.add_argument("--until", type=_parse_dt, help="ISO end (exclusive, default now)")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--samples", type=int, default=REPLAY_SAMPLES, help="sample alerts per rule")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    until = args.until or datetime.now(timezone.utc)
+    since = args.since or until - timedelta(days=args.days)
+
+    with SessionLocal() as db:
+        rules = load_rules(db, args.rule_ids)
+    if not rules:
+        print("no rules to replay", file=sys.stderr)
+        return 1
+    missing = set(args.rule_ids or ()) - {r.id for r in rules}
+    if missing:
+        print(f"unknown rule ids: {sorted(missing)}", file=sys.stderr)
+        return 1
+
+    report = replay(engine, rules, since, until, workers=args.workers, sample_size=args.samples)
+
+    if args.json:
+        json.dump(report.as_dict(), sys.stdout, indent=2)
+        print()
+        return 0
+
+    out = report.as_dict()
+    print(f"{out['events_scanned']} events in {out['seconds']}s ({out['events_per_second']} ev/s), "
+          f"{since.isoformat()} .. {until.isoformat()}")
+    for r in out["rules"]:
+        print(f"  #{r['rule_id']} {r['name']}: {r['alerts']} alerts / {r['matched']} matches")
+        for s in r["samples"]:
+            print(f"      {s['ts']}  event={s['event_id']}  group_key={s['group_key']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
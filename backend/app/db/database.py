@@ -1,14 +1,43 @@
 import os
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL no está definido")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# DB_ASYNC=0 => las rutas async usan sesiones sync en el threadpool (modo anterior)
+DB_ASYNC = os.getenv("DB_ASYNC", "1") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# DB_POOL_* es el pool de las rutas. Con DB_ASYNC=1 el sync solo lo usan el ingest
+# (threadpool) y los hilos de fondo: uno más pequeño, para no doblar las conexiones por worker
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "5" if DB_ASYNC else str(DB_POOL_SIZE)))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", "5" if DB_ASYNC else str(DB_MAX_OVERFLOW)))
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_SYNC_POOL_SIZE,
+    max_overflow=DB_SYNC_MAX_OVERFLOW,
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# psycopg 3 sirve para ambos: misma URL, el dialecto async se elige solo
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    # expire_on_commit=False: en async no hay lazy-load al serializar tras el commit
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
 def test_db_connection() -> None:
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
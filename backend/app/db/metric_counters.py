@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+from collections.abc import Iterable
+
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.alert import Alert
+from app.models.event import Event
+from app.models.metric_counter import MetricCounter
+from app.models.rule import Rule
+
+logger = logging.getLogger(__name__)
+
+# Filas por contador: más slots, menos espera entre ingest concurrentes
+METRIC_COUNTER_SLOTS = int(os.getenv("METRIC_COUNTER_SLOTS", "8"))
+METRICS_RECONCILE_SECONDS = float(os.getenv("METRICS_RECONCILE_SECONDS", "600"))
+
+# Una sola reconciliación a la vez (varios workers de uvicorn)
+_ADVISORY_LOCK = 0x5E1E0018
+
+EVENTS_TOTAL = "events_total"
+RULES_TOTAL = "rules_total"
+RULES_ENABLED = "rules_enabled"
+ALERTS_TOTAL = "alerts_total"
+ALERTS_BY_STATUS = "alerts_by_status"
+ALERTS_BY_GROUP_KEY = "alerts_by_group_key"
+
+# (name, key) -> incremento (puede ser negativo)
+Deltas = dict[tuple[str, str], int]
+
+
+def events_added(n: int) -> Deltas:
+    return {(EVENTS_TOTAL, ""): n}
+
+
+def rule_added(enabled: bool) -> Deltas:
+    deltas = {(RULES_TOTAL, ""): 1}
+    if enabled:
+        deltas[(RULES_ENABLED, "")] = 1
+    return deltas
+
+
+def alerts_added(group_keys: Iterable[str | None]) -> Deltas:
+    # Las alertas nuevas nacen open
+    deltas: Deltas = {}
+    for group_key in group_keys:
+        for counter in ((ALERTS_TOTAL, ""), (ALERTS_BY_STATUS, "open"), (ALERTS_BY_GROUP_KEY, group_key)):
+            if counter[1] is not None:
+                deltas[counter] = deltas.get(counter, 0) + 1
+    return deltas
+
+
+def status_changed(old: str, new: str) -> Deltas:
+    if old == new:
+        return {}
+    return {(ALERTS_BY_STATUS, old): -1, (ALERTS_BY_STATUS, new): 1}
+
+
+def merge(*parts: Deltas) -> Deltas:
+    deltas: Deltas = {}
+    for part in parts:
+        for counter, n in part.items():
+            deltas[counter] = deltas.get(counter, 0) + n
+    return deltas
+
+
+def counter_upsert(deltas: Deltas):
+    """INSERT ... ON CONFLICT que suma `deltas` en un slot al azar. None si no hay nada que sumar.
+
+    Para ejecutarlo en la transacción del cambio que cuenta (sesión sync o async).
+    Las filas van ordenadas: dos transacciones bloquean los contadores en el mismo orden.
+    Los de group_key van siempre al slot 0 (una fila por grupo, ver `top_groups_query`).
+    """
+    slot = random.randrange(METRIC_COUNTER_SLOTS)
+    rows = [
+        {"name": name, "key": key, "slot": 0 if name == ALERTS_BY_GROUP_KEY else slot, "value": n}
+        for (name, key), n in sorted(deltas.items())
+        if n
+    ]
+    if not rows:
+        return None
+    stmt = pg_insert(MetricCounter).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[MetricCounter.name, MetricCounter.key, MetricCounter.slot],
+        set_={"value": MetricCounter.value + stmt.excluded.value},
+    )
+
+
+def bump(db, deltas: Deltas) -> None:
+    # Session o Connection sync, sin commit
+    stmt = counter_upsert(deltas)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def top_groups_query(limit: int):
+    """Los `limit` group_key con más alertas, leídos del índice (name, value).
+
+    Al tener una sola fila por grupo no hay que sumar slots: la consulta lee
+    `limit` filas aunque haya millones de grupos.
+    """
+    return (
+        select(MetricCounter.key, MetricCounter.value)
+        .where(MetricCounter.name == ALERTS_BY_GROUP_KEY, MetricCounter.value > 0)
+        .order_by(MetricCounter.value.desc())
+        .limit(limit)
+    )
+
+
+def stored_counts(conn: Connection) -> Deltas:
+    rows = conn.execute(
+        select(MetricCounter.name, MetricCounter.key, func.sum(MetricCounter.value)).group_by(
+            MetricCounter.name, MetricCounter.key
+        )
+    ).all()
+    return {(name, key): int(value) for name, key, value in rows}
+
+
+def actual_counts(conn: Connection) -> Deltas:
+    # Las mismas agregaciones que hacía /metrics: recorren tablas enteras
+    counts: Deltas = {(EVENTS_TOTAL, ""): conn.scalar(select(func.count()).select_from(Event))}
+
+    total, enabled = conn.execute(select(func.count(), func.count().filter(Rule.enabled.is_(True)))).one()
+    counts[(RULES_TOTAL, "")] = total
+    counts[(RULES_ENABLED, "")] = enabled
+
+    alerts_total = 0
+    for status, n in conn.execute(select(Alert.status, func.count()).group_by(Alert.status)):
+        counts[(ALERTS_BY_STATUS, status)] = n
+        alerts_total += n
+    counts[(ALERTS_TOTAL, "")] = alerts_total
+
+    group_counts = select(Alert.group_key, func.count()).where(Alert.group_key.is_not(None)).group_by(Alert.group_key)
+    for group_key, n in conn.execute(group_counts):
+        counts[(ALERTS_BY_GROUP_KEY, group_key)] = n
+    return counts
+
+
+def reconcile_counters(engine: Engine) -> Deltas | None:
+    """Corrige la deriva de los contadores. None si otro proceso ya está en ello.
+
+    Cuentas reales y contadores se leen en la misma foto (REPEATABLE READ):
+    como cada cambio suma su contador en su propia transacción, la diferencia
+    es deriva de verdad (retención, backfill, SQL a mano...). Se corrige
+    sumando esa diferencia, así que no pisa lo que se cuente mientras tanto.
+    Los contadores que quedan a 0 (grupos sin alertas) se borran.
+    """
+    with engine.connect() as lock_conn:
+        if not lock_conn.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK}):
+            return None
+        try:
+            with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+                with conn.begin():
+                    actual = actual_counts(conn)
+                    stored = stored_counts(conn)
+
+            drift = {
+                counter: actual.get(counter, 0) - stored.get(counter, 0)
+                for counter in actual.keys() | stored.keys()
+            }
+            drift = {counter: n for counter, n in drift.items() if n}
+            empty = [counter for counter in stored if not actual.get(counter)]
+            if drift or empty:
+                with engine.begin() as conn:
+                    bump(conn, drift)
+                    removed = _delete_empty(conn, empty)
+                logger.info("metric counters: corrected %d drifted, removed %d empty", len(drift), removed)
+            return drift
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK})
+
+
+def _delete_empty(conn: Connection, counters: list[tuple[str, str]]) -> int:
+    # Con las filas bloqueadas sus valores no cambian hasta el commit: borrar
+    # filas que suman 0 no altera ningún total, aunque entre un slot nuevo
+    if not counters:
+        return 0
+    rows = conn.execute(
+        select(MetricCounter.name, MetricCounter.key, MetricCounter.slot, MetricCounter.value)
+        .where(tuple_(MetricCounter.name, MetricCounter.key).in_(counters))
+        .order_by(MetricCounter.name, MetricCounter.key, MetricCounter.slot)
+        .with_for_update()
+    ).all()
+    totals: Deltas = {}
+    for name, key, _, value in rows:
+        totals[(name, key)] = totals.get((name, key), 0) + value
+    pks = [(name, key, slot) for name, key, slot, _ in rows if totals[(name, key)] == 0]
+    if pks:
+        conn.execute(
+            delete(MetricCounter).where(tuple_(MetricCounter.name, MetricCounter.key, MetricCounter.slot).in_(pks))
+        )
+    return len({pk[:2] for pk in pks})
+
+
+class CounterReconciler:
+    """Hilo que ejecuta `reconcile_counters` al arrancar y cada METRICS_RECONCILE_SECONDS."""
+
+    def __init__(self, engine: Engine, every_seconds: float = METRICS_RECONCILE_SECONDS):
+        self._engine = engine
+        self._every = every_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metric-counters", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                reconcile_counters(self._engine)
+            except Exception:
+                logger.exception("metric counters reconciliation failed")
+            if self._stop.wait(self._every):
+                return
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from time import sleep
+from typing import TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# "day" o "week" (lunes a lunes). Cambiarlo solo afecta a las particiones nuevas
+EVENTS_PARTITION_INTERVAL = os.getenv("EVENTS_PARTITION_INTERVAL", "day")
+# Periodos creados por adelantado
+EVENTS_PARTITIONS_AHEAD = int(os.getenv("EVENTS_PARTITIONS_AHEAD", "7"))
+# 0 => sin retención
+EVENTS_RETENTION_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", "0"))
+# "drop" borra la partición; "detach" la deja como tabla suelta (para archivarla aparte)
+EVENTS_RETENTION_MODE = os.getenv("EVENTS_RETENTION_MODE", "drop")
+EVENTS_PARTITION_CHECK_SECONDS = float(os.getenv("EVENTS_PARTITION_CHECK_SECONDS", "3600"))
+# CREATE/DETACH esperan un lock exclusivo sobre events: mejor reintentar que
+# dejar en cola detrás de ellos a todo el ingest y las lecturas
+EVENTS_PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("EVENTS_PARTITION_LOCK_TIMEOUT_MS", "2000"))
+EVENTS_PARTITION_LOCK_RETRIES = int(os.getenv("EVENTS_PARTITION_LOCK_RETRIES", "5"))
+
+DEFAULT_PARTITION = "events_default"
+
+# Un solo proceso hace mantenimiento a la vez (varios workers de uvicorn + CLI)
+_ADVISORY_LOCK = 0x5E1E0016
+
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+# SQLSTATE lock_not_available (lock_timeout vencido)
+_LOCK_NOT_AVAILABLE = "55P03"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: datetime
+    end: datetime
+
+
+def period_start(ts: datetime, interval: str = EVENTS_PARTITION_INTERVAL) -> datetime:
+    day = ts.astimezone(timezone.utc).date()
+    if interval == "week":
+        day -= timedelta(days=day.weekday())
+    return datetime.combine(day, time.min, timezone.utc)
+
+
+def period_end(start: datetime, interval: str = EVENTS_PARTITION_INTERVAL) -> datetime:
+    # Siguiente frontera alineada (también si `start` no lo está, p.ej. tras cambiar de intervalo)
+    return period_start(start, interval) + timedelta(days=7 if interval == "week" else 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"events_p{start:%Y%m%d}"
+
+
+def list_partitions(conn: Connection) -> tuple[list[Partition], bool]:
+    """Particiones de rango de `events` ordenadas, y si existe la DEFAULT."""
+    # Los límites se imprimen en la zona de la sesión: se fija UTC
+    conn.execute(text("SET LOCAL TimeZone = 'UTC'"))
+    rows = conn.execute(
+        text(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'events'::regclass
+            """
+        )
+    ).all()
+
+    parts: list[Partition] = []
+    has_default = False
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            has_default = True
+        elif (m := _BOUNDS.search(bound)) is not None:
+            parts.append(
+                Partition(name, datetime.fromisoformat(m.group(1)), datetime.fromisoformat(m.group(2)))
+            )
+    parts.sort(key=lambda p: p.start)
+    return parts, has_default
+
+
+def create_partition(conn: Connection, start: datetime, end: datetime) -> str:
+    name = partition_name(start)
+    conn.execute(
+        text(
+            f'CREATE TABLE "{name}" PARTITION OF events '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    return name
+
+
+def _create_missing(
+    conn: Connection, parts: list[Partition], start: datetime, end: datetime, interval: str
+) -> list[str]:
+    # Los huecos de [start, end) sin partición, en trozos que acaban en frontera de periodo
+    created: list[str] = []
+    while start < end:
+        if (inside := next((p for p in parts if p.start <= start < p.end), None)) is not None:
+            start = inside.end
+            continue
+        stop = min([period_end(start, interval)] + [p.start for p in parts if p.start > start])
+        occupied = conn.scalar(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE ts >= :start AND ts < :end)"),
+            {"start": start, "end": stop},
+        )
+        if occupied:
+            logger.warning("events default partition has rows in [%s, %s); range left unpartitioned", start, stop)
+        else:
+            created.append(create_partition(conn, start, stop))
+        start = stop
+    return created
+
+
+def ensure_partitions(
+    conn: Connection,
+    now: datetime,
+    interval: str = EVENTS_PARTITION_INTERVAL,
+    ahead: int = EVENTS_PARTITIONS_AHEAD,
+) -> list[str]:
+    """Crea las particiones que falten desde la última existente (o hoy) hasta `ahead` periodos vista.
+
+    Si la DEFAULT ya tiene filas en un rango (p.ej. eventos con ts futuro),
+    ese rango no se crea: Postgres no permite una partición que "robe" filas
+    de la DEFAULT. Esas filas siguen siendo consultables, solo sin poda.
+    """
+    parts, _ = list_partitions(conn)
+
+    horizon = period_start(now, interval)
+    for _ in range(ahead + 1):
+        horizon = period_end(horizon, interval)
+
+    start = period_start(now, interval)
+    if parts and parts[-1].end < start:
+        start = parts[-1].end
+    return _create_missing(conn, parts, start, horizon, interval)
+
+
+def ensure_range(
+    conn: Connection, start: datetime, end: datetime, interval: str = EVENTS_PARTITION_INTERVAL
+) -> list[str]:
+    """Crea las particiones que falten para [start, end), p.ej. antes de un backfill histórico.
+
+    Espera al lock de mantenimiento: no compite con la API creando la misma partición.
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _ADVISORY_LOCK})
+    parts, _ = list_partitions(conn)
+    return _create_missing(conn, parts, start, end, interval)
+
+
+def expired_partitions(conn: Connection, now: datetime, days: int = EVENTS_RETENTION_DAYS) -> list[Partition]:
+    """Particiones enteramente anteriores a `now - days`."""
+    cutoff = now - timedelta(days=days)
+    parts, _ = list_partitions(conn)
+    return [p for p in parts if p.end <= cutoff]
+
+
+def remove_partition(conn: Connection, p: Partition, mode: str = EVENTS_RETENTION_MODE) -> str:
+    # Igual que el ON DELETE CASCADE de alerts -> events: las alertas de esos
+    # eventos se borran antes (si no, la FK impide el DETACH)
+    conn.execute(
+        text("DELETE FROM alerts WHERE event_ts >= :start AND event_ts < :end"),
+        {"start": p.start, "end": p.end},
+    )
+    conn.execute(text(f'ALTER TABLE events DETACH PARTITION "{p.name}"'))
+    if mode == "drop":
+        conn.execute(text(f'DROP TABLE "{p.name}"'))
+    return p.name
+
+
+def purge_default(conn: Connection, now: datetime, days: int = EVENTS_RETENTION_DAYS) -> int:
+    # Lo viejo que cayó en la DEFAULT (backfill histórico) se borra fila a fila
+    if not list_partitions(conn)[1]:
+        return 0
+    result = conn.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE ts < :cutoff"), {"cutoff": now - timedelta(days=days)}
+    )
+    return result.rowcount
+
+
+def apply_retention(
+    conn: Connection,
+    now: datetime,
+    days: int = EVENTS_RETENTION_DAYS,
+    mode: str = EVENTS_RETENTION_MODE,
+) -> list[str]:
+    """Quita las particiones anteriores a `now - days` y lo viejo de la DEFAULT, en la transacción de `conn`.
+
+    `run_maintenance` hace lo mismo con una transacción por paso.
+    """
+    removed = [remove_partition(conn, p, mode) for p in expired_partitions(conn, now, days)]
+    purge_default(conn, now, days)
+    return removed
+
+
+def run_step(conn: Connection, fn: Callable[..., T], *args) -> T:
+    """`fn(conn, *args)` en su propia transacción, con lock_timeout.
+
+    Si no consigue el lock a tiempo, la transacción se deshace (soltando lo que
+    tuviera) y se reintenta con espera creciente.
+    """
+    attempt = 0
+    while True:
+        try:
+            with conn.begin():
+                conn.execute(text(f"SET LOCAL lock_timeout = {EVENTS_PARTITION_LOCK_TIMEOUT_MS}"))
+                return fn(conn, *args)
+        except OperationalError as e:
+            if getattr(e.orig, "sqlstate", None) != _LOCK_NOT_AVAILABLE or attempt == EVENTS_PARTITION_LOCK_RETRIES:
+                raise
+            logger.warning("events partitions: lock not available for %s, retrying", fn.__name__)
+            sleep(EVENTS_PARTITION_LOCK_TIMEOUT_MS / 1000 * 2**attempt)
+            attempt += 1
+
+
+def run_maintenance(
+    engine: Engine,
+    now: datetime | None = None,
+    interval: str = EVENTS_PARTITION_INTERVAL,
+    ahead: int = EVENTS_PARTITIONS_AHEAD,
+    days: int = EVENTS_RETENTION_DAYS,
+    mode: str = EVENTS_RETENTION_MODE,
+) -> dict[str, list[str]] | None:
+    """Particiones por adelantado + retención. None si otro proceso ya está en ello.
+
+    Cada paso (crear, quitar cada partición, limpiar la DEFAULT) va en su
+    propia transacción (`run_step`): ningún lock exclusivo se guarda más de lo
+    que tarda su paso, y un paso que no consigue el lock no deshace los demás.
+    """
+    now = now or datetime.now(timezone.utc)
+    with engine.connect() as conn:
+        locked = conn.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK})
+        conn.commit()
+        if not locked:
+            return None
+        try:
+            created = run_step(conn, ensure_partitions, now, interval, ahead)
+            removed: list[str] = []
+            if days > 0:
+                for p in run_step(conn, expired_partitions, now, days):
+                    removed.append(run_step(conn, remove_partition, p, mode))
+                run_step(conn, purge_default, now, days)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK})
+            conn.commit()
+    if created or removed:
+        logger.info("events partitions created=%s removed=%s", created, removed)
+    return {"created": created, "removed": removed}
+
+
+class PartitionMaintainer:
+    """Hilo que ejecuta `run_maintenance` al arrancar y cada EVENTS_PARTITION_CHECK_SECONDS."""
+
+    def __init__(self, engine: Engine, every_seconds: float = EVENTS_PARTITION_CHECK_SECONDS):
+        self._engine = engine
+        self._every = every_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="events-partitions", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                run_maintenance(self._engine)
+            except Exception:
+                logger.exception("events partition maintenance failed")
+            if self._stop.wait(self._every):
+                return
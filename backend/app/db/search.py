@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.sql.elements import ColumnElement
+
+# Configuración de texto de search_vector (ver app.models.event.SEARCH_VECTOR_SQL)
+SEARCH_CONFIG = "english"
+# rank=true ordena por relevancia solo las N coincidencias más recientes:
+# ts_rank no usa índice y sobre millones de filas no acabaría en tiempo
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "5000"))
+
+# info= de los índices gin_trgm_ops: las migraciones solo los crean si el
+# servidor trae pg_trgm, y alembic/env.py los compara solo si está instalada
+TRGM_INDEX_INFO = {"requires_extension": "pg_trgm"}
+
+_ESCAPE = "\\"
+
+
+def contains_pattern(term: str) -> str:
+    """`%term%` con los comodines de LIKE (`%`, `_`) del usuario escapados."""
+    escaped = term.replace(_ESCAPE, _ESCAPE * 2).replace("%", _ESCAPE + "%").replace("_", _ESCAPE + "_")
+    return f"%{escaped}%"
+
+
+def ilike_contains(column, term: str) -> ColumnElement:
+    # Subcadena case-insensitive; con índice GIN gin_trgm_ops el planner
+    # lo resuelve por bitmap scan (a partir de 3 caracteres útiles)
+    return column.ilike(contains_pattern(term), escape=_ESCAPE)
+
+
+def websearch_query(term: str) -> ColumnElement:
+    # Sintaxis tipo buscador: "frase exacta", -excluir, OR
+    # Config como literal (no parámetro): así la sentencia también se puede
+    # compilar con literal_binds (ver count_estimate en /alerts/ui/page)
+    return func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), term)
+
+
+def fulltext_match(vector, term: str) -> ColumnElement:
+    return vector.bool_op("@@")(websearch_query(term))
+
+
+def fulltext_rank(vector, term: str) -> ColumnElement:
+    return func.ts_rank(vector, websearch_query(term))
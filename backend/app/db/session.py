@@ -1,5 +1,12 @@
-from collections.abc import Generator
-from .database import SessionLocal
+from collections.abc import AsyncGenerator, Generator
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import DB_ASYNC, AsyncSessionLocal, SessionLocal
+
 
 def get_db() -> Generator:
     db = SessionLocal()
@@ -7,3 +14,47 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+class SyncSessionAdapter:
+    """Misma interfaz que AsyncSession (lo que usan las rutas) sobre una Session sync.
+
+    Es el modo DB_ASYNC=0: cada llamada a BD se ejecuta en el threadpool.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    async def execute(self, *args: Any, **kwargs: Any):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def refresh(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = SyncSessionAdapter(SessionLocal(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from collections.abc import Callable, Iterable
+
+# Resolución de la ventana: cada ventana se divide en N buckets
+THRESHOLD_BUCKETS = int(os.getenv("THRESHOLD_BUCKETS", "60"))
+
+# Cada cuántas operaciones se barren claves inactivas
+_SWEEP_EVERY = 10_000
+
+CounterKey = tuple[int, str]
+# (clave, contador, bucket, n) de cada suma, para deshacerla
+UndoEntry = tuple[CounterKey, "_Ring", int, int]
+
+
+def bucket_width(window_seconds: int, buckets: int = THRESHOLD_BUCKETS) -> float:
+    return window_seconds / buckets
+
+
+class _Ring:
+    __slots__ = ("window", "width", "heads", "counts", "last_seen")
+
+    def __init__(self, window: int, buckets: int):
+        self.window = window
+        self.width = bucket_width(window, buckets)
+        # +1: la ventana [ts - window, ts] puede tocar buckets + 1 buckets
+        self.heads = [-1] * (buckets + 1)
+        self.counts = [0] * (buckets + 1)
+        self.last_seen = 0.0
+
+    def add(self, bucket: int, n: int) -> None:
+        i = bucket % len(self.counts)
+        if self.heads[i] != bucket:
+            self.heads[i] = bucket
+            self.counts[i] = 0
+        self.counts[i] += n
+
+    def remove(self, bucket: int, n: int) -> None:
+        # Si el bucket ya rotó, lo sumado se fue con él
+        i = bucket % len(self.counts)
+        if self.heads[i] == bucket:
+            self.counts[i] = max(0, self.counts[i] - n)
+
+    def total(self, ts: float) -> int:
+        first = math.floor((ts - self.window) / self.width)
+        return sum(c for head, c in zip(self.heads, self.counts) if head >= first)
+
+
+class ThresholdCounters:
+    """Contadores deslizantes en memoria por (rule_id, group_key).
+
+    Sustituyen al COUNT sobre `events` en el camino de ingest. El bucket más
+    antiguo cuenta entero, así que la precisión es window/THRESHOLD_BUCKETS
+    (nunca cuenta de menos). Las claves sin actividad durante más de su
+    ventana se descartan y se vuelven a sembrar desde BD al reaparecer.
+
+    El estado es del proceso: solo ve los eventos que ingiere él mismo, así
+    que la API debe correr con un único worker de uvicorn (o con INGEST_SHARDS,
+    donde cada shard es dueño de sus group_key).
+    """
+
+    def __init__(self, buckets: int = THRESHOLD_BUCKETS):
+        self._buckets = buckets
+        self._rings: dict[CounterKey, _Ring] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def width(self, window_seconds: int) -> float:
+        return bucket_width(window_seconds, self._buckets)
+
+    def has(self, key: CounterKey, window_seconds: int) -> bool:
+        ring = self._rings.get(key)
+        return ring is not None and ring.window == window_seconds
+
+    def seed(self, key: CounterKey, window_seconds: int, buckets: dict[int, int], ts: float) -> None:
+        ring = _Ring(window_seconds, self._buckets)
+        for bucket, n in buckets.items():
+            ring.add(bucket, n)
+        ring.last_seen = ts
+        with self._lock:
+            # Otro ingest pudo sembrar la misma clave a la vez (los dos vieron
+            # has() == False) y sumar ya: su contador incluye lo de BD y lo suyo
+            current = self._rings.get(key)
+            if current is None or current.window != window_seconds:
+                self._rings[key] = ring
+
+    def add(
+        self, key: CounterKey, window_seconds: int, ts: float, n: int = 1, undo: list[UndoEntry] | None = None
+    ) -> int:
+        """Suma n eventos en `ts` y devuelve el total de la ventana que acaba en `ts`.
+
+        Con `undo`, apunta ahí lo sumado para poder restarlo con `undo()`.
+        """
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None or ring.window != window_seconds:
+                ring = _Ring(window_seconds, self._buckets)
+                self._rings[key] = ring
+            bucket = math.floor(ts / ring.width)
+            ring.add(bucket, n)
+            ring.last_seen = ts
+            total = ring.total(ts)
+            if undo is not None:
+                undo.append((key, ring, bucket, n))
+
+            self._ops += 1
+            if self._ops >= _SWEEP_EVERY:
+                self._ops = 0
+                self._evict_idle(ts)
+        return total
+
+    def count(self, key: CounterKey, ts: float) -> int:
+        ring = self._rings.get(key)
+        return ring.total(ts) if ring is not None else 0
+
+    def undo(self, entries: Iterable[UndoEntry]) -> None:
+        # Resta solo lo que sumó una transacción, sin tocar lo de las demás.
+        # Un contador resembrado desde BD no incluye esos eventos: se deja.
+        with self._lock:
+            for key, ring, bucket, n in entries:
+                if self._rings.get(key) is ring:
+                    ring.remove(bucket, n)
+
+    def retain(self, keep: Callable[[CounterKey], bool]) -> int:
+        # Descarta las claves que ya no son de este proceso; devuelve cuántas
+        with self._lock:
+            drop = [k for k in self._rings if not keep(k)]
+            for key in drop:
+                del self._rings[key]
+        return len(drop)
+
+    def clear(self, _payload: str | None = None) -> None:
+        with self._lock:
+            self._rings.clear()
+
+    def _evict_idle(self, ts: float) -> None:
+        idle = [k for k, r in self._rings.items() if ts - r.last_seen > r.window]
+        for key in idle:
+            del self._rings[key]
+
+
+threshold_counters = ThresholdCounters()
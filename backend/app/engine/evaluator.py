@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import event, func, insert, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.metric_counters import alerts_added, bump, events_added, merge
+from app.db.search import ilike_contains
+from app.engine.counters import threshold_counters
+from app.engine.rules_cache import CompiledRule, get_snapshot
+from app.models.alert import Alert
+from app.models.event import Event, meta_equals, meta_text
+from app.schemas.ingest import IngestPayload
+
+ACTIVE_STATUSES = ("open", "ack")
+
+_THRESHOLD_UNDO = "threshold_undo"
+
+
+@dataclass
+class RaisedAlert:
+    id: int
+    rule_id: int
+    event_id: int
+    group_key: str | None
+
+
+@dataclass
+class IngestResult:
+    events: list[Event]
+    alerts: list[RaisedAlert]
+
+
+def compute_group_key(meta: dict[str, Any] | None) -> str | None:
+    if not meta:
+        return None
+    return meta.get("host")
+
+
+def upsert_alerts(db: Session, rows: list[dict[str, Any]]) -> list[tuple[int, bool]]:
+    """INSERT ... ON CONFLICT sobre el índice único parcial de alertas activas.
+
+    Si ya hay una alerta open/ack para (rule_id, group_key) suma las
+    ocurrencias en vez de crear otra. Devuelve (id, insertada) por fila.
+    """
+    stmt = pg_insert(Alert)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Alert.rule_id, Alert.group_key],
+        # mismo predicado literal que el índice, para que Postgres lo infiera
+        index_where=text("status IN ('open', 'ack')"),
+        set_={
+            "occurrences": Alert.occurrences + stmt.excluded.occurrences,
+            "last_seen_at": stmt.excluded.last_seen_at,
+        },
+    ).returning(
+        Alert.id,
+        # xmax = 0 solo en filas recién insertadas
+        literal_column("xmax = 0").label("inserted"),
+        sort_by_parameter_order=True,
+    )
+    return [(alert_id, inserted) for alert_id, inserted in db.execute(stmt, rows).all()]
+
+
+def _seed_threshold_counters(
+    db: Session, rule: CompiledRule, group_keys: set[str], now: datetime
+) -> None:
+    # Arranque en frío: eventos de la ventana ya guardados, por host y bucket.
+    # Después, el contador se mantiene en memoria sin volver a consultar.
+    window_start = now - timedelta(seconds=rule.threshold_seconds)
+    width = threshold_counters.width(rule.threshold_seconds)
+    host = meta_text("host")
+    bucket = func.floor(func.extract("epoch", Event.ts) / width)
+
+    stmt = (
+        select(host, bucket, func.count(Event.id))
+        .where(Event.ts >= window_start, host.in_(list(group_keys)))
+        .group_by(host, bucket)
+    )
+
+    if rule.source:
+        stmt = stmt.where(Event.source == rule.source)
+
+    if rule.severity_min is not None:
+        stmt = stmt.where(Event.severity >= rule.severity_min)
+
+    if rule.contains:
+        stmt = stmt.where(ilike_contains(Event.message, rule.contains))
+
+    for key, value in rule.meta_match:
+        stmt = stmt.where(meta_equals(key, value))
+
+    seeded: dict[str, dict[int, int]] = {group_key: {} for group_key in group_keys}
+    for group_key, b, count in db.execute(stmt).all():
+        seeded[group_key][int(b)] = count
+
+    for group_key, buckets in seeded.items():
+        threshold_counters.seed((rule.id, group_key), rule.threshold_seconds, buckets, now.timestamp())
+
+
+@event.listens_for(Session, "after_commit")
+def _confirm_threshold_counts(session: Session) -> None:
+    session.info.pop(_THRESHOLD_UNDO, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_threshold_counts(session: Session) -> None:
+    # Los contadores ya sumaron eventos que no llegaron a guardarse: se resta
+    # lo de esta transacción (lo que sumaron otras a la vez se queda)
+    undo = session.info.pop(_THRESHOLD_UNDO, None)
+    if undo:
+        threshold_counters.undo(undo)
+
+
+def ingest_events(
+    db: Session,
+    payloads: Sequence[IngestPayload],
+    now: datetime,
+    received_at: Sequence[datetime] | None = None,
+) -> IngestResult:
+    """Guarda un lote de eventos y evalúa las reglas habilitadas sobre él.
+
+    Mismas decisiones que el ingest unitario (anti-duplicado, threshold),
+    pero las reglas se cargan una vez y el estado se agrupa por
+    (rule_id, group_key). No hace commit.
+
+    `received_at` (uno por evento) es el ts de cada evento cuando se guardan
+    más tarde de lo que se recibieron (write-behind); por defecto, `now`.
+    """
+    received = list(received_at) if received_at is not None else [now] * len(payloads)
+    snapshot = get_snapshot(db)
+
+    # 1) Predicados en memoria (no necesitan BD)
+    group_keys: list[str | None] = []
+    matches: list[list[CompiledRule]] = []
+    for p in payloads:
+        group_keys.append(compute_group_key(p.meta))
+        matches.append(snapshot.match(p.source, p.severity, p.message, p.meta))
+
+    # 2) Contadores de threshold, agrupados por (rule_id, group_key)
+    threshold_keys: dict[int, set[str]] = defaultdict(set)
+    rules_by_id: dict[int, CompiledRule] = {}
+    for group_key, matched in zip(group_keys, matches):
+        if group_key is None:
+            continue
+        for rule in matched:
+            if rule.is_threshold:
+                threshold_keys[rule.id].add(group_key)
+                rules_by_id[rule.id] = rule
+
+    # Solo se siembran (antes de insertar el lote) los contadores que no están en memoria
+    for rule_id, keys in threshold_keys.items():
+        rule = rules_by_id[rule_id]
+        missing = {k for k in keys if not threshold_counters.has((rule_id, k), rule.threshold_seconds)}
+        if missing:
+            _seed_threshold_counters(db, rule, missing, now)
+
+    undo = db.info.setdefault(_THRESHOLD_UNDO, [])
+
+    # 3) Guardar eventos: INSERT multi-fila ... RETURNING
+    events = db.scalars(
+        insert(Event).returning(Event, sort_by_parameter_order=True),
+        [
+            {
+                "ts": ts,
+                "source": p.source,
+                "severity": p.severity,
+                "message": p.message,
+                "meta": p.meta,
+            }
+            for p, ts in zip(payloads, received)
+        ],
+    ).all()
+
+    # 4) Decidir alertas en orden de llegada
+    # Throttle: solo miraba alertas open/ack, igual que el anti-duplicado,
+    # así que ya queda cubierto por él.
+    alert_rows: list[dict[str, Any]] = []
+    by_key: dict[tuple[int, str], dict[str, Any]] = {}
+    for ev, group_key, matched in zip(events, group_keys, matches):
+        for rule in matched:
+            key = (rule.id, group_key)
+
+            # El evento cuenta para la ventana aunque luego no alerte
+            window_count = 0
+            if group_key is not None and rule.is_threshold:
+                window_count = threshold_counters.add(key, rule.threshold_seconds, ev.ts.timestamp(), undo=undo)
+
+            # Threshold
+            if rule.is_threshold:
+                if group_key is None:
+                    continue
+                if window_count < rule.threshold_count:
+                    continue
+
+            # Anti-duplicado dentro del lote: una fila por (rule_id, group_key)
+            # Decisión: si group_key es None, NO aplicamos anti-duplicado (no hay agrupación fiable)
+            if group_key is not None and key in by_key:
+                by_key[key]["occurrences"] += 1
+                continue
+
+            row = {
+                "rule_id": rule.id,
+                "event_id": ev.id,
+                "event_ts": ev.ts,
+                "title": f"Rule matched: {rule.name}",
+                "rule_name": rule.name,
+                "event_source": ev.source,
+                "event_severity": ev.severity,
+                "event_message": ev.message,
+                "group_key": group_key,
+                "occurrences": 1,
+                "last_seen_at": ev.ts,
+            }
+            alert_rows.append(row)
+            if group_key is not None:
+                by_key[key] = row
+
+    # 5) Un solo INSERT ... ON CONFLICT: crea la alerta o suma ocurrencias
+    #    a la que ya está activa (también si la creó otro worker a la vez).
+    alerts: list[RaisedAlert] = []
+    if alert_rows:
+        for (alert_id, inserted), row in zip(upsert_alerts(db, alert_rows), alert_rows):
+            if inserted:
+                alerts.append(
+                    RaisedAlert(
+                        id=alert_id,
+                        rule_id=row["rule_id"],
+                        event_id=row["event_id"],
+                        group_key=row["group_key"],
+                    )
+                )
+
+    # 6) Contadores de /metrics, en la misma transacción
+    bump(db, merge(events_added(len(events)), alerts_added(a.group_key for a in alerts)))
+
+    return IngestResult(events=list(events), alerts=alerts)
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from app.db.database import engine
+from app.engine import rules_cache
+from app.engine.counters import threshold_counters
+from app.engine.notify import NotifyListener
+
+
+def build_listener() -> NotifyListener:
+    # Un listener por proceso: invalida la caché de reglas cuando otro proceso las cambia
+    listener = NotifyListener(engine.url.set(drivername="postgresql").render_as_string(hide_password=False))
+    listener.subscribe(rules_cache.RULES_CHANNEL, rules_cache.invalidate)
+    # Si cambian las reglas, los contadores de threshold se vuelven a sembrar
+    listener.subscribe(rules_cache.RULES_CHANNEL, threshold_counters.clear)
+    return listener
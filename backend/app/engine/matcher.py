@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+
+
+class ContainsMatcher:
+    """Autómata Aho-Corasick con los `contains` (ya en minúsculas) de todas las reglas.
+
+    `search()` recorre el mensaje una sola vez y devuelve los ids de regla cuyo
+    patrón aparece como substring: mismo resultado que `pattern in message_lower`
+    regla a regla.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "_alphabet", "_total")
+
+    def __init__(self, patterns: Iterable[tuple[int, str]]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[frozenset[int]] = [frozenset()]
+        pending: dict[int, set[int]] = {}
+        rule_ids: set[int] = set()
+
+        # 1) Trie
+        for rule_id, pattern in patterns:
+            if not pattern:
+                continue
+            rule_ids.add(rule_id)
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(frozenset())
+                state = nxt
+            pending.setdefault(state, set()).add(rule_id)
+
+        for state, ids in pending.items():
+            out[state] = frozenset(ids)
+
+        # 2) Enlaces de fallo (BFS) y salidas heredadas del sufijo
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] | out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._alphabet = frozenset(ch for node in goto for ch in node)
+        self._total = len(rule_ids)
+
+    def __len__(self) -> int:
+        return self._total
+
+    def search(self, text_lower: str) -> set[int]:
+        found: set[int] = set()
+        if not self._total:
+            return found
+
+        goto, fail, out, alphabet = self._goto, self._fail, self._out, self._alphabet
+        state = 0
+        for ch in text_lower:
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+                if len(found) == self._total:
+                    break
+        return found
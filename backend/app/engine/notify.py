@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+
+import psycopg
+from psycopg import sql
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# payload None => "pudimos perder avisos, invalida todo"
+Handler = Callable[[str | None], None]
+
+
+def notify(db: Session, channel: str, payload: str = "") -> None:
+    # NOTIFY es transaccional: Postgres solo lo entrega si la transacción hace commit.
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+
+class NotifyListener:
+    """Hilo con una conexión dedicada haciendo LISTEN y despachando avisos.
+
+    Cada worker de uvicorn arranca el suyo, así todos ven los cambios
+    confirmados por cualquier otro worker.
+    """
+
+    def __init__(self, dsn: str, poll_seconds: float = 1.0, retry_seconds: float = 2.0):
+        self._dsn = dsn
+        self._poll_seconds = poll_seconds
+        self._retry_seconds = retry_seconds
+        self._handlers: dict[str, list[Handler]] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._poll_seconds + 1)
+            self._thread = None
+
+    def _dispatch(self, channel: str, payload: str | None) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("notify handler failed (channel=%s)", channel)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self._dsn, autocommit=True) as conn:
+                    for channel in self._handlers:
+                        conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+
+                    # Tras (re)conectar no sabemos qué avisos se perdieron
+                    for channel in self._handlers:
+                        self._dispatch(channel, None)
+
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=self._poll_seconds):
+                            self._dispatch(n.channel, n.payload or None)
+            except psycopg.Error:
+                logger.warning("LISTEN connection lost, retrying", exc_info=True)
+                self._stop.wait(self._retry_seconds)
+
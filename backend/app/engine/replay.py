@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import time
+import zlib
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.engine.counters import ThresholdCounters
+from app.engine.evaluator import compute_group_key
+from app.engine.rules_cache import CompiledRule, build_snapshot, compile_rule
+from app.models.event import Event
+from app.models.rule import Rule
+
+# Filas que se piden al cursor de servidor y que viajan juntas a un worker
+REPLAY_FETCH_ROWS = int(os.getenv("REPLAY_FETCH_ROWS", "20000"))
+REPLAY_CHUNK_EVENTS = int(os.getenv("REPLAY_CHUNK_EVENTS", "5000"))
+REPLAY_SAMPLES = 5
+
+# (id, ts epoch, source, severity, message, meta, group_key)
+ReplayEvent = tuple[int, float, str, int, str, dict[str, Any] | None, str | None]
+
+
+@dataclass
+class RuleReplayStats:
+    rule_id: int
+    name: str
+    matched: int = 0
+    alerts: int = 0
+    samples: list[tuple[float, int, str | None]] = field(default_factory=list)
+
+    def merge(self, other: RuleReplayStats, sample_size: int) -> None:
+        self.matched += other.matched
+        self.alerts += other.alerts
+        self.samples = sorted(self.samples + other.samples)[:sample_size]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "rule_id": self.rule_id,
+            "name": self.name,
+            "matched": self.matched,
+            "alerts": self.alerts,
+            "samples": [
+                {
+                    "event_id": event_id,
+                    "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                    "group_key": group_key,
+                }
+                for ts, event_id, group_key in self.samples
+            ],
+        }
+
+
+@dataclass
+class ReplayReport:
+    since: datetime
+    until: datetime
+    events_scanned: int
+    seconds: float
+    rules: list[RuleReplayStats]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "since": self.since.isoformat(),
+            "until": self.until.isoformat(),
+            "events_scanned": self.events_scanned,
+            "seconds": round(self.seconds, 3),
+            "events_per_second": round(self.events_scanned / self.seconds) if self.seconds else None,
+            "rules": [r.as_dict() for r in self.rules],
+        }
+
+
+class ReplayPartition:
+    """Motor de ingest en memoria para una partición de group_key.
+
+    Mismas decisiones que `ingest_events` (predicados, threshold y
+    anti-duplicado por (rule_id, group_key)) pero con el ts de cada evento
+    como reloj y sin escribir nada. Durante el replay nadie cierra alertas:
+    una vez abierta, las siguientes coincidencias solo suman ocurrencias.
+    """
+
+    def __init__(self, rules: Sequence[CompiledRule], sample_size: int = REPLAY_SAMPLES):
+        self.snapshot = build_snapshot(tuple(rules))
+        self.sample_size = sample_size
+        self.counters = ThresholdCounters()
+        self.active: set[tuple[int, str]] = set()
+        self.stats = {r.id: RuleReplayStats(r.id, r.name) for r in rules}
+
+    def feed(self, events: Iterable[ReplayEvent]) -> None:
+        match = self.snapshot.match
+        for event_id, ts, source, severity, message, meta, group_key in events:
+            for rule in match(source, severity, message, meta):
+                stats = self.stats[rule.id]
+                stats.matched += 1
+                key = (rule.id, group_key)
+
+                if rule.is_threshold:
+                    if group_key is None:
+                        continue
+                    if self.counters.add(key, rule.threshold_seconds, ts) < rule.threshold_count:
+                        continue
+
+                if group_key is not None:
+                    if key in self.active:
+                        continue
+                    self.active.add(key)
+
+                stats.alerts += 1
+                if len(stats.samples) < self.sample_size:
+                    stats.samples.append((ts, event_id, group_key))
+
+
+def _worker(rules: list[CompiledRule], sample_size: int, inbox: mp.Queue, outbox: mp.Queue) -> None:
+    part = ReplayPartition(rules, sample_size)
+    while (chunk := inbox.get()) is not None:
+        part.feed(chunk)
+    outbox.put(part.stats)
+
+
+def load_rules(db: Session, rule_ids: Sequence[int] | None = None) -> list[CompiledRule]:
+    # Con ids explícitos se incluyen también reglas deshabilitadas (probar antes de activar)
+    stmt = select(Rule).order_by(Rule.id.asc())
+    if rule_ids:
+        stmt = stmt.where(Rule.id.in_(list(rule_ids)))
+    else:
+        stmt = stmt.where(Rule.enabled.is_(True))
+    return [compile_rule(r) for r in db.execute(stmt).scalars().all()]
+
+
+def _events_query(rules: Sequence[CompiledRule], since: datetime, until: datetime):
+    stmt = (
+        select(Event.id, Event.ts, Event.source, Event.severity, Event.message, Event.meta)
+        .where(Event.ts >= since, Event.ts < until)
+        .order_by(Event.ts.asc(), Event.id.asc())
+    )
+    # Si todas las reglas filtran por source/severity, el filtro baja a SQL
+    if all(r.source for r in rules):
+        stmt = stmt.where(Event.source.in_(sorted({r.source for r in rules})))
+    if all(r.severity_min is not None for r in rules):
+        stmt = stmt.where(Event.severity >= min(r.severity_min for r in rules))
+    return stmt
+
+
+def _partition(group_key: str | None, workers: int, seq: int) -> int:
+    # Sin group_key no hay estado (ni threshold ni anti-duplicado): reparto rotatorio
+    if group_key is None:
+        return seq % workers
+    return zlib.crc32(group_key.encode()) % workers
+
+
+def replay(
+    engine: Engine,
+    rules: Sequence[CompiledRule],
+    since: datetime,
+    until: datetime,
+    workers: int | None = None,
+    sample_size: int = REPLAY_SAMPLES,
+) -> ReplayReport:
+    """Reevalúa `rules` sobre los eventos de [since, until) sin escribir alertas.
+
+    Los eventos salen en orden de ts por un cursor de servidor y se reparten
+    por hash de group_key entre `workers` procesos, de modo que todo el estado
+    de una clave (threshold, alerta activa) vive en un solo proceso.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    started = time.perf_counter()
+    stmt = _events_query(rules, since, until)
+
+    if workers == 1:
+        parts = [ReplayPartition(rules, sample_size)]
+        sinks = [parts[0].feed]
+    else:
+        # spawn: los hijos no heredan conexiones ni hilos del proceso padre
+        ctx = mp.get_context("spawn")
+        outbox = ctx.Queue()
+        inboxes = [ctx.Queue(maxsize=8) for _ in range(workers)]
+        procs = [
+            ctx.Process(target=_worker, args=(list(rules), sample_size, inbox, outbox), daemon=True)
+            for inbox in inboxes
+        ]
+        for p in procs:
+            p.start()
+        sinks = [inbox.put for inbox in inboxes]
+
+    scanned = 0
+    buffers: list[list[ReplayEvent]] = [[] for _ in range(workers)]
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=REPLAY_FETCH_ROWS).execute(stmt)
+            for rows in result.partitions():
+                for event_id, ts, source, severity, message, meta in rows:
+                    group_key = compute_group_key(meta)
+                    i = _partition(group_key, workers, scanned)
+                    buf = buffers[i]
+                    buf.append((event_id, ts.timestamp(), source, severity, message, meta, group_key))
+                    if len(buf) >= REPLAY_CHUNK_EVENTS:
+                        sinks[i](buf)
+                        buffers[i] = []
+                    scanned += 1
+        for i, buf in enumerate(buffers):
+            if buf:
+                sinks[i](buf)
+
+        if workers == 1:
+            results = [parts[0].stats]
+        else:
+            for inbox in inboxes:
+                inbox.put(None)
+            results = [outbox.get() for _ in procs]
+            for p in procs:
+                p.join()
+    finally:
+        if workers > 1:
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+
+    merged = {r.id: RuleReplayStats(r.id, r.name) for r in rules}
+    for stats in results:
+        for rule_id, s in stats.items():
+            merged[rule_id].merge(s, sample_size)
+
+    return ReplayReport(
+        since=since,
+        until=until,
+        events_scanned=scanned,
+        seconds=time.perf_counter() - started,
+        rules=list(merged.values()),
+    )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Hashable, Iterable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from app.engine.rules_cache import CompiledRule
+
+
+class _SeverityBucket:
+    """Reglas ordenadas por severity_min: las que aceptan una severidad son un prefijo."""
+
+    __slots__ = ("severities", "rules")
+
+    def __init__(self, rules: Iterable[CompiledRule]):
+        ordered = sorted(rules, key=lambda r: (-1 if r.severity_min is None else r.severity_min, r.id))
+        self.severities = [-1 if r.severity_min is None else r.severity_min for r in ordered]
+        self.rules = ordered
+
+    def upto(self, severity: int) -> list[CompiledRule]:
+        return self.rules[: bisect_right(self.severities, severity)]
+
+
+def _index_key(rule: CompiledRule) -> tuple[str, Any] | None:
+    # Cada regla se indexa una sola vez, por su criterio exacto más selectivo.
+    if rule.source:
+        return ("source", rule.source)
+    for k, v in rule.meta_match:
+        if isinstance(v, Hashable):
+            return ("meta", (k, v))
+    return None
+
+
+class RuleIndex:
+    """Índice de despacho: por source exacto, por pares meta_match y por severidad.
+
+    `candidates()` devuelve un superconjunto de las reglas que pueden casar con
+    el evento (falta comprobar contains y el resto de meta_match), en orden de id.
+    Las reglas sin source ni meta_match indexable quedan en `wildcard`.
+    """
+
+    def __init__(self, rules: Iterable[CompiledRule]):
+        by_source: dict[str, list[CompiledRule]] = {}
+        by_meta: dict[tuple[str, Any], list[CompiledRule]] = {}
+        wildcard: list[CompiledRule] = []
+
+        for rule in rules:
+            key = _index_key(rule)
+            if key is None:
+                wildcard.append(rule)
+            elif key[0] == "source":
+                by_source.setdefault(key[1], []).append(rule)
+            else:
+                by_meta.setdefault(key[1], []).append(rule)
+
+        self._by_source = {k: _SeverityBucket(v) for k, v in by_source.items()}
+        self._by_meta = {k: _SeverityBucket(v) for k, v in by_meta.items()}
+        self._meta_keys = frozenset(k for k, _ in by_meta)
+        self._wildcard = _SeverityBucket(wildcard)
+
+    def candidates(self, source: str, severity: int, meta: dict[str, Any] | None) -> list[CompiledRule]:
+        out: list[CompiledRule] = []
+
+        bucket = self._by_source.get(source)
+        if bucket is not None:
+            out.extend(bucket.upto(severity))
+
+        if meta:
+            for k in self._meta_keys:
+                if k not in meta:
+                    continue
+                try:
+                    bucket = self._by_meta.get((k, meta[k]))
+                except TypeError:
+                    # valor no hasheable (dict/list): ninguna regla indexada puede igualarlo
+                    continue
+                if bucket is not None:
+                    out.extend(bucket.upto(severity))
+
+        out.extend(self._wildcard.upto(severity))
+        out.sort(key=lambda r: r.id)
+        return out
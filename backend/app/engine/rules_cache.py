@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.engine.matcher import ContainsMatcher
+from app.engine.notify import notify
+from app.engine.rule_index import RuleIndex
+from app.models.rule import Rule
+
+RULES_CHANNEL = "siem_rules_changed"
+
+# Red de seguridad por si el LISTEN está caído: recarga como mucho cada N segundos
+RULES_CACHE_TTL_SECONDS = float(os.getenv("RULES_CACHE_TTL_SECONDS", "30"))
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRule:
+    id: int
+    name: str
+    source: str | None
+    severity_min: int | None
+    # ya en minúsculas; None si la regla no filtra por texto
+    contains: str | None
+    meta_match: tuple[tuple[str, Any], ...]
+    threshold_count: int | None
+    threshold_seconds: int | None
+
+    @property
+    def is_threshold(self) -> bool:
+        return self.threshold_count is not None and self.threshold_seconds is not None
+
+    def matches(
+        self,
+        source: str,
+        severity: int,
+        message_lower: str,
+        meta: dict[str, Any] | None,
+    ) -> bool:
+        if self.source and source != self.source:
+            return False
+        if self.severity_min is not None and severity < self.severity_min:
+            return False
+        if self.contains and self.contains not in message_lower:
+            return False
+        return self.matches_meta(meta)
+
+    def matches_meta(self, meta: dict[str, Any] | None) -> bool:
+        if self.meta_match:
+            if not meta:
+                return False
+            for k, v in self.meta_match:
+                if meta.get(k) != v:
+                    return False
+        return True
+
+
+def compile_rule(rule: Rule) -> CompiledRule:
+    return CompiledRule(
+        id=rule.id,
+        name=rule.name,
+        source=rule.source or None,
+        severity_min=rule.severity_min,
+        contains=rule.contains.lower() if rule.contains else None,
+        meta_match=tuple((rule.meta_match or {}).items()),
+        threshold_count=rule.threshold_count,
+        threshold_seconds=rule.threshold_seconds,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class RuleSnapshot:
+    generation: int
+    loaded_at: float
+    # orden por id, como la evaluación original
+    rules: tuple[CompiledRule, ...]
+    index: RuleIndex
+    matcher: ContainsMatcher
+
+    def match(
+        self,
+        source: str,
+        severity: int,
+        message: str,
+        meta: dict[str, Any] | None,
+    ) -> list[CompiledRule]:
+        # El índice ya garantiza source y severity; el texto se escanea una
+        # sola vez (y solo si algún candidato tiene contains).
+        hits: set[int] | None = None
+        out: list[CompiledRule] = []
+        for rule in self.index.candidates(source, severity, meta):
+            if rule.contains:
+                if hits is None:
+                    hits = self.matcher.search((message or "").lower())
+                if rule.id not in hits:
+                    continue
+            if rule.matches_meta(meta):
+                out.append(rule)
+        return out
+
+
+def build_snapshot(rules: tuple[CompiledRule, ...], generation: int = 0) -> RuleSnapshot:
+    return RuleSnapshot(
+        generation=generation,
+        loaded_at=time.monotonic(),
+        rules=rules,
+        index=RuleIndex(rules),
+        matcher=ContainsMatcher((r.id, r.contains) for r in rules if r.contains),
+    )
+
+
+_lock = threading.Lock()
+_snapshot: RuleSnapshot | None = None
+_generation = 0
+
+
+def invalidate(_payload: str | None = None) -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def _is_fresh(snap: RuleSnapshot | None) -> bool:
+    return (
+        snap is not None
+        and snap.generation == _generation
+        and time.monotonic() - snap.loaded_at < RULES_CACHE_TTL_SECONDS
+    )
+
+
+def get_snapshot(db: Session) -> RuleSnapshot:
+    global _snapshot
+    snap = _snapshot
+    if _is_fresh(snap):
+        return snap
+
+    with _lock:
+        snap = _snapshot
+        if _is_fresh(snap):
+            return snap
+        generation = _generation
+
+    rules = db.execute(
+        select(Rule).where(Rule.enabled.is_(True)).order_by(Rule.id.asc())
+    ).scalars().all()
+    fresh = build_snapshot(tuple(compile_rule(r) for r in rules), generation)
+
+    # Si alguien invalidó mientras cargábamos, esta foto nace caducada
+    # (generation distinta) y la siguiente llamada recargará.
+    _snapshot = fresh
+    return fresh
+
+
+def notify_rules_changed(db: Session) -> None:
+    """Llamar dentro de la transacción que modifica reglas, antes del commit."""
+    notify(db, RULES_CHANNEL)
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timezone
+
+from app.db.database import SessionLocal
+from app.engine.counters import threshold_counters
+from app.engine.evaluator import compute_group_key, ingest_events
+from app.engine.invalidation import build_listener
+from app.engine.write_behind import INGEST_FLUSH_EVENTS, QueueFull, flush_batch
+from app.schemas.ingest import IngestPayload
+
+logger = logging.getLogger(__name__)
+
+# Modo opcional: N procesos de ingest, cada uno dueño de un rango de group_key.
+# El router vive en el proceso de la API: requiere un único worker de uvicorn.
+INGEST_SHARDS = int(os.getenv("INGEST_SHARDS", "0"))
+INGEST_SHARD_VNODES = int(os.getenv("INGEST_SHARD_VNODES", "64"))
+# Lotes (no eventos) pendientes por shard antes de responder 503
+INGEST_SHARD_QUEUE_MAX = int(os.getenv("INGEST_SHARD_QUEUE_MAX", "1000"))
+
+_REBALANCE_TIMEOUT = 60.0
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anillo de hash consistente con `vnodes` puntos por nodo.
+
+    Al añadir o quitar un nodo solo cambian de dueño ~1/N de las claves.
+    Es inmutable: cada cambio de topología crea un anillo nuevo.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = INGEST_SHARD_VNODES):
+        self.vnodes = vnodes
+        self.nodes: tuple[str, ...] = tuple(sorted(set(nodes)))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        if not self._hashes:
+            raise LookupError("empty hash ring")
+        i = bisect.bisect_right(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+    def with_node(self, node: str) -> HashRing:
+        return HashRing(self.nodes + (node,), self.vnodes)
+
+    def without_node(self, node: str) -> HashRing:
+        return HashRing((n for n in self.nodes if n != node), self.vnodes)
+
+
+def _shard_worker(
+    name: str,
+    vnodes: int,
+    batch_size: int,
+    inbox: mp.Queue,
+    acks: mp.Queue,
+) -> None:
+    # Proceso hijo: sus contadores de threshold solo ven las claves que le tocan
+    listener = build_listener()
+    listener.start()
+    pending: list[tuple[IngestPayload, datetime]] = []
+
+    def flush() -> None:
+        # Como write-behind: reintento si la BD no responde y solo se pierden las filas malas
+        if pending:
+            flush_batch(SessionLocal, pending)
+            pending.clear()
+
+    try:
+        while True:
+            msg = inbox.get()
+            # Vacía lo que haya en el buzón para formar micro-lotes
+            while True:
+                if msg is None:
+                    flush()
+                    return
+                kind, body = msg
+                if kind == "events":
+                    pending.extend(body)
+                    if len(pending) >= batch_size:
+                        flush()
+                elif kind == "rebalance":
+                    # Barrera: todo lo recibido antes queda confirmado y se
+                    # sueltan las claves que pasan a otro dueño
+                    flush()
+                    ring = HashRing(body, vnodes)
+                    threshold_counters.retain(lambda key: ring.owner(str(key[1])) == name)
+                    acks.put(name)
+                try:
+                    msg = inbox.get_nowait()
+                except queue.Empty:
+                    break
+            flush()
+    finally:
+        listener.stop()
+
+
+class ShardRouter:
+    """Router de ingest: reparte cada evento al shard dueño de su group_key.
+
+    El estado por (rule_id, group_key) de cada shard vive solo en su memoria.
+    En un rebalanceo (alta o baja de shard) se para el reparto, todos los
+    shards confirman lo pendiente y olvidan las claves que pierden; el nuevo
+    dueño no las tiene en memoria y siembra la ventana desde BD, que ya
+    contiene todos los eventos anteriores. Los eventos sin group_key no
+    tienen estado y van en rotación.
+
+    `put_many` se llama desde el bucle de asyncio y no espera nunca: durante
+    un rebalanceo el router retiene los lotes nuevos (hasta `maxsize`) y los
+    reparte con el anillo nuevo cuando todos los shards han confirmado.
+    """
+
+    def __init__(
+        self,
+        shards: int = INGEST_SHARDS,
+        vnodes: int = INGEST_SHARD_VNODES,
+        maxsize: int = INGEST_SHARD_QUEUE_MAX,
+        batch_size: int = INGEST_FLUSH_EVENTS,
+    ):
+        self.shards = shards
+        self.vnodes = vnodes
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        # Serializa arranque, parada y rebalanceos (put_many no lo toma)
+        self._topology_lock = threading.Lock()
+        # Lotes recibidos durante un rebalanceo; None => no hay rebalanceo en curso
+        self._held: list[list[tuple[IngestPayload, datetime]]] | None = None
+        self._acks: mp.Queue | None = None
+        self._workers: dict[str, tuple[mp.Process, mp.Queue]] = {}
+        self._ring = HashRing((), vnodes)
+        self._names = itertools.count()
+        self._rr = 0
+
+        self.routed: dict[str, int] = {}
+        self.rejected_total = 0
+        self.rebalances = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def ring(self) -> HashRing:
+        return self._ring
+
+    def start(self) -> None:
+        with self._topology_lock, self._lock:
+            if self._workers:
+                return
+            self._acks = self._ctx.Queue()
+            names = [self._next_name() for _ in range(max(1, self.shards))]
+            self._ring = HashRing(names, self.vnodes)
+            for name in names:
+                self._spawn(name)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        # Cada shard confirma lo pendiente antes de salir. Desde que salen del
+        # anillo, put_many responde QueueFull en vez de esperar a la parada.
+        with self._topology_lock:
+            with self._lock:
+                workers = list(self._workers.values())
+                self._workers.clear()
+                self._ring = HashRing((), self.vnodes)
+            for _, inbox in workers:
+                inbox.put(None)
+            for proc, _ in workers:
+                proc.join(timeout=timeout)
+
+    def put_many(self, payloads: Sequence[IngestPayload]) -> None:
+        # El ts de cada evento es el de llegada al router, no el del flush en el shard
+        received = datetime.now(timezone.utc)
+        batch = [(p, received) for p in payloads]
+        with self._lock:
+            self._reap()
+            if not self._workers:
+                self.rejected_total += len(payloads)
+                raise QueueFull()
+
+            if self._held is not None:
+                # Rebalanceo en curso: el lote espera en el router, no el que llama
+                if len(self._held) >= self.maxsize:
+                    self.rejected_total += len(payloads)
+                    raise QueueFull()
+                self._held.append(batch)
+                return
+
+            parts = self._split(batch)
+            # Todo o nada. Solo el router escribe en los buzones (bajo el lock,
+            # o sin reparto en curso), así que el hueco que se ve ahora sigue ahí al encolar.
+            if any(self._workers[node][1].qsize() >= self.maxsize for node in parts):
+                self.rejected_total += len(payloads)
+                raise QueueFull()
+            self._send(parts)
+
+    def add_shard(self) -> str:
+        with self._topology_lock:
+            with self._lock:
+                self._reap()
+                name = self._next_name()
+                ring = self._ring.with_node(name)
+            try:
+                self._barrier(ring)
+                with self._lock:
+                    self._ring = self._ring.with_node(name)
+                    self._spawn(name)
+                    self.rebalances += 1
+            finally:
+                self._release_held()
+            return name
+
+    def remove_shard(self, name: str, timeout: float = 30.0) -> None:
+        with self._topology_lock:
+            with self._lock:
+                self._reap()
+                if name not in self._workers:
+                    raise KeyError(name)
+                if len(self._workers) == 1:
+                    raise ValueError("cannot remove the last shard")
+                ring = self._ring.without_node(name)
+            try:
+                self._barrier(ring)
+                with self._lock:
+                    # Puede haberlo quitado ya _reap si se cayó durante la barrera
+                    removed = self._workers.pop(name, None)
+                    if removed is not None:
+                        self._ring = self._ring.without_node(name)
+                        self.rebalances += 1
+            finally:
+                self._release_held()
+            if removed is not None:
+                proc, inbox = removed
+                inbox.put(None)
+                proc.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "vnodes": self.vnodes,
+            "rebalances": self.rebalances,
+            "rejected_total": self.rejected_total,
+            "shards": [
+                {
+                    "name": name,
+                    "alive": proc.is_alive(),
+                    "depth": inbox.qsize(),
+                    "routed_total": self.routed.get(name, 0),
+                }
+                for name, (proc, inbox) in self._workers.items()
+            ],
+        }
+
+    def _next_name(self) -> str:
+        return f"shard-{next(self._names)}"
+
+    def _spawn(self, name: str) -> None:
+        inbox = self._ctx.Queue(self.maxsize)
+        proc = self._ctx.Process(
+            target=_shard_worker,
+            args=(name, self.vnodes, self.batch_size, inbox, self._acks),
+            name=f"ingest-{name}",
+            daemon=True,
+        )
+        proc.start()
+        self._workers[name] = (proc, inbox)
+        self.routed.setdefault(name, 0)
+
+    def _split(self, batch: list[tuple[IngestPayload, datetime]]) -> dict[str, list[tuple[IngestPayload, datetime]]]:
+        parts: dict[str, list[tuple[IngestPayload, datetime]]] = {}
+        nodes = self._ring.nodes
+        for item in batch:
+            group_key = compute_group_key(item[0].meta)
+            if group_key is None:
+                node = nodes[self._rr % len(nodes)]
+                self._rr += 1
+            else:
+                node = self._ring.owner(str(group_key))
+            parts.setdefault(node, []).append(item)
+        return parts
+
+    def _send(self, parts: dict[str, list[tuple[IngestPayload, datetime]]]) -> None:
+        for node, batch in parts.items():
+            self._workers[node][1].put(("events", batch))
+            self.routed[node] += len(batch)
+
+    def _barrier(self, ring: HashRing) -> None:
+        # Desde aquí put_many retiene los lotes, así que la marca de cada buzón va
+        # detrás de todo lo repartido antes. La espera es sin self._lock.
+        with self._lock:
+            self._held = []
+            workers = dict(self._workers)
+        for _, inbox in workers.values():
+            inbox.put(("rebalance", ring.nodes))
+        waiting = set(workers)
+        deadline = time.monotonic() + _REBALANCE_TIMEOUT
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"rebalance barrier timed out waiting for {sorted(waiting)}")
+            try:
+                waiting.discard(self._acks.get(timeout=min(remaining, 1.0)))
+            except queue.Empty:
+                # Un shard caído no va a confirmar
+                waiting = {name for name in waiting if workers[name][0].is_alive()}
+
+    def _release_held(self) -> None:
+        # Fin del rebalanceo (o fallo): lo retenido sale en orden de llegada con el
+        # anillo actual. Cabe en los buzones: son como mucho maxsize lotes.
+        with self._lock:
+            held, self._held = self._held or [], None
+            self._reap()
+            for batch in held:
+                if not self._workers:
+                    logger.error("no ingest shards left; %d queued events dropped", len(batch))
+                    continue
+                self._send(self._split(batch))
+
+    def _reap(self) -> None:
+        # Un shard caído sale del anillo; sus claves se siembran desde BD en el nuevo dueño
+        dead = [name for name, (proc, _) in self._workers.items() if not proc.is_alive()]
+        for name in dead:
+            logger.error("ingest %s died; removing it from the ring", name)
+            del self._workers[name]
+            self._ring = self._ring.without_node(name)
+            self.rebalances += 1
+
+
+shard_router = ShardRouter()
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.engine.evaluator import ingest_events
+from app.schemas.ingest import IngestPayload
+
+logger = logging.getLogger(__name__)
+
+# Modo opcional: /ingest responde 202 y un hilo guarda en micro-lotes
+INGEST_WRITE_BEHIND = os.getenv("INGEST_WRITE_BEHIND", "0") == "1"
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "100000"))
+INGEST_FLUSH_EVENTS = int(os.getenv("INGEST_FLUSH_EVENTS", "500"))
+INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "50"))
+# Reintentos de un micro-lote si falla la conexión con la BD (con espera creciente)
+INGEST_FLUSH_RETRIES = int(os.getenv("INGEST_FLUSH_RETRIES", "3"))
+INGEST_RETRY_BACKOFF_MS = int(os.getenv("INGEST_RETRY_BACKOFF_MS", "200"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+def flush_batch(session_factory: Callable[[], Session], batch: list[tuple[IngestPayload, datetime]]) -> int:
+    """Guarda un micro-lote ya respondido con 202 y devuelve cuántos eventos se descartan.
+
+    Lo usan los dos modos de ingest diferido (write-behind y shards). Si la BD
+    no responde, el lote se reintenta; si lo rechaza (una fila mala), se parte
+    en mitades hasta aislar las filas que fallan, y solo esas se descartan.
+    """
+    error: Exception | None = None
+    for attempt in range(INGEST_FLUSH_RETRIES + 1):
+        try:
+            _store(session_factory, batch)
+            return 0
+        except (OperationalError, InterfaceError) as e:
+            # Conexión caída o BD sin responder: el mismo lote puede entrar luego
+            error = e
+            if attempt < INGEST_FLUSH_RETRIES:
+                logger.warning("ingest flush failed, retrying (%d events): %s", len(batch), e)
+                time.sleep(INGEST_RETRY_BACKOFF_MS / 1000 * 2**attempt)
+        except Exception as e:
+            if len(batch) > 1:
+                # Alguna fila no entra: cada mitad por separado
+                half = len(batch) // 2
+                return flush_batch(session_factory, batch[:half]) + flush_batch(session_factory, batch[half:])
+            error = e
+            break
+    logger.error("ingest flush failed (%d events dropped)", len(batch), exc_info=error)
+    return len(batch)
+
+
+def _store(session_factory: Callable[[], Session], batch: list[tuple[IngestPayload, datetime]]) -> None:
+    db = session_factory()
+    try:
+        ingest_events(db, [p for p, _ in batch], datetime.now(timezone.utc), [ts for _, ts in batch])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class WriteBehindQueue:
+    """Cola acotada en proceso + hilo que la vacía en micro-lotes.
+
+    Cada micro-lote (hasta `batch_size` eventos o `flush_ms` de espera) va en
+    una sola transacción por `ingest_events`, igual que /ingest/batch. El ts
+    de cada evento es el de llegada a la cola, no el del flush.
+
+    Los eventos ya tienen su 202: cada micro-lote se guarda con `flush_batch`.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        maxsize: int = INGEST_QUEUE_MAX,
+        batch_size: int = INGEST_FLUSH_EVENTS,
+        flush_ms: int = INGEST_FLUSH_MS,
+    ):
+        self._session_factory = session_factory
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000
+
+        self._items: deque[tuple[IngestPayload, datetime]] = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def put_many(self, payloads: Sequence[IngestPayload]) -> None:
+        # Todo o nada: un lote no se encola a medias
+        with self._cond:
+            if self._stopping or len(self._items) + len(payloads) > self.maxsize:
+                self.rejected_total += len(payloads)
+                raise QueueFull()
+            received = datetime.now(timezone.utc)
+            self._items.extend((p, received) for p in payloads)
+            self.enqueued_total += len(payloads)
+            self._cond.notify()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ingest-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        # Parada ordenada: deja de aceptar y vacía lo pendiente antes de salir
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "depth": len(self._items),
+            "capacity": self.maxsize,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "failed_total": self.failed_total,
+            "rejected_total": self.rejected_total,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+    def _take_batch(self) -> list[tuple[IngestPayload, datetime]]:
+        with self._cond:
+            while not self._items and not self._stopping:
+                self._cond.wait()
+
+            # Espera a completar el micro-lote, como mucho flush_seconds
+            deadline = time.monotonic() + self.flush_seconds
+            while len(self._items) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            n = min(self.batch_size, len(self._items))
+            return [self._items.popleft() for _ in range(n)]
+
+    def _flush(self, batch: list[tuple[IngestPayload, datetime]]) -> None:
+        started = time.perf_counter()
+        failed = flush_batch(self._session_factory, batch)
+        self.flushed_total += len(batch) - failed
+        self.failed_total += failed
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping:
+                return
+
+
+ingest_queue = WriteBehindQueue(SessionLocal)
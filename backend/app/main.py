@@ -1,8 +1,12 @@
 # backend/app/main.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.pagination import CURSOR_HEADERS
+from app.api.responses import ORJSONResponse
 from app.api.routes.info import router as info_router
 from app.api.routes.alerts import router as alerts_router
 from app.api.routes.events import router as events_router
@@ -10,8 +14,45 @@ from app.api.routes.health import router as health_router
 from app.api.routes.ingest import router as ingest_router
 from app.api.routes.metrics import router as metrics_router
 from app.api.routes.rules import router as rules_router
+from app.db.database import engine
+from app.db.metric_counters import CounterReconciler
+from app.db.partitions import PartitionMaintainer
+from app.engine.invalidation import build_listener
+from app.engine.sharding import INGEST_SHARDS, shard_router
+from app.engine.write_behind import INGEST_WRITE_BEHIND, ingest_queue
+from app.syslog.server import SYSLOG_ENABLED, syslog_server
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listener = build_listener()
+    listener.start()
+    # Particiones de events por adelantado + retención
+    partitions = PartitionMaintainer(engine)
+    partitions.start()
+    # Corrige la deriva de los contadores de /metrics
+    counters = CounterReconciler(engine)
+    counters.start()
+    if INGEST_SHARDS:
+        shard_router.start()
+    elif INGEST_WRITE_BEHIND:
+        ingest_queue.start()
+    if SYSLOG_ENABLED:
+        await syslog_server.start()
+    try:
+        yield
+    finally:
+        if SYSLOG_ENABLED:
+            await syslog_server.stop()
+        # Vacía la cola antes de cerrar para no perder eventos ya aceptados (202)
+        shard_router.stop()
+        ingest_queue.stop()
+        counters.stop()
+        partitions.stop()
+        listener.stop()
+
 
-app = FastAPI(title="SIEM Backend", version="0.1.0")
+app = FastAPI(title="SIEM Backend", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS (DEV): permite el frontend servido localmente.
 # Ajusta el/los orígenes a tu puerto real (p.ej. 5173 si usas Vite).
@@ -21,6 +62,8 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursores de paginación de /alerts y /alerts/ui
+    expose_headers=CURSOR_HEADERS,
 )
 
 # Routers
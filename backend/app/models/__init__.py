@@ -1,3 +1,4 @@
 from .rule import Rule  # noqa: F401
 from .alert import Alert  # noqa: F401
 from .event import Event  # noqa: F401
+from .metric_counter import MetricCounter  # noqa: F401
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func
+from sqlalchemy import DateTime, ForeignKey, ForeignKeyConstraint, Index, Integer, String, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
+from app.db.search import TRGM_INDEX_INFO
 
 
 class Alert(Base):
@@ -20,15 +21,19 @@ class Alert(Base):
         index=True,
     )
 
-    event_id: Mapped[int] = mapped_column(
-        Integer,
-        ForeignKey("events.id", ondelete="CASCADE"),
-        nullable=False,
-        index=True,
-    )
+    event_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    # events está particionada por ts: la FK va sobre (id, ts)
+    event_ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
 
     title: Mapped[str] = mapped_column(String(200), nullable=False)
 
+    # Copia de rule.name y del evento al crear la alerta: la vista de
+    # alertas (listado, filtros, detalle) no necesita join con rules/events
+    rule_name: Mapped[str] = mapped_column(String(120), nullable=False)
+    event_source: Mapped[str] = mapped_column(String(64), nullable=False)
+    event_severity: Mapped[int] = mapped_column(Integer, nullable=False)
+    event_message: Mapped[str] = mapped_column(Text, nullable=False)
+
     # Agrupación (p.ej. host) para threshold/throttle por “grupo”
     group_key: Mapped[str | None] = mapped_column(String(120), nullable=True, index=True)
 
@@ -51,11 +56,58 @@ class Alert(Base):
         onupdate=func.now(),
     )
 
+    # Eventos que han vuelto a disparar la regla mientras la alerta seguía activa
+    occurrences: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+    last_seen_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
     # Relaciones (no obligatorias para el MVP, pero útiles)
     rule = relationship("Rule")
     event = relationship("Event")
 
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["event_id", "event_ts"],
+            ["events.id", "events.ts"],
+            name="alerts_event_fkey",
+            ondelete="CASCADE",
+        ),
+    )
+
 
 # Índices adicionales (además de los index=True)
+# Orden de listado y cursor de paginación: (created_at, id)
+Index("ix_alerts_created_at_id", Alert.created_at, Alert.id)
 Index("ix_alerts_rule_id_created_at", Alert.rule_id, Alert.created_at)
 Index("ix_alerts_group_key_created_at", Alert.group_key, Alert.created_at)
+# Filtros de la vista de alertas sobre los campos copiados del evento
+Index("ix_alerts_event_severity_created_at", Alert.event_severity, Alert.created_at)
+Index("ix_alerts_event_source_lower", func.lower(Alert.event_source), Alert.created_at)
+# Búsqueda por subcadena en título y mensaje (solo si hay pg_trgm)
+Index(
+    "ix_alerts_title_trgm",
+    Alert.title,
+    postgresql_using="gin",
+    postgresql_ops={"title": "gin_trgm_ops"},
+    info=TRGM_INDEX_INFO,
+)
+Index(
+    "ix_alerts_event_message_trgm",
+    Alert.event_message,
+    postgresql_using="gin",
+    postgresql_ops={"event_message": "gin_trgm_ops"},
+    info=TRGM_INDEX_INFO,
+)
+
+# Anti-duplicado en BD: una sola alerta open/ack por (rule_id, group_key).
+# Las de group_key NULL no chocan entre sí (NULL <> NULL), igual que antes.
+Index(
+    "uq_alerts_active_rule_group",
+    Alert.rule_id,
+    Alert.group_key,
+    unique=True,
+    postgresql_where=text("status IN ('open', 'ack')"),
+)
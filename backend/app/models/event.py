@@ -1,17 +1,33 @@
+import json
 from typing import Any, Optional
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 
-from sqlalchemy import DateTime, Integer, String, Text, func
+from sqlalchemy import Computed, DateTime, Index, Integer, String, Text, func, or_
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.db.base import Base
+from app.db.search import TRGM_INDEX_INFO
+
+
+# Texto indexado para búsqueda full-text: el mensaje pesa más (A) que los valores de meta (B).
+# Cambiarlo requiere migración (la columna es STORED).
+SEARCH_META_KEYS = ("host", "app", "user", "src_ip")
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', message), 'A') || setweight(to_tsvector('english', "
+    + " || ' ' || ".join(f"coalesce(meta ->> '{k}', '')" for k in SEARCH_META_KEYS)
+    + "), 'B')"
+)
 
 
 class Event(Base):
     __tablename__ = "events"
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    ts: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # Particionada por rango de ts (ver app.db.partitions): la PK tiene que incluirla
+    ts: Mapped[object] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, primary_key=True
+    )
 
     source: Mapped[str] = mapped_column(String(64), nullable=False)
     severity: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -21,3 +37,77 @@ class Event(Base):
 
     meta: Mapped[Optional[dict[str, Any]]] = mapped_column(JSONB, nullable=True)
 
+    # Claves de meta promovidas: columnas generadas (STORED) con índice btree
+    meta_host: Mapped[Optional[str]] = mapped_column(Text, Computed("meta ->> 'host'", persisted=True))
+    meta_src_ip: Mapped[Optional[str]] = mapped_column(Text, Computed("meta ->> 'src_ip'", persisted=True))
+    meta_user: Mapped[Optional[str]] = mapped_column(Text, Computed("meta ->> 'user'", persisted=True))
+
+    # Solo para filtrar/ordenar en SQL; no se carga con la fila
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True), deferred=True
+    )
+
+    __table_args__ = (
+        Index("ix_events_ts", "ts"),
+        # (host, ts): sirve al filtro por host y a la siembra de threshold por ventana
+        Index("ix_events_meta_host_ts", "meta_host", "ts"),
+        Index("ix_events_meta_src_ip", "meta_src_ip"),
+        Index("ix_events_meta_user", "meta_user"),
+        # Búsqueda por subcadena (ILIKE '%q%', solo si hay pg_trgm) y por contención en meta (@>)
+        Index(
+            "ix_events_message_trgm",
+            "message",
+            postgresql_using="gin",
+            postgresql_ops={"message": "gin_trgm_ops"},
+            info=TRGM_INDEX_INFO,
+        ),
+        Index("ix_events_meta_path", "meta", postgresql_using="gin", postgresql_ops={"meta": "jsonb_path_ops"}),
+        Index("ix_events_search_vector", "search_vector", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+
+# Clave de meta -> columna promovida. Añadir una clave aquí requiere su migración.
+PROMOTED_META = {
+    "host": Event.meta_host,
+    "src_ip": Event.meta_src_ip,
+    "user": Event.meta_user,
+}
+
+
+def meta_text(key: str) -> ColumnElement:
+    """`meta ->> key`, usando la columna promovida (indexada) si existe."""
+    column = PROMOTED_META.get(key)
+    return column if column is not None else Event.meta[key].astext
+
+
+def meta_equals(key: str, value: Any) -> ColumnElement:
+    """Igualdad JSON exacta (`meta @> {key: value}`), acotada por el índice si la clave está promovida."""
+    cond = Event.meta.contains({key: value})
+    column = PROMOTED_META.get(key)
+    if column is not None and isinstance(value, str):
+        # ->> no distingue "5" de 5: la columna filtra por índice y @> confirma el tipo
+        cond = (column == value) & cond
+    return cond
+
+
+
+def meta_text_equals(key: str, value: str) -> ColumnElement:
+    """`meta ->> key = value` (filtro de la API, value llega como texto).
+
+    Clave promovida: su columna. Si no, se acota con `@>` (índice GIN
+    jsonb_path_ops) probando el valor como string y como escalar JSON
+    ("5" -> 5, "true" -> true) y el `->>` confirma la igualdad textual.
+    """
+    column = PROMOTED_META.get(key)
+    if column is not None:
+        return column == value
+
+    candidates = [Event.meta.contains({key: value})]
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = value
+    if not isinstance(parsed, str):
+        candidates.append(Event.meta.contains({key: parsed}))
+    return or_(*candidates) & (Event.meta[key].astext == value)
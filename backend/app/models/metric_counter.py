@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Index, SmallInteger, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class MetricCounter(Base):
+    """Contadores de /metrics, mantenidos en la misma transacción que los cambios.
+
+    Cada contador (name, key) se reparte en varias filas (`slot`) para que los
+    ingest concurrentes no se bloqueen sobre la misma fila; el valor es la suma.
+    Los de group_key tienen una sola fila (slot 0): el top de /metrics sale del
+    índice (name, value) sin sumar nada.
+    """
+
+    __tablename__ = "metric_counters"
+    __table_args__ = (Index("ix_metric_counters_name_value", "name", "value"),)
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # '' en los totales; status o group_key en los desgloses
+    key: Mapped[str] = mapped_column(Text, primary_key=True, server_default="")
+    slot: Mapped[int] = mapped_column(SmallInteger, primary_key=True, server_default="0")
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field
 
 
 AlertStatus = Literal["open", "ack", "closed"]
+CountMode = Literal["exact", "capped", "estimate"]
 
 
 class AlertOut(BaseModel):
@@ -21,11 +22,14 @@ class AlertOut(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+    occurrences: int
+    last_seen_at: datetime
+
     model_config = {"from_attributes": True}
 
 
 class AlertUIOut(AlertOut):
-    # Campos extra “listos para UI” (sin tocar BD)
+    # Campos extra “listos para UI” (copiados en la propia fila de alerts)
     rule_name: str
     event_ts: datetime
     event_source: str
@@ -33,6 +37,13 @@ class AlertUIOut(AlertOut):
     event_message: str
 
 
+class AlertUIPage(BaseModel):
+    items: list[AlertUIOut]
+    total: int
+    # exact: total real; capped: hay más de `total`; estimate: estimación del planner
+    total_mode: CountMode
+
+
 class AlertUpdate(BaseModel):
     # Permitimos solo cambios de estado en el MVP
     status: AlertStatus = Field(...)
@@ -18,5 +18,7 @@ class EventOut(BaseModel):
     message: str
     meta: Optional[dict[str, Any]] = None
     created_at: datetime
- 
+    # Solo con search + rank=true
+    rank: Optional[float] = None
+
     model_config = {"from_attributes": True}
@@ -1,7 +1,18 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Any
 
 
+def has_nul(value: Any) -> bool:
+    # Postgres no admite \x00 en text ni en json: tumbaría la transacción del lote
+    if isinstance(value, str):
+        return "\x00" in value
+    if isinstance(value, dict):
+        return any(has_nul(k) or has_nul(v) for k, v in value.items())
+    if isinstance(value, list):
+        return any(has_nul(v) for v in value)
+    return False
+
+
 class IngestPayload(BaseModel):
     source: str = Field(min_length=1, max_length=64)
     severity: int = Field(ge=0, le=10)
@@ -9,3 +20,36 @@ class IngestPayload(BaseModel):
 
     # opcional: para futuro (IP, host, raw, etc.)
     meta: Optional[dict[str, Any]] = None
+
+    @field_validator("source", "message", "meta")
+    @classmethod
+    def _no_nul(cls, value):
+        if has_nul(value):
+            raise ValueError("must not contain NUL characters")
+        return value
+
+
+class IngestAlertOut(BaseModel):
+    id: int
+    rule_id: int
+    event_id: int
+    group_key: Optional[str] = None
+
+
+class IngestBatchOut(BaseModel):
+    # ids de evento en el mismo orden que el lote recibido
+    event_ids: list[int]
+    alerts: list[IngestAlertOut]
+
+
+class NdjsonLineError(BaseModel):
+    line: int
+    error: str
+
+
+class NdjsonIngestOut(BaseModel):
+    accepted: int
+    rejected: int
+    # solo las primeras N; errors_truncated indica si hubo más
+    errors: list[NdjsonLineError]
+    errors_truncated: bool = False
@@ -0,0 +1,30 @@
+# Listener syslog como proceso aparte: python -m app.syslog
+
+import asyncio
+import logging
+import signal
+
+from app.engine.invalidation import build_listener
+from app.syslog.server import syslog_server
+
+
+async def main() -> None:
+    listener = build_listener()
+    listener.start()
+    await syslog_server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        await syslog_server.stop()
+        listener.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
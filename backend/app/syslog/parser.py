@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.schemas.ingest import IngestPayload
+
+SYSLOG_SOURCE = "syslog"
+
+# Severidad syslog (0 = emerg ... 7 = debug) -> escala 0..10 del SIEM
+SEVERITY_MAP = (10, 9, 8, 7, 5, 4, 2, 0)
+
+_PRI = re.compile(rb"<(\d{1,3})>")
+
+# <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID SD [MSG]
+_RFC5424 = re.compile(
+    r"1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\\]|\\.)*\])+)(?: (.*))?",
+    re.S,
+)
+
+# <PRI>Mmm dd hh:mm:ss HOST MSG
+_RFC3164 = re.compile(r"([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (\S+) (.*)", re.S)
+_TAG = re.compile(r"([^:\[\s]{1,48})(?:\[([^\]]{1,16})\])?: ?(.*)", re.S)
+
+
+def _nil(value: str) -> str | None:
+    return None if value == "-" else value
+
+
+def parse_syslog(frame: bytes) -> IngestPayload | None:
+    """RFC 5424 o RFC 3164 -> IngestPayload. None si la trama no es syslog válido.
+
+    `meta.host` queda relleno cuando la trama trae hostname, para que el
+    group_key del motor funcione igual que con /ingest.
+    """
+    m = _PRI.match(frame)
+    if m is None:
+        return None
+    pri = int(m.group(1))
+    if pri > 191:
+        return None
+
+    # Sin NUL en ningún campo (mensaje ni meta): Postgres no los admite
+    text = frame[m.end():].decode("utf-8", "replace").replace("\x00", "").rstrip("\r\n")
+    meta: dict[str, Any] = {"facility": pri >> 3, "syslog_severity": pri & 7}
+
+    if (h := _RFC5424.fullmatch(text)) is not None:
+        ts, host, app, procid, msgid, sd, message = h.groups()
+        message = (message or "").removeprefix("\ufeff")
+        for key, value in (("ts", ts), ("host", host), ("app", app), ("pid", procid), ("msgid", msgid)):
+            if (value := _nil(value)) is not None:
+                meta[key] = value
+        if sd != "-":
+            meta["structured_data"] = sd
+    elif (h := _RFC3164.fullmatch(text)) is not None:
+        ts, host, rest = h.groups()
+        meta["ts"] = ts
+        meta["host"] = host
+        message = rest
+        if (t := _TAG.fullmatch(rest)) is not None:
+            app, procid, message = t.groups()
+            meta["app"] = app
+            if procid:
+                meta["pid"] = procid
+    else:
+        # Sin cabecera reconocible: nos quedamos con el texto tal cual
+        message = text
+
+    message = message.strip()
+    if not message:
+        return None
+
+    # alerts.group_key es VARCHAR(120): un hostname más largo tumbaría el lote entero
+    if "host" in meta:
+        meta["host"] = meta["host"][:120]
+
+    # Validada como en /ingest: una trama que no pase se descarta sola, no con su lote
+    try:
+        return IngestPayload(
+            source=SYSLOG_SOURCE,
+            severity=SEVERITY_MAP[pri & 7],
+            message=message,
+            meta=meta,
+        )
+    except ValidationError:
+        return None
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+
+from app.db.database import SessionLocal
+from app.engine.sharding import shard_router
+from app.engine.write_behind import QueueFull, WriteBehindQueue
+from app.schemas.ingest import IngestPayload
+from app.syslog.parser import parse_syslog
+
+logger = logging.getLogger(__name__)
+
+SYSLOG_ENABLED = os.getenv("SYSLOG_ENABLED", "0") == "1"
+SYSLOG_HOST = os.getenv("SYSLOG_HOST", "0.0.0.0")
+# 0 => desactivado
+SYSLOG_UDP_PORT = int(os.getenv("SYSLOG_UDP_PORT", "5514"))
+SYSLOG_TCP_PORT = int(os.getenv("SYSLOG_TCP_PORT", "5514"))
+# Buffer de recepción UDP: absorbe ráfagas mientras el bucle está ocupado
+SYSLOG_UDP_RCVBUF = int(os.getenv("SYSLOG_UDP_RCVBUF", str(8 * 1024 * 1024)))
+
+# Lotes que se entregan a la cola de ingest
+SYSLOG_BATCH_EVENTS = int(os.getenv("SYSLOG_BATCH_EVENTS", "500"))
+SYSLOG_BATCH_MS = int(os.getenv("SYSLOG_BATCH_MS", "50"))
+
+_MAX_TCP_FRAME = 64 * 1024
+
+
+class SyslogStats:
+    __slots__ = ("received", "parsed", "dropped_invalid", "dropped_backpressure")
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.parsed = 0
+        self.dropped_invalid = 0
+        self.dropped_backpressure = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "parsed": self.parsed,
+            "dropped": self.dropped_invalid + self.dropped_backpressure,
+            "dropped_invalid": self.dropped_invalid,
+            "dropped_backpressure": self.dropped_backpressure,
+        }
+
+
+class SyslogServer:
+    """Listener syslog UDP/TCP sobre asyncio.
+
+    Parsea cada trama, acumula lotes en el propio bucle y los entrega a una
+    WriteBehindQueue, que los evalúa con el mismo `ingest_events` que /ingest.
+    Con INGEST_SHARDS los lotes van al shard_router, igual que /ingest.
+    """
+
+    def __init__(
+        self,
+        queue: WriteBehindQueue,
+        host: str = SYSLOG_HOST,
+        udp_port: int = SYSLOG_UDP_PORT,
+        tcp_port: int = SYSLOG_TCP_PORT,
+        batch_size: int = SYSLOG_BATCH_EVENTS,
+        batch_ms: int = SYSLOG_BATCH_MS,
+    ):
+        self.queue = queue
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.batch_size = batch_size
+        self.batch_seconds = batch_ms / 1000
+        self.stats = SyslogStats()
+
+        self._batch: list[IngestPayload] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._udp: asyncio.DatagramTransport | None = None
+        self._tcp: asyncio.Server | None = None
+
+    def feed(self, frame: bytes) -> None:
+        self.stats.received += 1
+        payload = parse_syslog(frame)
+        if payload is None:
+            self.stats.dropped_invalid += 1
+            return
+        self.stats.parsed += 1
+
+        self._batch.append(payload)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_seconds, self.flush)
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        target = shard_router if shard_router.running else self.queue
+        try:
+            target.put_many(batch)
+        except QueueFull:
+            # syslog no tiene vuelta atrás: si la BD no da abasto, se descarta y se cuenta
+            self.stats.dropped_backpressure += len(batch)
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.queue.start()
+        if self.udp_port:
+            self._udp, _ = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.udp_port)
+            )
+            sock = self._udp.get_extra_info("socket")
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SYSLOG_UDP_RCVBUF)
+            except OSError:
+                logger.warning("could not set SO_RCVBUF=%d", SYSLOG_UDP_RCVBUF)
+        if self.tcp_port:
+            self._tcp = await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port)
+        logger.info("syslog listening on %s (udp=%s tcp=%s)", self.host, self.udp_port, self.tcp_port)
+
+    async def stop(self) -> None:
+        if self._udp is not None:
+            self._udp.close()
+            self._udp = None
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+            self._tcp = None
+        self.flush()
+        await asyncio.to_thread(self.queue.stop)
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # RFC 6587: "LEN SP MSG" (octet counting) o una trama por línea
+        try:
+            while True:
+                first = await reader.read(1)
+                if not first:
+                    break
+                if first.isdigit():
+                    digits = first + await reader.readuntil(b" ")
+                    length = int(digits[:-1])
+                    if length > _MAX_TCP_FRAME:
+                        self.stats.received += 1
+                        self.stats.dropped_invalid += 1
+                        break
+                    self.feed(await reader.readexactly(length))
+                elif first not in b"\r\n":
+                    try:
+                        line = await reader.readuntil(b"\n")
+                    except asyncio.IncompleteReadError as e:
+                        # última trama sin salto de línea antes de cerrar
+                        line = e.partial
+                    self.feed(first + line)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: SyslogServer):
+        self.server = server
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.server.feed(data)
+
+
+syslog_server = SyslogServer(WriteBehindQueue(SessionLocal))
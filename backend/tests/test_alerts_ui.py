@@ -1,4 +1,7 @@
+import uuid
+
 from fastapi.testclient import TestClient
+
 from app.main import app
 
 client = TestClient(app)
@@ -20,3 +23,65 @@ def test_alerts_ui_count_returns_int():
     # FastAPI response_model=int -> JSON number
     assert isinstance(r.json(), int)
     assert r.json() >= 0
+
+
+def test_alerts_ui_q_treats_like_wildcards_literally():
+    r = client.get("/alerts/ui/count", params={"q": "%_no-such-alert_%"})
+    assert r.status_code == 200
+    assert r.json() == 0
+
+
+def test_alerts_cursor_pages_match_offset_pages():
+    tag = uuid.uuid4().hex
+    # 7 alertas propias (un host por evento: sin anti-duplicado), no depende de lo que haya en BD
+    rule = client.post("/rules", json={"name": f"cursor-{tag}", "contains": tag, "source": "cursor"}).json()
+    client.post("/ingest/batch", json=[
+        {"source": "cursor", "severity": 3, "message": f"hit {tag}", "meta": {"host": f"h{i}-{tag}"}}
+        for i in range(7)
+    ])
+    params = {"limit": 3, "rule_id": rule["id"]}
+
+    first = client.get("/alerts/ui", params=params)
+    assert len(first.json()) == 3
+    assert "X-Prev-Cursor" not in first.headers
+    second = client.get("/alerts/ui", params={**params, "cursor": first.headers["X-Next-Cursor"]})
+    by_offset = client.get("/alerts/ui", params={**params, "offset": 3})
+    assert [a["id"] for a in second.json()] == [a["id"] for a in by_offset.json()]
+
+    third = client.get("/alerts/ui", params={**params, "cursor": second.headers["X-Next-Cursor"]})
+    assert len(third.json()) == 1
+    assert "X-Next-Cursor" not in third.headers
+
+    back = client.get("/alerts/ui", params={**params, "cursor": second.headers["X-Prev-Cursor"]})
+    assert [a["id"] for a in back.json()] == [a["id"] for a in first.json()]
+    assert "X-Prev-Cursor" not in back.headers
+
+    assert client.get("/alerts", params={"cursor": "not-a-cursor"}).status_code == 422
+
+
+def test_alerts_ui_page_returns_items_and_total():
+    exact = client.get("/alerts/ui/page", params={"limit": 2, "count": "exact"}).json()
+    assert exact["total"] == client.get("/alerts/ui/count").json()
+    assert exact["total_mode"] == "exact"
+    assert len(exact["items"]) == min(2, exact["total"])
+
+    # Más allá del final: sin filas, pero con total
+    empty = client.get("/alerts/ui/page", params={"offset": exact["total"], "count": "exact"}).json()
+    assert empty["items"] == [] and empty["total"] == exact["total"]
+
+    est = client.get("/alerts/ui/page", params={"count": "estimate", "search": "failed", "q": "it's"})
+    assert est.status_code == 200
+    assert est.json()["total_mode"] in ("exact", "capped", "estimate")
+
+
+def test_alerts_ui_reads_denormalized_fields():
+    tag = uuid.uuid4().hex
+    # Solo casa con mensajes que llevan el tag: no afecta a otros tests
+    rule = client.post("/rules", json={"name": f"denorm-{tag}", "contains": tag, "source": "denorm"}).json()
+    client.post("/ingest", json={"source": "denorm", "severity": 7, "message": f"hit {tag}"})
+
+    items = client.get("/alerts/ui", params={"rule_id": rule["id"], "source": "DENORM", "severity_min": 7}).json()
+    assert len(items) == 1
+    assert items[0]["rule_name"] == f"denorm-{tag}"
+    assert items[0]["event_message"] == f"hit {tag}"
+    assert client.get(f"/alerts/{items[0]['id']}/ui").json() == items[0]
@@ -0,0 +1,71 @@
+import gzip
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import app.api.routes.events as events_routes
+from app.archive.archiver import archive_events
+from app.archive.store import Archive
+from app.db.database import engine
+from app.main import app
+
+client = TestClient(app)
+
+OLD = datetime(2001, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def test_archive_moves_old_events_and_list_events_falls_through(tmp_path, monkeypatch):
+    tag = uuid.uuid4().hex[:12]
+    source = f"arc-{tag}"
+    with engine.begin() as conn:
+        ids = [
+            conn.scalar(
+                text(
+                    "INSERT INTO events (ts, source, severity, message, meta) "
+                    "VALUES (:ts, :s, :sev, :m, CAST(:meta AS jsonb)) RETURNING id"
+                ),
+                {"ts": OLD + timedelta(hours=i * 12), "s": source, "sev": i, "m": f"msg {i}", "meta": f'{{"host": "h{i}"}}'},
+            )
+            for i in range(5)
+        ]
+        rule_id = conn.scalar(text("INSERT INTO rules (name, enabled) VALUES (:n, false) RETURNING id"), {"n": f"arc-{tag}"})
+        conn.execute(
+            text(
+                "INSERT INTO alerts (rule_id, event_id, event_ts, title, rule_name, event_source, event_severity, event_message) "
+                "VALUES (:r, :e, :ts, 't', 'r', 'fw', 1, 'm')"
+            ),
+            {"r": rule_id, "e": ids[0], "ts": OLD},
+        )
+
+    store = Archive(tmp_path)
+    run = archive_events(engine, store, datetime(2002, 1, 1, tzinfo=timezone.utc), "gzip", block_events=1)
+    assert run.archived >= 4
+
+    # El evento con alerta se queda en BD; el resto sale a segmentos por día
+    with engine.connect() as conn:
+        left = conn.execute(text("SELECT id FROM events WHERE source = :s"), {"s": source}).scalars().all()
+    assert left == [ids[0]]
+    segs = [s for s in store.segments().values() if s.source == source]
+    assert sorted(s.day for s in segs) == ["2001-03-02", "2001-03-03"]
+    # Multi-miembro: el segmento completo es un .gz normal
+    whole = gzip.decompress((tmp_path / segs[-1].path).read_bytes()).decode().splitlines()
+    assert len(whole) == segs[-1].count == len(segs[-1].blocks)
+
+    monkeypatch.setattr(events_routes, "archive", store)
+    r = client.get("/events", params={"source": source})
+    assert [e["id"] for e in r.json()] == ids[::-1]
+    assert r.json()[1]["meta"] == {"host": "h3"}
+
+    r = client.get("/events", params={"source": source, "before_id": ids[3], "limit": 2})
+    assert [e["id"] for e in r.json()] == [ids[2], ids[1]]
+
+    r = client.get(
+        "/events",
+        params={"source": source, "ts_from": "2001-03-02T00:00:00Z", "ts_to": "2001-03-03T00:00:00Z"},
+    )
+    assert [e["id"] for e in r.json()] == [ids[2], ids[1]]
+
+    r = client.get("/events", params={"source": source, "meta_key": "host", "meta_value": "h1"})
+    assert [e["id"] for e in r.json()] == [ids[1]]
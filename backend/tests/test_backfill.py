@@ -0,0 +1,88 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from app.cli.backfill import RowError, iter_csv, iter_ndjson, to_row
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_to_row_validates_like_ingest():
+    ts, source, severity, message, meta = to_row(
+        {"ts": "2024-05-01T10:00:00", "source": "fw", "severity": "7", "message": "deny", "meta": {"host": "a"}},
+        NOW,
+    )
+    assert ts == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert (source, severity, message, meta) == ("fw", 7, "deny", {"host": "a"})
+
+    assert to_row({"source": "fw", "severity": 3.0, "message": "x"}, NOW)[2] == 3
+
+    # Sin ts => el instante de la carga
+    assert to_row({"source": "fw", "severity": 1, "message": "x"}, NOW)[0] == NOW
+
+    for bad in (
+        {"source": "", "severity": 1, "message": "x"},
+        {"source": "fw", "severity": 11, "message": "x"},
+        {"source": "fw", "severity": 1, "message": ""},
+        {"source": "fw", "severity": 1, "message": "x", "ts": "yesterday"},
+        {"source": "fw", "severity": 1, "message": "x", "ts": True},
+        {"source": "fw", "severity": True, "message": "x"},
+        {"source": "fw", "severity": 3.7, "message": "x"},
+        {"source": "fw", "severity": 1, "message": "a\x00b"},
+        {"source": "fw", "severity": 1, "message": "x", "meta": {"k": ["\x00"]}},
+    ):
+        with pytest.raises(RowError):
+            to_row(bad, NOW)
+
+
+def test_readers_report_line_numbers():
+    ndjson = io.StringIO('{"source": "a", "severity": 1, "message": "x"}\n\nnot json\n[1]\n')
+    out = list(iter_ndjson(ndjson))
+    assert [n for n, _ in out] == [1, 3, 4]
+    assert isinstance(out[0][1], dict)
+    assert isinstance(out[1][1], str) and isinstance(out[2][1], str)
+
+    csv_fh = io.StringIO('ts,source,severity,message,meta\n,fw,3,"a, b","{""host"": ""h""}"\n,fw,3,c,{bad\n')
+    rows = list(iter_csv(csv_fh))
+    assert rows[0] == (2, {"ts": "", "source": "fw", "severity": "3", "message": "a, b", "meta": {"host": "h"}})
+    assert rows[1][0] == 3 and isinstance(rows[1][1], str)
+
+
+def test_rebuild_indexes_covers_every_partition(tmp_path):
+    import json
+    import uuid
+
+    from sqlalchemy import text
+
+    from app.cli.backfill import main
+    from app.db.database import engine
+
+    indexes_sql = text(
+        """
+        SELECT i.relname, x.indisvalid,
+               (SELECT count(*) FROM pg_inherits h WHERE h.inhparent = i.oid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = 'events'::regclass AND i.relname LIKE 'ix_events_%'
+        ORDER BY i.relname
+        """
+    )
+    partitions_sql = text("SELECT count(*) FROM pg_inherits WHERE inhparent = 'events'::regclass")
+
+    with engine.connect() as conn:
+        before = [name for name, _, _ in conn.execute(indexes_sql)]
+
+    tag = uuid.uuid4().hex
+    path = tmp_path / "events.ndjson"
+    path.write_text("".join(json.dumps({"source": "bf", "severity": 1, "message": f"{tag} {i}"}) + "\n" for i in range(3)))
+    assert main([str(path), "--rebuild-indexes", "--progress-every", "60"]) == 0
+
+    with engine.connect() as conn:
+        n_partitions = conn.scalar(partitions_sql)
+        after = conn.execute(indexes_sql).all()
+        loaded = conn.scalar(text("SELECT count(*) FROM events WHERE message LIKE :m"), {"m": f"{tag} %"})
+
+    assert loaded == 3
+    assert [name for name, _, _ in after] == before
+    # Válido en el padre y uno por partición
+    assert after and all(valid and children == n_partitions for _, valid, children in after)
@@ -0,0 +1,22 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_list_events_filters_promoted_and_plain_meta_keys():
+    tag = uuid.uuid4().hex
+    events = [
+        {"source": "fw", "severity": 3, "message": "a", "meta": {"host": f"h-{tag}", "src_ip": "10.0.0.1"}},
+        {"source": "fw", "severity": 3, "message": "b", "meta": {"host": f"other-{tag}", "rack": tag}},
+    ]
+    ids = client.post("/ingest/batch", json=events).json()["event_ids"]
+
+    # host: columna promovida; rack: JSONB
+    r = client.get("/events", params={"meta_key": "host", "meta_value": f"h-{tag}"})
+    assert [e["id"] for e in r.json()] == [ids[0]]
+    r = client.get("/events", params={"meta_key": "rack", "meta_value": tag})
+    assert [e["id"] for e in r.json()] == [ids[1]]
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_events_export_matches_list_events():
+    tag = uuid.uuid4().hex
+    events = [
+        {"source": "export", "severity": 3, "message": f"{tag} one", "meta": {"host": "h1", "note": 'a,"b"'}},
+        {"source": "export", "severity": 6, "message": f"{tag} two"},
+    ]
+    client.post("/ingest/batch", json=events)
+
+    listed = client.get("/events", params={"q": tag}).json()
+    for ev in listed:
+        ev.pop("rank")
+
+    r = client.get("/events/export", params={"q": tag})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in r.text.splitlines()] == listed
+
+    r = client.get("/events/export", params={"q": tag, "format": "csv", "severity_min": 5})
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert [int(row["id"]) for row in rows] == [listed[0]["id"]]
+    assert rows[0]["ts"] == listed[0]["ts"]
+    assert rows[0]["meta"] == ""
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/events/export", params={"q": f"{tag} one", "format": "csv"}).text)))
+    assert json.loads(rows[0]["meta"]) == events[0]["meta"]
+
+
+def test_alerts_export_matches_alerts_ui():
+    tag = uuid.uuid4().hex
+    rule = client.post("/rules", json={"name": f"export-{tag}", "contains": tag, "source": "export"}).json()
+    client.post("/ingest", json={"source": "export", "severity": 8, "message": f"hit {tag}"})
+
+    items = client.get("/alerts/ui", params={"rule_id": rule["id"]}).json()
+    r = client.get("/alerts/export", params={"rule_id": rule["id"]})
+    assert r.headers["content-disposition"].startswith('attachment; filename="alerts-')
+    assert [json.loads(line) for line in r.text.splitlines()] == items
+
+    r = client.get("/alerts/export", params={"rule_id": rule["id"], "format": "csv", "severity_max": 5})
+    assert r.text.splitlines() == [",".join(items[0])]
+
+
+def test_export_limits_concurrency_and_sets_timeouts(monkeypatch):
+    import threading
+
+    from sqlalchemy import text
+
+    from app.api import export
+
+    with export.export_engine.connect() as conn:
+        assert conn.scalar(text("SHOW statement_timeout")) != "0"
+        assert conn.scalar(text("SHOW idle_in_transaction_session_timeout")) != "0"
+
+    monkeypatch.setattr(export, "_slots", threading.BoundedSemaphore(1))
+    export._slots.acquire()
+    r = client.get("/events/export")
+    assert r.status_code == 503
+    assert r.headers["retry-after"]
+
+    # Al terminar un export su hueco queda libre
+    export._slots.release()
+    for _ in range(2):
+        assert client.get("/events/export", params={"q": uuid.uuid4().hex}).status_code == 200
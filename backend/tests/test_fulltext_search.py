@@ -0,0 +1,63 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+
+from app.db.database import engine
+from app.db.search import fulltext_match
+from app.main import app
+from app.models.event import Event
+
+client = TestClient(app)
+
+
+def test_events_search_stems_and_ranks():
+    tag = uuid.uuid4().hex
+    events = [
+        {"source": "auth", "severity": 4, "message": f"{tag} password fails for admin", "meta": {"host": "db-1"}},
+        {"source": "auth", "severity": 4, "message": f"{tag} login failed, password failed again", "meta": {"host": "web-1"}},
+        {"source": "auth", "severity": 2, "message": f"{tag} session opened", "meta": {"host": "web-1"}},
+    ]
+    ids = client.post("/ingest/batch", json=events).json()["event_ids"]
+
+    # "failing" casa con "fails" y "failed" (stemming); -admin excluye; host entra en el vector
+    r = client.get("/events", params={"search": f"{tag} failing"})
+    assert sorted(e["id"] for e in r.json()) == sorted(ids[:2])
+    r = client.get("/events", params={"search": f"{tag} fail -admin"})
+    assert [e["id"] for e in r.json()] == [ids[1]]
+    r = client.get("/events", params={"search": f"{tag} web-1"})
+    assert sorted(e["id"] for e in r.json()) == sorted(ids[1:])
+
+    r = client.get("/events", params={"search": f"{tag} fail", "rank": "true"})
+    out = r.json()
+    assert out[0]["id"] == ids[1]  # dos apariciones de "fail"
+    assert out[0]["rank"] > out[1]["rank"]
+
+
+def test_search_uses_gin_index():
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        compiled = select(Event.id).where(fulltext_match(Event.search_vector, "failed login")).compile(dialect=conn.dialect)
+        plan = "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params))
+        assert "Bitmap Index Scan on events_p" in plan
+        assert "search_vector_idx" in plan
+
+
+def test_alerts_ui_rank_only_within_recent_window(monkeypatch):
+    from app.api.routes import alerts as alerts_routes
+
+    tag = uuid.uuid4().hex
+    rule = client.post("/rules", json={"name": f"rank-{tag}", "contains": tag}).json()
+    # La más antigua es la más relevante, pero queda fuera de una ventana de 2
+    for i, message in enumerate([f"{tag} fail failed failing", f"{tag} fail", f"{tag} fail once"]):
+        client.post("/ingest", json={"source": "auth", "severity": 4, "message": message, "meta": {"host": f"r{i}-{tag}"}})
+    alerts = client.get("/alerts/ui", params={"rule_id": rule["id"]}).json()
+    newest = sorted(a["id"] for a in alerts)[1:]
+
+    monkeypatch.setattr(alerts_routes, "SEARCH_RANK_WINDOW", 2)
+    params = {"rule_id": rule["id"], "search": f"{tag} fail", "rank": "true"}
+    assert sorted(a["id"] for a in client.get("/alerts/ui", params=params).json()) == newest
+    page = client.get("/alerts/ui/page", params=params).json()
+    assert sorted(a["id"] for a in page["items"]) == newest
+    # El total sigue contando todas las coincidencias
+    assert page["total"] == 3
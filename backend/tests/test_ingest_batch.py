@@ -0,0 +1,103 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_ingest_batch_empty_returns_422():
+    r = client.post("/ingest/batch", json=[])
+    assert r.status_code == 422
+
+
+def test_ingest_batch_returns_ids_and_dedups_alerts():
+    tag = uuid.uuid4().hex
+    r = client.post(
+        "/rules",
+        json={"name": f"batch-{tag}", "contains": tag, "severity_min": 3},
+    )
+    assert r.status_code == 200
+    rule_id = r.json()["id"]
+
+    events = [
+        {"source": "auth", "severity": 5, "message": f"fail {tag}", "meta": {"host": f"h-{tag}"}},
+        {"source": "auth", "severity": 1, "message": f"fail {tag}", "meta": {"host": f"h-{tag}"}},
+        {"source": "auth", "severity": 6, "message": f"FAIL {tag.upper()}", "meta": {"host": f"h-{tag}"}},
+    ]
+    r = client.post("/ingest/batch", json=events)
+    assert r.status_code == 200
+    body = r.json()
+
+    assert len(body["event_ids"]) == 3
+    assert body["event_ids"] == sorted(body["event_ids"])
+
+    # Mismo (rule, host): solo la primera coincidencia crea alerta
+    raised = [a for a in body["alerts"] if a["rule_id"] == rule_id]
+    assert len(raised) == 1
+    assert raised[0]["event_id"] == body["event_ids"][0]
+    assert raised[0]["group_key"] == f"h-{tag}"
+
+
+def test_repeated_matches_bump_occurrences_on_active_alert():
+    tag = uuid.uuid4().hex
+    r = client.post("/rules", json={"name": f"occ-{tag}", "contains": tag})
+    assert r.status_code == 200
+
+    ev = {"source": "auth", "severity": 5, "message": f"fail {tag}", "meta": {"host": f"h-{tag}"}}
+    first = client.post("/ingest/batch", json=[ev, ev]).json()
+    second = client.post("/ingest/batch", json=[ev]).json()
+
+    assert len(first["alerts"]) == 1
+    assert second["alerts"] == []
+
+    alert = client.get(f"/alerts/{first['alerts'][0]['id']}").json()
+    assert alert["occurrences"] == 3
+    assert alert["status"] == "open"
+
+
+def test_ingest_ndjson_reports_rejected_line_numbers():
+    lines = [
+        '{"source": "vector", "severity": 3, "message": "one"}',
+        '{"source": "vector", "severity": 3',
+        "",
+        '{"source": "vector", "severity": 42, "message": "bad severity"}',
+        '{"source": "vector", "severity": 4, "message": "two"}',
+    ]
+    r = client.post(
+        "/ingest/ndjson",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert body["accepted"] == 2
+    assert body["rejected"] == 2
+    assert [e["line"] for e in body["errors"]] == [2, 4]
+
+
+def test_write_behind_keeps_receive_time_and_isolates_bad_row():
+    import time
+
+    from app.db.database import SessionLocal
+    from app.engine.write_behind import WriteBehindQueue
+    from app.schemas.ingest import IngestPayload
+
+    tag = uuid.uuid4().hex
+    good = [IngestPayload(source="wb", severity=3, message=f"ok {i} {tag}") for i in range(5)]
+    # Postgres rechaza el NUL: solo esa fila debe perderse
+    bad = IngestPayload.model_construct(source="wb", severity=3, message=f"bad\x00 {tag}", meta=None)
+
+    queue = WriteBehindQueue(SessionLocal, batch_size=10, flush_ms=1000)
+    queue.put_many(good[:2] + [bad] + good[2:])
+    time.sleep(0.3)
+    queue.start()
+    queue.stop()
+
+    assert queue.flushed_total == 5
+    assert queue.failed_total == 1
+
+    events = client.get("/events", params={"q": tag, "limit": 10}).json()
+    assert sorted(e["message"] for e in events) == sorted(p.message for p in good)
+    # Mismo ts para todo el put_many, anterior al flush
+    assert len({e["ts"] for e in events}) == 1
@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.api.responses import columns_for
+from app.db.database import SessionLocal
+from app.main import app
+from app.models.alert import Alert
+from app.models.event import Event
+from app.models.rule import Rule
+from app.schemas.alert import AlertOut, AlertUIOut
+from app.schemas.event import EventOut
+from app.schemas.rule import RuleOut
+
+client = TestClient(app)
+
+
+def _as_pydantic(schema, model, items):
+    # Lo que devolvía FastAPI validando cada objeto ORM contra el response_model
+    with SessionLocal() as db:
+        objs = {o.id: o for o in db.scalars(select(model).where(model.id.in_([i["id"] for i in items])))}
+        return [schema.model_validate(objs[i["id"]]).model_dump(mode="json") for i in items]
+
+
+def test_list_endpoints_match_pydantic_serialization():
+    tag = uuid.uuid4().hex
+    rule = client.post(
+        "/rules",
+        json={"name": f"json-{tag}", "contains": tag, "meta_match": {"env": "prod"}, "throttle_seconds": 0},
+    ).json()
+    client.post("/ingest/batch", json=[
+        {"source": "json", "severity": 7, "message": f"{tag} ñandú ✓", "meta": {"host": f"h-{tag}", "env": "prod", "n": 1.5, "tags": ["a", None]}},
+        {"source": "json", "severity": 2, "message": f"{tag} no host", "meta": {"env": "prod"}},
+        {"source": "json", "severity": 2, "message": f"{tag} sin meta"},
+    ])
+
+    events = client.get("/events", params={"q": tag}).json()
+    alerts = client.get("/alerts", params={"rule_id": rule["id"]}).json()
+    alerts_ui = client.get("/alerts/ui", params={"rule_id": rule["id"]}).json()
+    rules = [r for r in client.get("/rules", params={"limit": 500}).json() if r["id"] == rule["id"]]
+
+    assert len(events) == 3 and len(alerts) == 2 and len(rules) == 1
+    assert events == _as_pydantic(EventOut, Event, events)
+    assert alerts == _as_pydantic(AlertOut, Alert, alerts)
+    assert alerts_ui == _as_pydantic(AlertUIOut, Alert, alerts_ui)
+    assert rules == _as_pydantic(RuleOut, Rule, rules)
+
+
+def test_columns_for_rejects_fields_without_column():
+    with pytest.raises(ValueError):
+        columns_for(EventOut, Event)
+    assert [c.name for c in columns_for(EventOut, Event, rank=None)] == list(EventOut.model_fields)
@@ -0,0 +1,88 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.db.metric_counters import ALERTS_BY_GROUP_KEY, actual_counts, reconcile_counters, stored_counts
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_metrics_counters_follow_ingest_rules_and_status():
+    reconcile_counters(engine)
+    before = client.get("/metrics").json()
+
+    tag = uuid.uuid4().hex
+    host = f"m-{tag}"
+    rule = client.post("/rules", json={"name": f"metrics-{tag}", "contains": tag, "source": "metrics"}).json()
+    client.post("/ingest/batch", json=[
+        {"source": "metrics", "severity": 5, "message": f"hit {tag}", "meta": {"host": host}},
+        {"source": "metrics", "severity": 5, "message": "no match"},
+    ])
+    alert = client.get("/alerts", params={"rule_id": rule["id"]}).json()[0]
+    client.patch(f"/alerts/{alert['id']}", json={"status": "ack"})
+
+    after = client.get("/metrics", params={"top_groups": 100}).json()
+    assert after["events_total"] == before["events_total"] + 2
+    assert after["rules_total"] == before["rules_total"] + 1
+    assert after["rules_enabled"] == before["rules_enabled"] + 1
+    assert after["alerts_total"] == before["alerts_total"] + 1
+    assert after["alerts_by_status"].get("open", 0) == before["alerts_by_status"].get("open", 0)
+    assert after["alerts_by_status"]["ack"] == before["alerts_by_status"].get("ack", 0) + 1
+    # Con muchos grupos empatados a 1 el host puede no salir en el top: se mira el contador
+    with engine.connect() as conn:
+        assert stored_counts(conn)[(ALERTS_BY_GROUP_KEY, host)] == 1
+    top = list(after["alerts_by_group_key_top"].values())
+    assert len(top) <= 100 and top == sorted(top, reverse=True)
+
+
+def test_reconcile_fixes_drift():
+    bogus = f"bogus-{uuid.uuid4().hex}"
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE metric_counters SET value = value + 7 WHERE name = 'events_total' AND slot = 0"))
+        conn.execute(
+            text("INSERT INTO metric_counters (name, key, slot, value) VALUES ('alerts_by_status', :k, 0, 3), "
+                 "('alerts_by_group_key', :k, 0, 2)"),
+            {"k": bogus},
+        )
+
+    drift = reconcile_counters(engine)
+    assert drift[("alerts_by_status", bogus)] == -3
+    assert drift[("alerts_by_group_key", bogus)] == -2
+    assert reconcile_counters(engine) == {}
+
+    with engine.connect() as conn:
+        actual = actual_counts(conn)
+        # Los contadores que quedan a 0 se borran
+        left = conn.scalar(text("SELECT count(*) FROM metric_counters WHERE key = :k"), {"k": bogus})
+    assert left == 0
+    metrics = client.get("/metrics").json()
+    assert metrics["events_total"] == actual[("events_total", "")]
+    assert bogus not in metrics["alerts_by_status"]
+
+
+def test_concurrent_status_patches_count_once():
+    import threading
+
+    tag = uuid.uuid4().hex
+    rule = client.post("/rules", json={"name": f"race-{tag}", "contains": tag}).json()
+    client.post("/ingest/batch", json=[
+        {"source": "metrics", "severity": 5, "message": tag, "meta": {"host": f"h{i}-{tag}"}} for i in range(5)
+    ])
+    alerts = client.get("/alerts", params={"rule_id": rule["id"]}).json()
+    reconcile_counters(engine)
+
+    patches = [
+        threading.Thread(target=client.patch, args=(f"/alerts/{a['id']}",), kwargs={"json": {"status": "ack"}})
+        for a in alerts
+        for _ in range(3)
+    ]
+    for t in patches:
+        t.start()
+    for t in patches:
+        t.join()
+
+    drift = reconcile_counters(engine)
+    assert not any(name == "alerts_by_status" for name, _ in drift)
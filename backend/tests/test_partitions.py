@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.db.partitions import apply_retention, create_partition, ensure_partitions, list_partitions, period_end, period_start
+
+OLD = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+
+def test_period_alignment():
+    ts = datetime(2026, 10, 15, 13, 30, tzinfo=timezone.utc)  # jueves
+    assert period_start(ts, "day") == datetime(2026, 10, 15, tzinfo=timezone.utc)
+    assert period_start(ts, "week") == datetime(2026, 10, 12, tzinfo=timezone.utc)
+    # Desde un inicio no alineado, el periodo termina en la siguiente frontera
+    assert period_end(datetime(2026, 10, 15, tzinfo=timezone.utc), "week") == datetime(2026, 10, 19, tzinfo=timezone.utc)
+
+
+def test_recent_window_prunes_old_partitions_and_retention_drops_them():
+    now = datetime.now(timezone.utc)
+    with engine.connect() as conn, conn.begin() as tx:
+        ensure_partitions(conn, now, "day", 2)
+        old = create_partition(conn, OLD, OLD + timedelta(days=1))
+
+        tag = uuid.uuid4().hex
+        rule_id = conn.scalar(text("INSERT INTO rules (name, enabled) VALUES (:n, false) RETURNING id"), {"n": f"part-{tag}"})
+        event_id = conn.scalar(
+            text("INSERT INTO events (ts, source, severity, message) VALUES (:ts, 'x', 1, 'old') RETURNING id"),
+            {"ts": OLD + timedelta(hours=1)},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO alerts (rule_id, event_id, event_ts, title, rule_name, event_source, event_severity, event_message) "
+                "VALUES (:r, :e, :ts, 'old', 'r', 'x', 1, 'old')"
+            ),
+            {"r": rule_id, "e": event_id, "ts": OLD + timedelta(hours=1)},
+        )
+
+        # Ventana de threshold: la partición antigua ni se mira
+        plan = "\n".join(
+            conn.execute(
+                text("EXPLAIN SELECT count(*) FROM events WHERE ts >= :since"),
+                {"since": now - timedelta(seconds=60)},
+            ).scalars()
+        )
+        assert old not in plan
+        assert f"events_p{now:%Y%m%d}" in plan
+
+        assert apply_retention(conn, now, days=30, mode="drop")[0] == old
+        assert old not in [p.name for p in list_partitions(conn)[0]]
+        assert conn.scalar(text("SELECT count(*) FROM alerts WHERE rule_id = :r"), {"r": rule_id}) == 0
+
+        tx.rollback()
+
+
+def test_backfill_creates_past_partitions_before_copy():
+    import psycopg
+
+    from app.cli.backfill import PartitionCover, Progress, _conninfo, load
+    from app.db.database import DATABASE_URL
+
+    day = datetime(1999, 1, 1, tzinfo=timezone.utc) + timedelta(days=uuid.uuid4().int % 300)
+    tag = uuid.uuid4().hex
+    records = iter(
+        (i, {"ts": (day + timedelta(days=i % 2, hours=i)).isoformat(), "source": "bf", "severity": 1, "message": tag})
+        for i in range(6)
+    )
+    names = [f"events_p{day:%Y%m%d}", f"events_p{day + timedelta(days=1):%Y%m%d}"]
+    cover = PartitionCover()
+    try:
+        with psycopg.connect(_conninfo(DATABASE_URL)) as conn:
+            load(conn, records, Progress(60), 1000, 0, "test", cover)
+        assert sorted(cover.created) == names
+
+        with engine.connect() as conn:
+            tables = conn.execute(
+                text("SELECT tableoid::regclass::text, count(*) FROM events WHERE message = :m GROUP BY 1"), {"m": tag}
+            ).all()
+        assert sorted(tables) == [(names[0], 3), (names[1], 3)]
+    finally:
+        with engine.begin() as conn:
+            for name in cover.created:
+                conn.execute(text(f'ALTER TABLE events DETACH PARTITION "{name}"'))
+                conn.execute(text(f'DROP TABLE "{name}"'))
+
+
+def test_partition_step_retries_on_lock_timeout(monkeypatch):
+    import threading
+
+    from app.db import partitions
+    from app.db.partitions import ensure_range, run_step
+
+    monkeypatch.setattr(partitions, "EVENTS_PARTITION_LOCK_TIMEOUT_MS", 100)
+    monkeypatch.setattr(partitions, "EVENTS_PARTITION_LOCK_RETRIES", 5)
+    day = datetime(1998, 1, 1, tzinfo=timezone.utc) + timedelta(days=uuid.uuid4().int % 300)
+
+    # Una transacción larga leyendo events bloquea el CREATE ... PARTITION OF
+    holder = engine.connect()
+    holder.execute(text("LOCK TABLE events IN ACCESS SHARE MODE"))
+    release = threading.Timer(0.3, holder.rollback)
+    release.start()
+    try:
+        with engine.connect() as conn:
+            assert run_step(conn, ensure_range, day, day + timedelta(days=1), "day") == [f"events_p{day:%Y%m%d}"]
+    finally:
+        release.join()
+        holder.close()
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE events DETACH PARTITION "events_p{day:%Y%m%d}"'))
+            conn.execute(text(f'DROP TABLE "events_p{day:%Y%m%d}"'))
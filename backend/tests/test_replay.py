@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.db.database import SessionLocal, engine
+from app.engine.replay import load_rules, replay
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_replay_counts_alerts_for_disabled_rule():
+    tag = uuid.uuid4().hex
+    start = datetime.now(timezone.utc) - timedelta(seconds=1)
+    r = client.post(
+        "/rules",
+        json={"name": f"replay-{tag}", "contains": tag, "enabled": False},
+    )
+    assert r.status_code == 200
+    rule_id = r.json()["id"]
+
+    events = [
+        {"source": "auth", "severity": 5, "message": f"fail {tag}", "meta": {"host": f"h{i % 3}-{tag}"}}
+        for i in range(9)
+    ] + [{"source": "auth", "severity": 5, "message": f"fail {tag}"}] * 2
+    assert client.post("/ingest/batch", json=events).status_code == 200
+
+    with SessionLocal() as db:
+        rules = load_rules(db, [rule_id])
+    assert [r.id for r in rules] == [rule_id]
+
+    until = datetime.now(timezone.utc) + timedelta(seconds=1)
+    reports = [replay(engine, rules, start, until, workers=w) for w in (1, 2)]
+    for report in reports:
+        (stats,) = report.rules
+        # 3 hosts => 3 alertas activas; sin host no hay anti-duplicado => 2 más
+        assert stats.matched == 11
+        assert stats.alerts == 5
+    assert reports[0].as_dict()["rules"][0]["samples"] == reports[1].as_dict()["rules"][0]["samples"]
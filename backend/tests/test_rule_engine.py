@@ -0,0 +1,177 @@
+import random
+
+from app.engine.counters import ThresholdCounters
+from app.engine.matcher import ContainsMatcher
+from app.engine.rule_index import RuleIndex
+from app.engine.rules_cache import CompiledRule, build_snapshot
+
+SOURCES = ["auth", "web", "fw", "dns"]
+HOSTS = ["kali", "web-1", "db-1"]
+WORDS = ["failed", "password", "root", "denied", "ok"]
+
+
+def _random_rule(rng: random.Random, rule_id: int) -> CompiledRule:
+    meta_match = ()
+    if rng.random() < 0.4:
+        meta_match = (("host", rng.choice(HOSTS)),)
+    elif rng.random() < 0.1:
+        meta_match = (("tags", ["a", "b"]),)
+    return CompiledRule(
+        id=rule_id,
+        name=f"r{rule_id}",
+        source=rng.choice(SOURCES) if rng.random() < 0.5 else None,
+        severity_min=rng.randint(0, 10) if rng.random() < 0.7 else None,
+        contains=rng.choice(WORDS) if rng.random() < 0.5 else None,
+        meta_match=meta_match,
+        threshold_count=None,
+        threshold_seconds=None,
+    )
+
+
+def _random_event(rng: random.Random):
+    meta = None
+    if rng.random() < 0.8:
+        meta = {"host": rng.choice(HOSTS), "tags": ["a", "b"]}
+    message = " ".join(rng.choice(WORDS) for _ in range(3))
+    return rng.choice(SOURCES), rng.randint(0, 10), message, meta
+
+
+def test_rule_index_matches_linear_scan():
+    rng = random.Random(1234)
+    rules = [_random_rule(rng, i) for i in range(1, 301)]
+    index = RuleIndex(rules)
+
+    for _ in range(500):
+        source, severity, message, meta = _random_event(rng)
+        expected = [r.id for r in rules if r.matches(source, severity, message, meta)]
+        got = [
+            r.id
+            for r in index.candidates(source, severity, meta)
+            if r.matches(source, severity, message, meta)
+        ]
+        assert got == expected
+
+
+def test_rule_index_only_returns_candidates_for_event():
+    rules = [
+        CompiledRule(i, f"r{i}", "auth" if i % 2 else "web", 5, None, (), None, None)
+        for i in range(1, 101)
+    ]
+    index = RuleIndex(rules)
+
+    assert index.candidates("dns", 10, None) == []
+    assert index.candidates("auth", 4, None) == []
+    assert len(index.candidates("auth", 5, None)) == 50
+
+
+def test_contains_matcher_equals_substring_check():
+    rng = random.Random(99)
+    alphabet = "abcé ÑX"
+    patterns = {i: "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))).lower() for i in range(1, 200)}
+    matcher = ContainsMatcher(patterns.items())
+
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + "zz") for _ in range(rng.randint(0, 60))).lower()
+        expected = {i for i, p in patterns.items() if p in text}
+        assert matcher.search(text) == expected
+
+
+def test_snapshot_match_equals_linear_scan():
+    rng = random.Random(7)
+    rules = tuple(_random_rule(rng, i) for i in range(1, 301))
+    snapshot = build_snapshot(rules)
+
+    for _ in range(500):
+        source, severity, message, meta = _random_event(rng)
+        message = message.upper()
+        expected = [r.id for r in rules if r.matches(source, severity, message.lower(), meta)]
+        assert [r.id for r in snapshot.match(source, severity, message, meta)] == expected
+
+
+def test_threshold_counters_slide_and_evict():
+    counters = ThresholdCounters(buckets=60)
+    key = (1, "kali")
+    t0 = 1_000_000.0
+
+    counters.seed(key, 60, {int(t0 - 30): 2}, t0)
+    assert counters.add(key, 60, t0) == 3
+    assert counters.add(key, 60, t0 + 20) == 4
+
+    # a los 31 s salen los eventos sembrados; a los 81 s, todos
+    assert counters.count(key, t0 + 31) == 2
+    assert counters.count(key, t0 + 81) == 0
+
+    counters._evict_idle(t0 + 200)
+    assert len(counters) == 0
+
+
+def test_threshold_undo_only_removes_own_increments():
+    counters = ThresholdCounters(buckets=60)
+    key = (1, "kali")
+    t0 = 1_000_000.0
+
+    mine, theirs = [], []
+    counters.add(key, 60, t0, undo=mine)
+    counters.add(key, 60, t0, undo=theirs)
+    counters.add(key, 60, t0 + 1, undo=mine)
+    counters.undo(mine)
+    assert counters.count(key, t0 + 1) == 1
+
+    # Clave soltada y resembrada desde BD: lo deshecho ya no está ahí
+    counters.retain(lambda k: k != key)
+    counters.seed(key, 60, {int(t0): 5}, t0)
+    counters.undo(theirs)
+    assert counters.count(key, t0 + 1) == 5
+
+
+def test_concurrent_seed_keeps_first_ingest_increment():
+    counters = ThresholdCounters(buckets=60)
+    key = (1, "kali")
+    t0 = 1_000_000.0
+
+    # Dos ingest ven has() == False y siembran lo mismo de BD; el primero ya sumó
+    counters.seed(key, 60, {int(t0 - 10): 2}, t0)
+    counters.add(key, 60, t0)
+    counters.seed(key, 60, {int(t0 - 10): 2}, t0)
+    assert counters.add(key, 60, t0) == 4
+
+    # Con otra ventana (regla editada) sí se sustituye
+    counters.seed(key, 120, {int(t0 - 10): 2}, t0)
+    assert counters.count(key, t0) == 2
+
+
+def test_rollback_keeps_other_transactions_threshold_counts(monkeypatch):
+    import uuid
+    from datetime import datetime, timezone
+
+    from fastapi.testclient import TestClient
+
+    from app.db import metric_counters
+    from app.db.database import SessionLocal
+    from app.engine.counters import threshold_counters
+    from app.engine.evaluator import ingest_events
+    from app.main import app
+    from app.schemas.ingest import IngestPayload
+
+    tag = uuid.uuid4().hex
+    host = f"h-{tag}"
+    rule = TestClient(app).post(
+        "/rules", json={"name": f"undo-{tag}", "contains": tag, "threshold_count": 100, "threshold_seconds": 300}
+    ).json()
+    payload = IngestPayload(source="x", severity=1, message=tag, meta={"host": host})
+
+    # a y c en slots distintos de metric_counters: con el mismo, c esperaría
+    # al lock de fila de a (abierta en este mismo hilo) para siempre
+    slots = iter(range(metric_counters.METRIC_COUNTER_SLOTS))
+    monkeypatch.setattr(metric_counters.random, "randrange", lambda n: next(slots))
+
+    a, c = SessionLocal(), SessionLocal()
+    try:
+        ingest_events(a, [payload] * 2, datetime.now(timezone.utc))
+        ingest_events(c, [payload] * 3, datetime.now(timezone.utc))
+        a.rollback()
+        c.commit()
+    finally:
+        a.close()
+        c.close()
+    assert threshold_counters.count((rule["id"], host), datetime.now(timezone.utc).timestamp()) == 3
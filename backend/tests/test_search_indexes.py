@@ -0,0 +1,57 @@
+import pytest
+from psycopg.types.json import Jsonb
+from sqlalchemy import select, text
+
+from app.db.database import engine
+from app.db.search import contains_pattern, ilike_contains
+from app.models.alert import Alert
+from app.models.event import Event, meta_text_equals
+
+
+def _plan(conn, stmt) -> str:
+    # EXPLAIN de la sentencia tal como la genera la app
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = {k: Jsonb(v) if isinstance(v, dict) else v for k, v in compiled.params.items()}
+    return "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}", params))
+
+
+def _has_index(conn, name: str) -> bool:
+    return bool(conn.scalar(text("SELECT to_regclass(:n) IS NOT NULL"), {"n": name}))
+
+
+def test_contains_pattern_escapes_like_wildcards():
+    assert contains_pattern("50%_a\\b") == "%50\\%\\_a\\\\b%"
+
+
+def test_meta_filter_uses_jsonb_gin_index():
+    with engine.connect() as conn:
+        # Con tablas pequeñas el seq scan es más barato: aquí se comprueba que el índice es utilizable
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = _plan(conn, select(Event.id).where(meta_text_equals("rack", "5")))
+        assert "Bitmap Index Scan on events_p" in plan
+        assert "meta @> '{\"rack\": 5}'::jsonb" in plan
+
+
+@pytest.mark.parametrize(
+    "stmt, index",
+    [
+        (select(Event.id).where(ilike_contains(Event.message, "failed login")), "_message_idx"),
+        (select(Alert.id).where(ilike_contains(Alert.title, "brute force")), "ix_alerts_title_trgm"),
+    ],
+)
+def test_substring_search_uses_trigram_index(stmt, index):
+    with engine.connect() as conn:
+        if not _has_index(conn, "ix_alerts_title_trgm"):
+            pytest.skip("pg_trgm not installed on this server")
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = _plan(conn, stmt)
+        assert "Bitmap Index Scan on" in plan
+        assert index in plan
+
+
+def test_alert_severity_filter_is_index_scan_on_alerts():
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = _plan(conn, select(Alert.id).where(Alert.event_severity >= 8))
+        assert "ix_alerts_event_severity_created_at" in plan
+        assert "events" not in plan
@@ -0,0 +1,49 @@
+from app.syslog.parser import parse_syslog
+
+
+def test_parse_rfc5424():
+    p = parse_syslog(
+        b'<34>1 2026-01-16T12:00:00.003Z kali sshd 4242 ID47 [origin ip="10.0.0.5"] '
+        b"\xef\xbb\xbfFailed password for root"
+    )
+    assert p is not None
+    assert p.source == "syslog"
+    assert p.severity == 8  # crit
+    assert p.message == "Failed password for root"
+    assert p.meta["host"] == "kali"
+    assert p.meta["app"] == "sshd"
+    assert p.meta["pid"] == "4242"
+    assert p.meta["facility"] == 4
+    assert p.meta["structured_data"] == '[origin ip="10.0.0.5"]'
+
+
+def test_parse_rfc5424_nil_fields():
+    p = parse_syslog(b"<14>1 - - - - - - hello")
+    assert p is not None
+    assert p.message == "hello"
+    assert "host" not in p.meta
+
+
+def test_parse_rfc3164():
+    p = parse_syslog(b"<38>Jan  6 10:01:02 web-1 sshd[812]: Accepted publickey for deploy\n")
+    assert p is not None
+    assert p.severity == 2  # info
+    assert p.message == "Accepted publickey for deploy"
+    assert p.meta["host"] == "web-1"
+    assert p.meta["app"] == "sshd"
+    assert p.meta["pid"] == "812"
+
+
+def test_parse_rejects_garbage():
+    assert parse_syslog(b"no pri here") is None
+    assert parse_syslog(b"<999>1 - - - - - - x") is None
+    assert parse_syslog(b"<13>   ") is None
+
+
+def test_parse_strips_nul_everywhere():
+    p = parse_syslog(b"<38>Jan  6 10:01:02 web\x00-1 ss\x00hd[812]: bad\x00 input\x00\n")
+    assert p is not None
+    assert p.message == "bad input"
+    assert p.meta["host"] == "web-1"
+    assert p.meta["app"] == "sshd"
+    assert parse_syslog(b"<13>\x00\x00") is None
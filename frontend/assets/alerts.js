@@ -1,14 +1,17 @@
 let state = {
   limit: 50,
-  offset: 0,
+  cursor: "", // vacío = primera página
   status: "",
   group_key: "",
 };
 
+// Cursores opacos que devuelve la API para la página actual
+let pageCursors = { next: null, prev: null };
+
 function readStateFromUrl() {
   const u = new URL(window.location.href);
   state.limit = Number(u.searchParams.get("limit") ?? "50");
-  state.offset = Number(u.searchParams.get("offset") ?? "0");
+  state.cursor = u.searchParams.get("cursor") ?? "";
   state.status = u.searchParams.get("status") ?? "";
   state.group_key = u.searchParams.get("group_key") ?? "";
 }
@@ -22,7 +25,7 @@ function syncForm() {
 function syncUrl() {
   setQueryParams({
     limit: state.limit,
-    offset: state.offset,
+    cursor: state.cursor,
     status: state.status,
     group_key: state.group_key,
   });
@@ -44,7 +47,7 @@ function renderRows(alerts) {
     tr.innerHTML = `
       <td class="mono">${a.id}</td>
       <td><span class="${statusBadgeClass(a.status)}">${a.status}</span></td>
-      <td class="muted">—</td>
+      <td class="mono">${a.event_severity}</td>
       <td class="mono">${a.group_key ?? "—"}</td>
       <td>${escapeHtml(a.title)}</td>
       <td class="mono">${a.rule_id}</td>
@@ -56,6 +59,12 @@ function renderRows(alerts) {
   }
 }
 
+function fmtTotal({ total, total_mode }) {
+  if (total_mode === "capped") return `${total.toLocaleString()}+`;
+  if (total_mode === "estimate") return `~${total.toLocaleString()}`;
+  return total.toLocaleString();
+}
+
 function escapeHtml(s) {
   return String(s ?? "")
     .replaceAll("&", "&amp;")
@@ -73,28 +82,37 @@ async function loadAlerts() {
   qs("alertsTbody").innerHTML = `<tr><td colspan="9" class="muted">Cargando…</td></tr>`;
 
   try {
-    const data = await apiFetch("/alerts", {
+    // Página + total en una sola petición (total con tope: "10000+")
+    const { data, headers } = await apiFetch("/alerts/ui/page", {
       query: {
         limit: state.limit,
-        offset: state.offset,
+        cursor: state.cursor || null,
         status: state.status || null,
         group_key: state.group_key || null,
-      }
+        count: "capped",
+      },
+      withHeaders: true,
     });
+    const alerts = data.items;
+
+    renderRows(alerts);
 
-    renderRows(data);
+    // Sin cabecera = no hay página en ese sentido
+    pageCursors = {
+      next: headers.get("X-Next-Cursor"),
+      prev: headers.get("X-Prev-Cursor"),
+    };
 
     qs("resultMeta").textContent =
-      `limit=${state.limit} · offset=${state.offset} · resultados=${data.length}`;
+      `limit=${state.limit} · en página=${alerts.length} · total=${fmtTotal(data)}`;
 
-    // UX: si vuelve vacío y offset>0, probablemente te pasaste de página.
-    if (data.length === 0 && state.offset > 0) {
-      show(info, "No hay más resultados en esta página. Prueba con Prev.");
+    // UX: una página vacía con cursor (p.ej. alertas borradas) -> volver al inicio
+    if (alerts.length === 0 && state.cursor) {
+      show(info, "No hay resultados en esta página. Pulsa Limpiar para volver al inicio.");
     }
 
-    qs("btnPrev").disabled = state.offset <= 0;
-    // Next: no sabemos total; habilitamos siempre. Si vacía, el mensaje guía.
-    qs("btnNext").disabled = false;
+    qs("btnPrev").disabled = !pageCursors.prev;
+    qs("btnNext").disabled = !pageCursors.next;
 
   } catch (e) {
     show(err, `Error cargando alertas: ${e.message}`);
@@ -110,7 +128,7 @@ function init() {
     state.status = qs("status").value.trim();
     state.group_key = qs("group_key").value.trim();
     state.limit = Number(qs("limit").value);
-    state.offset = 0; // aplicar filtros resetea paginación
+    state.cursor = ""; // aplicar filtros resetea paginación
     syncUrl();
     loadAlerts();
   });
@@ -118,20 +136,22 @@ function init() {
   qs("btnClear").addEventListener("click", () => {
     state.status = "";
     state.group_key = "";
-    state.offset = 0;
+    state.cursor = "";
     syncForm();
     syncUrl();
     loadAlerts();
   });
 
   qs("btnPrev").addEventListener("click", () => {
-    state.offset = Math.max(0, state.offset - state.limit);
+    if (!pageCursors.prev) return;
+    state.cursor = pageCursors.prev;
     syncUrl();
     loadAlerts();
   });
 
   qs("btnNext").addEventListener("click", () => {
-    state.offset = state.offset + state.limit;
+    if (!pageCursors.next) return;
+    state.cursor = pageCursors.next;
     syncUrl();
     loadAlerts();
   });
@@ -26,7 +26,8 @@ function statusBadgeClass(status) {
   return "badge";
 }
 
-async function apiFetch(path, { method = "GET", query = null, body = null } = {}) {
+// withHeaders: devuelve { data, headers } (p.ej. para leer X-Next-Cursor)
+async function apiFetch(path, { method = "GET", query = null, body = null, withHeaders = false } = {}) {
   const url = new URL(API_BASE + path, window.location.origin);
   if (query) {
     Object.entries(query).forEach(([k, v]) => {
@@ -54,7 +55,7 @@ async function apiFetch(path, { method = "GET", query = null, body = null } = {}
     const detail = data?.detail ?? text ?? `HTTP ${res.status}`;
     throw new Error(detail);
   }
-  return data;
+  return withHeaders ? { data, headers: res.headers } : data;
 }
 
 function getQueryParam(name) {